@@ -0,0 +1,532 @@
+# -*- coding: utf-8 -*-
+"""Native asyncio API.
+
+Requires Python >= 3.5 and cache with async methods (see interfaces.IAsyncCache),
+for example, Django >= 4.0 cache backend.
+
+Validation round trips (reading of values and tag versions) are awaited.
+Evaluation of dependency, tag states and leases are still maintained by synchronous
+lock and transaction manager, so, they are called by default executor of event loop,
+see run_sync(). Context (transaction and relations) is read and changed only by event loop.
+"""
+from __future__ import absolute_import, unicode_literals
+import asyncio
+import inspect
+import functools
+from cache_dependencies import cache, defer, dependencies, exceptions, tagging, utils
+
+try:
+    get_running_loop = asyncio.get_running_loop
+except AttributeError:  # Python < 3.7, where get_event_loop() returns the running loop of coroutine
+    get_running_loop = asyncio.get_event_loop
+
+_background_tasks = set()  # Strong references to revalidation tasks
+
+
+async def resolve(deferred):
+    """Awaits aggregated queries of deferred chain, so, deferred.get() does not block.
+
+    :type deferred: cache_dependencies.interfaces.IDeferred
+    """
+    queries = defer.get_pending_queries(deferred)
+    results = await asyncio.gather(*[_execute(node, keys) for node, keys in queries])
+    for (node, keys), caches in zip(queries, results):
+        defer.set_query_result(deferred, node, caches)
+
+
+async def _execute(node, keys):
+    """Calls async counterpart of executor, for example, cache.aget_many() for cache.get_many().
+
+    :type node: cache_dependencies.interfaces.IDeferred
+    :type keys: set
+    """
+    if node.async_execute is None:
+        return await run_sync(functools.partial(node.execute, keys, *node.args, **node.kwargs))
+    return await node.async_execute(keys, *node.args, **node.kwargs)
+
+
+async def run_sync(func, *args):
+    """Calls blocking function by default executor of event loop, so, the loop is not blocked.
+
+    Function is called within copy of the current context, so, it sees the same transaction,
+    but its changes of the context are not visible to caller.
+    Context can't be passed to other thread without contextvars (Python < 3.7),
+    so, function is called directly in this case.
+
+    :type func: collections.Callable
+    """
+    if utils.contextvars is None:
+        return func(*args)
+    loop = get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(utils.contextvars.copy_context().run, func, *args))
+
+
+class AsyncCacheWrapper(cache.CacheWrapper):
+    """Async counterpart of CacheWrapper.
+
+    :type cache: cache_dependencies.interfaces.IAsyncCache
+    """
+
+    async def aget_or_set_callback(self, key, callback, dependency, timeout=None,
+                                   version=None, args=None, kwargs=None, fallback=None, allow_stale=True):
+        """Returns cache value if exists
+
+        Otherwise calls callback (can be coroutine function), sets cache value to it and returns it.
+        See CacheWrapper.get_or_set_callback() about callback_lease, fallback and allow_stale.
+        Stale value is recomputed by background task if revalidation has executor.
+
+        :type key: str
+        :type callback: collections.Callable
+        :type dependency: cache_dependencies.interfaces.IDependency
+        :type timeout: int or None
+        :type version: int or None
+        :type args: tuple
+        :type kwargs: dict
+        :type fallback: object
+        :type allow_stale: bool
+        """
+        data, epoch = await self._aread_data(key, version)
+        valid_data = await self._avalidate_data(key, data, epoch, version)
+        value = None if valid_data is None else self._unpack_value(valid_data)
+        if value is not None:
+            due, token = await self._abegin_early_recomputation(valid_data, key, version)
+            if not due:
+                return value
+            return await self._acall_and_set(key, callback, dependency, timeout, version, args, kwargs, token)
+        token = None
+        if allow_stale and self.revalidation is not None:
+            data, token = await run_sync(self._get_stale_data, data, key, version)
+            if data is not None and (token is None or self.revalidation.executor is not None):
+                if token is not None:
+                    task = asyncio.ensure_future(self._arevalidate(
+                        key, callback, dependency, timeout, version, args, kwargs, token
+                    ))
+                    _background_tasks.add(task)
+                    task.add_done_callback(_background_tasks.discard)
+                self.finish(key, self._unpack_dependency(data), version=version)
+                return self._unpack_value(data)
+        if token is None and self.callback_lease is not None:
+            token = await run_sync(self.callback_lease.acquire, self.cache, key, version)
+            if token is None:
+                value = await self._await_lease(key, version)
+                if value is not None:
+                    return value
+                if fallback is not None:
+                    self.abort(key)
+                    return fallback
+        return await self._acall_and_set(key, callback, dependency, timeout, version, args, kwargs, token)
+
+    async def _acall_and_set(self, key, callback, dependency, timeout, version, args, kwargs, token=None):
+        """Async counterpart of CacheWrapper._call_and_set()."""
+        try:
+            loop = get_running_loop()
+            started_at = loop.time()
+            value = callback(*(args or ()), **(kwargs or {}))
+            if inspect.isawaitable(value):
+                value = await value
+            data = await self._aevaluate_data(
+                key, value, dependency, version, self._make_recomputation(loop.time() - started_at, timeout)
+            )
+            if data is not None:
+                await self._aadd_to_index(key, data, version)
+                await self.cache.aset(key, data, timeout, version)
+            if self.revalidation is not None:
+                await run_sync(self._set_revalidated, key, version)
+        finally:
+            if token is not None:
+                await run_sync(self._release_lease, key, token, version)
+        return value
+
+    async def _aevaluate_data(self, key, value, dependency, version, recomputation=None):
+        """Async counterpart of CacheWrapper._evaluate_data()."""
+        dependency, combined_dependency_with_descendants = self._combine_dependency(key, dependency, version)
+        try:
+            epoch = await run_sync(
+                self._evaluate_dependency, self.transaction.current(), combined_dependency_with_descendants, version
+            )
+        except exceptions.DependencyLocked:
+            return None
+        else:
+            return self._pack_data(value, combined_dependency_with_descendants, recomputation, epoch)
+        finally:
+            self.finish(key, dependency, version=version)
+
+    async def _abegin_early_recomputation(self, data, key, version):
+        """Async counterpart of CacheWrapper._begin_early_recomputation()."""
+        if self.early_recomputation is None or not self.early_recomputation.is_due(data):
+            return False, None
+        token = None
+        lease = self._get_recomputation_lease()
+        if lease is not None:
+            token = await run_sync(lease.acquire, self.cache, key, version)
+            if token is None:
+                return False, None  # Other caller recomputes it already
+        if not self.ignore_descendants:
+            self.begin(key)
+        return True, token
+
+    async def _arevalidate(self, key, callback, dependency, timeout, version, args, kwargs, token):
+        """Async counterpart of CacheWrapper._revalidate()."""
+        try:
+            # Task inherits context of caller, but it is not a part of caller's transaction.
+            self.transaction.current(None)
+            if not self.ignore_descendants:
+                self.begin(key)
+            await self._acall_and_set(key, callback, dependency, timeout, version, args, kwargs, token)
+        except Exception:
+            cache.logger.exception("Revalidation of cache %r is failed", key)
+
+    async def _await_lease(self, key, version):
+        """Async counterpart of CallbackLease.wait()."""
+        lease = self.callback_lease
+        loop = get_running_loop()
+        deadline = loop.time() + lease.wait_timeout
+        while True:
+            value = await self.aget(key, version=version, abort=True)
+            if value is not None:
+                return value
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return None
+            if not await run_sync(lease.is_held, self.cache, key, version):
+                return await self.aget(key, version=version, abort=True)
+            await asyncio.sleep(min(lease.poll_interval, remaining))
+
+    async def aget(self, key, default=None, version=None, abort=False):
+        """Gets cache value.
+
+        If one of cache dependencies is expired, returns default.
+
+        :type key: str
+        :type default: object
+        :type version: int or None
+        :type abort: bool
+        """
+        data = await self._aget_valid_data(key, version, abort)
+        if data is None:
+            return default
+        return self._unpack_value(data)
+
+    async def _aget_valid_data(self, key, version, abort=False):
+        """Async counterpart of CacheWrapper._get_valid_data()."""
+        data, epoch = await self._aread_data(key, version, abort)
+        return await self._avalidate_data(key, data, epoch, version)
+
+    async def _aread_data(self, key, version, abort=False):
+        """Async counterpart of CacheWrapper._read_data()."""
+        if not abort and not self.ignore_descendants:
+            self.begin(key)
+        if self.invalidation_epoch is None:
+            return await self.cache.aget(key, None, version), None
+        caches, epoch = await self._aget_many_with_epoch([key], version)
+        return caches.get(key), epoch
+
+    async def _avalidate_data(self, key, data, epoch, version):
+        """Async counterpart of CacheWrapper._validate_data()."""
+        if data is None:
+            return None
+
+        dependency = self._unpack_dependency(data)
+        if self.invalidation_epoch is None or not self.invalidation_epoch.is_actual(data, epoch):
+            deferred = dependency.validate(self.cache, version)
+            await resolve(deferred)
+            try:
+                deferred.get()
+            except exceptions.DependencyInvalid:
+                return None
+
+        self.finish(key, dependency, version=version)
+        return data
+
+    async def aget_many(self, keys, version=None, abort=False):
+        """
+        :type keys: collections.Iterable[str]
+        :type version: int or None
+        :type abort: bool
+        """
+        keys = list(keys)
+        self._begin_many(keys, abort)
+        if self.invalidation_epoch is None:
+            caches, epoch = await self.cache.aget_many(keys, version), None
+        else:
+            caches, epoch = await self._aget_many_with_epoch(keys, version)
+
+        cache_dependencies = {key: self._unpack_dependency(data) for key, data in caches.items()}
+        composite_dependency = self._make_composite_dependency(caches, cache_dependencies, epoch)
+        deferred = composite_dependency.validate(self.cache, version)
+        await resolve(deferred)
+        return self._get_valid_many(caches, cache_dependencies, deferred, version)
+
+    @staticmethod
+    def _make_invalidation_epoch_decorator(cache, invalidation_epoch):
+        return AsyncInvalidationEpochCacheDecorator(cache, invalidation_epoch)
+
+    async def _aget_many_with_epoch(self, keys, version):
+        """Async counterpart of CacheWrapper._get_many_with_epoch()."""
+        caches = await self.cache.aget_many(self.invalidation_epoch.make_keys(keys), version)
+        return caches, self.invalidation_epoch.pop(caches)
+
+    async def aset(self, key, value, dependency=None, timeout=None, version=None):
+        """Sets cache value and dependency.
+
+        :type key: str
+        :type value: object
+        :type dependency: cache_dependencies.interfaces.IDependency or None
+        :type timeout: int or None
+        :type version: int or None
+        """
+        data = await self._aevaluate_data(key, value, dependency, version)
+        if self.revalidation is not None:
+            await run_sync(self._set_revalidated, key, version)
+        if data is not None:
+            await self._aadd_to_index(key, data, version)
+            return await self.cache.aset(key, data, timeout, version)
+
+    async def ainvalidate_dependency(self, dependency, version=None):
+        """Invalidate dependency.
+
+        :type dependency: cache_dependencies.interfaces.IDependency
+        :type version: int or None
+        """
+        await run_sync(self.transaction.current().add_dependency, dependency, version)
+        writes = DeferredWritesCacheDecorator(self.cache)
+        dependency.invalidate(writes, version)
+        await writes.aflush()
+        if self.tag_keys_index is not None:
+            tags = self._get_tags(dependency)
+            if tags:
+                caches = await self.cache.aget_many(self.tag_keys_index.make_keys(tags), version)
+                if caches:
+                    await self.cache.adelete_many(
+                        self.tag_keys_index.collect(caches) + list(caches.keys()), version=version
+                    )
+
+    async def _aadd_to_index(self, key, data, version):
+        """Async counterpart of CacheWrapper._add_to_index()."""
+        if self.tag_keys_index is not None:
+            tags = self._get_tags(self._unpack_dependency(data))
+            if tags:
+                index_keys = self.tag_keys_index.make_keys(tags, key)
+                data = self.tag_keys_index.update(await self.cache.aget_many(index_keys, version), index_keys, key)
+                if data:
+                    await self.cache.aset_many(data, self.tag_keys_index.timeout, version)
+
+
+class DeferredWritesCacheDecorator(object):
+    """Collects writes to be awaited later by aflush().
+
+    Reads are delegated as is.
+    """
+
+    def __init__(self, delegate):
+        """
+        :type delegate: cache_dependencies.interfaces.IAsyncCache
+        """
+        self._delegate = delegate
+        self._writes = []
+
+    def set(self, key, value, timeout=None, version=None):
+        self._writes.append((self._delegate.aset, (key, value), {'timeout': timeout, 'version': version}))
+
+    def set_many(self, data, timeout=None, version=None):
+        self._writes.append((self._delegate.aset_many, (data,), {'timeout': timeout, 'version': version}))
+
+    def delete(self, key, version=None):
+        self._writes.append((self._delegate.adelete, (key,), {'version': version}))
+
+    def delete_many(self, keys, version=None):
+        self._writes.append((self._delegate.adelete_many, (list(keys),), {'version': version}))
+
+    async def aflush(self):
+        writes, self._writes = self._writes, []
+        for method, args, kwargs in writes:  # Keep order of writes
+            await method(*args, **kwargs)
+
+    def __getattr__(self, name):
+        """Delegate for all native methods."""
+        return getattr(self._delegate, name)
+
+
+class AsyncLocalTagVersionsCacheDecorator(cache.LocalTagVersionsCacheDecorator):
+    """Async counterpart of LocalTagVersionsCacheDecorator."""
+
+    async def aget_many(self, keys, version=None):
+        keys = list(keys)
+        tag_keys = [key for key in keys if utils.is_tag_key(key)]
+        if not tag_keys:
+            return await self._delegate.aget_many(keys, version=version)
+
+        local_caches = self._local.get_many((key, version) for key in tag_keys)
+        result = {key: value for (key, _), value in local_caches.items()}
+        missed_keys = [key for key in keys if key not in result]
+        if missed_keys:
+            caches = await self._delegate.aget_many(missed_keys, version=version)
+            self._local.set_many({
+                (key, version): value for key, value in caches.items() if utils.is_tag_key(key)
+            })
+            result.update(caches)
+        return result
+
+    async def aset(self, key, value, timeout=None, version=None):
+        await self._delegate.aset(key, value, timeout=timeout, version=version)
+        if utils.is_tag_key(key):
+            self._local.set_many({(key, version): value})
+
+    async def aset_many(self, data, timeout=None, version=None):
+        await self._delegate.aset_many(data, timeout=timeout, version=version)
+        self._local.set_many({
+            (key, version): value for key, value in data.items() if utils.is_tag_key(key)
+        })
+
+    async def adelete(self, key, version=None):
+        if utils.is_tag_key(key):
+            self._local.delete_many([(key, version)])
+        await self._delegate.adelete(key, version=version)
+
+    async def adelete_many(self, keys, version=None):
+        keys = list(keys)
+        self._local.delete_many((key, version) for key in keys if utils.is_tag_key(key))
+        await self._delegate.adelete_many(keys, version=version)
+
+
+class AsyncInvalidationEpochCacheDecorator(cache.InvalidationEpochCacheDecorator):
+    """Async counterpart of InvalidationEpochCacheDecorator."""
+
+    async def adelete(self, key, version=None):
+        if utils.is_tag_key(key):
+            return await self.adelete_many([key], version=version)
+        return await self._delegate.adelete(key, version=version)
+
+    async def adelete_many(self, keys, version=None):
+        return await self._delegate.adelete_many(self._add_epoch_key(keys), version=version)
+
+
+class AsyncNamespaceCacheDecorator(cache.NamespaceCacheDecorator):
+    """Async counterpart of NamespaceCacheDecorator."""
+
+    async def aget(self, key, default=None, version=None):
+        return await self._delegate.aget(await self._amake_key(key), default, version=version)
+
+    async def aget_many(self, keys, version=None):
+        keys_map = await self._amake_keys_map(keys)
+        caches = await self._delegate.aget_many(list(keys_map.keys()), version=version)
+        return {keys_map[key]: value for key, value in caches.items()}
+
+    async def aset(self, key, value, timeout=None, version=None):
+        return await self._delegate.aset(await self._amake_key(key), value, timeout=timeout, version=version)
+
+    async def aset_many(self, data, timeout=None, version=None):
+        await self._aload_generation()
+        return await self._delegate.aset_many(
+            {self._make_key(key): value for key, value in data.items()}, timeout=timeout, version=version
+        )
+
+    async def atouch(self, key, timeout=None, version=None):
+        return await self._delegate.atouch(await self._amake_key(key), timeout, version=version)
+
+    async def adelete(self, key, version=None):
+        return await self._delegate.adelete(await self._amake_key(key), version=version)
+
+    async def adelete_many(self, keys, version=None):
+        keys_map = await self._amake_keys_map(keys)
+        return await self._delegate.adelete_many(list(keys_map.keys()), version=version)
+
+    async def _amake_key(self, key):
+        await self._aload_generation()
+        return self._make_key(key)
+
+    async def _amake_keys_map(self, keys):
+        await self._aload_generation()
+        return self._make_keys_map(keys)
+
+    async def _aload_generation(self):
+        """Awaits reading of generation of the current namespace, if it is not memoized yet."""
+        namespace = self._namespaces.current()
+        if namespace is not None and not self._namespaces.has_generation(namespace):
+            generation = await self._delegate.aget(self._namespaces.make_generation_key(namespace))
+            if generation is None:
+                generation = await run_sync(self._namespaces.create_generation, namespace, self._delegate)
+            self._namespaces.set_generation(namespace, generation, self._delegate)
+
+
+class AsyncSlidingTagTimeoutCacheDecorator(cache.SlidingTagTimeoutCacheDecorator):
+    """Async counterpart of SlidingTagTimeoutCacheDecorator."""
+
+    async def aget_many(self, keys, version=None):
+        caches = await self._delegate.aget_many(keys, version=version)
+        for key in self._get_due_keys(caches, version):
+            await self._atouch(key, version)
+        return caches
+
+    async def _atouch(self, key, version):
+        timeout = dependencies.TagsDependency.get_tag_timeout()
+        try:
+            return await self._delegate.atouch(key, timeout, version=version)
+        except (AttributeError, NotImplementedError):
+            return False
+
+
+class AsyncTransactionInvalidationsCacheDecorator(cache.TransactionInvalidationsCacheDecorator):
+    """Async counterpart of TransactionInvalidationsCacheDecorator."""
+
+    async def aget(self, key, default=None, version=None):
+        if key in self._get_deleted_keys(version):
+            return default
+        return await self._delegate.aget(key, default, version=version)
+
+    async def aget_many(self, keys, version=None):
+        deleted_keys = self._get_deleted_keys(version)
+        if deleted_keys:
+            keys = [key for key in keys if key not in deleted_keys]
+            if not keys:
+                return dict()
+        return await self._delegate.aget_many(keys, version=version)
+
+    async def aset(self, key, value, timeout=None, version=None):
+        data = self._filter_data({key: value}, timeout, version)
+        if data:
+            await self._delegate.aset(key, value, timeout=timeout, version=version)
+
+    async def aset_many(self, data, timeout=None, version=None):
+        data = self._filter_data(data, timeout, version)
+        if data:
+            await self._delegate.aset_many(data, timeout=timeout, version=version)
+
+    async def adelete(self, key, version=None):
+        keys = self._defer_delete_many([key], version)
+        if keys:
+            await self._delegate.adelete(key, version=version)
+
+    async def adelete_many(self, keys, version=None):
+        keys = self._defer_delete_many(keys, version)
+        if keys:
+            await self._delegate.adelete_many(keys, version=version)
+
+
+class AsyncCacheTagging(tagging.CacheTagging):
+    """Async counterpart of CacheTagging.
+
+    Synchronous API is available as well.
+    """
+    cache_wrapper_factory = AsyncCacheWrapper
+
+    async def aget_or_set_callback(self, key, callback, tags=(), timeout=None,
+                                   version=None, args=None, kwargs=None, fallback=None, allow_stale=True):
+        """Returns cache value if exists
+
+        Otherwise calls callback (can be coroutine function), sets cache value to it and returns it.
+        """
+        dependency, timeout, version = self._parse_set_args(tags, timeout, version)
+        return await self.cache.aget_or_set_callback(
+            key, callback, dependency, timeout, version, args, kwargs, fallback, allow_stale
+        )
+
+    async def aset(self, key, value, tags=(), timeout=None, version=None):
+        """Sets cache value and tags."""
+        dependency, timeout, version = self._parse_set_args(tags, timeout, version)
+        await self.cache.aset(key, value, dependency, timeout, version)
+
+    async def ainvalidate_tags(self, *tags, **kwargs):
+        """Invalidate specified tags"""
+        version = kwargs.get('version', None)
+        await self.cache.ainvalidate_dependency(self._parse_invalidate_args(tags), version)
@@ -1,7 +1,19 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, unicode_literals
+import math
+import time
+import hashlib
+import random
+import logging
 import warnings
-from cache_dependencies import interfaces, exceptions, dependencies
+import threading
+from contextlib import contextmanager
+from cache_dependencies import interfaces, exceptions, dependencies, locks, serializers, utils
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
 
 try:
     str = unicode  # Python 2.* compatible
@@ -11,27 +23,62 @@ except NameError:
     string_types = (str,)
     integer_types = (int,)
 
+logger = logging.getLogger(__name__)
+
 
 class CacheWrapper(object):  # Adapter
     """Supports for Django dependency."""
 
-    def __init__(self, cache, relation_manager, transaction):
+    # Version of format of packed data, see _pack_data()
+    ENVELOPE_VERSION = 2
+    ENVELOPE_GUARD_TAG = '__envelope_guard'
+
+    def __init__(self, cache, relation_manager, transaction, tag_version_generator=None,
+                 callback_lease=None, revalidation=None, early_recomputation=None,
+                 tag_keys_index=None, invalidation_epoch=None, tag_namespace_separator=None, namespaces=None):
         """Constructor of cache instance.
 
         :type cache: cache_dependencies.interfaces.ICache
         :type relation_manager: cache_dependencies.interfaces.IRelationManager
         :type transaction: cache_dependencies.interfaces.ITransactionManager
+        :type tag_version_generator: cache_dependencies.dependencies.TagVersionGenerator or None
+        :type callback_lease: cache_dependencies.locks.CallbackLease or None
+        :type revalidation: cache_dependencies.cache.StaleWhileRevalidate or None
+        :type early_recomputation: cache_dependencies.cache.EarlyRecomputation or None
+        :type tag_keys_index: cache_dependencies.cache.TagKeysIndex or None
+        :type invalidation_epoch: cache_dependencies.cache.InvalidationEpoch or None
+        :param tag_namespace_separator: enables hierarchical tags, see TagsDependency.get_namespace_tags()
+        :type tag_namespace_separator: str or None
+        :param namespaces: namespaces of cache, which is decorated by NamespaceCacheDecorator
+        :type namespaces: cache_dependencies.cache.CacheNamespaces or None
         """
+        if invalidation_epoch is not None:
+            cache = self._make_invalidation_epoch_decorator(cache, invalidation_epoch)
         self.cache = cache
         self.ignore_descendants = False
         self.transaction = transaction
         self.relation_manager = relation_manager
+        self.tag_version_generator = tag_version_generator
+        self.callback_lease = callback_lease
+        self.revalidation = revalidation
+        self.early_recomputation = early_recomputation
+        self.tag_keys_index = tag_keys_index
+        self.invalidation_epoch = invalidation_epoch
+        self.tag_namespace_separator = tag_namespace_separator
+        self.namespaces = namespaces
 
     def get_or_set_callback(self, key, callback, dependency, timeout=None,
-                            version=None, args=None, kwargs=None):
+                            version=None, args=None, kwargs=None, fallback=None, allow_stale=True):
         """Returns cache value if exists
 
         Otherwise calls cache_funcs, sets cache value to it and returns it.
+        If callback_lease is set, only one caller calls callback,
+        concurrent callers wait for its result. If it is not ready in time,
+        they return fallback, or call callback themselves if fallback is None.
+        If revalidation is set and allow_stale is True, invalidated value
+        can be returned while it is recomputed, see StaleWhileRevalidate.
+        If early_recomputation is set, valid value can be recomputed
+        before its expiration, see EarlyRecomputation.
 
         :type key: str
         :type callback: collections.Callable
@@ -40,14 +87,40 @@ class CacheWrapper(object):  # Adapter
         :type version: int or None
         :type args: tuple
         :type kwargs: dict
+        :type fallback: object
+        :type allow_stale: bool
         """
-        value = self.get(key, version=version)
-        if value is None:
-            args = args or []
-            kwargs = kwargs or {}
-            value = callback(*args, **kwargs)
-            self.set(key, value, dependency, timeout, version)
-        return value
+        data, epoch = self._read_data(key, version)
+        valid_data = self._validate_data(key, data, epoch, version)
+        value = None if valid_data is None else self._unpack_value(valid_data)
+        if value is not None:
+            due, token = self._begin_early_recomputation(valid_data, key, version)
+            if not due:
+                return value
+            return self._call_and_set(key, callback, dependency, timeout, version, args, kwargs, token)
+        token = None
+        if allow_stale and self.revalidation is not None:
+            # Invalid data is already read, so, stale value costs no round trip.
+            data, token = self._get_stale_data(data, key, version)
+            if data is not None and (token is None or self.revalidation.executor is not None):
+                if token is not None:
+                    self.revalidation.executor.submit(
+                        self._revalidate, key, callback, dependency, timeout, version, args, kwargs, token
+                    )
+                self.finish(key, self._unpack_dependency(data), version=version)
+                return self._unpack_value(data)
+        if token is None and self.callback_lease is not None:
+            token = self.callback_lease.acquire(self.cache, key, version)
+            if token is None:
+                value = self.callback_lease.wait(
+                    self.cache, key, version, lambda: self.get(key, version=version, abort=True)
+                )
+                if value is not None:
+                    return value
+                if fallback is not None:
+                    self.abort(key)
+                    return fallback
+        return self._call_and_set(key, callback, dependency, timeout, version, args, kwargs, token)
 
     def get(self, key, default=None, version=None, abort=False):
         """Gets cache value.
@@ -59,22 +132,68 @@ class CacheWrapper(object):  # Adapter
         :type version: int or None
         :type abort: bool
         """
+        data = self._get_valid_data(key, version, abort)
+        if data is None:
+            return default
+        # Value is deserialized only after validation.
+        return self._unpack_value(data)
+
+    def _get_valid_data(self, key, version, abort=False):
+        """Returns packed data of valid cache, or None.
+
+        :type key: str
+        :type version: int or None
+        :type abort: bool
+        :rtype: dict or None
+        """
+        data, epoch = self._read_data(key, version, abort)
+        return self._validate_data(key, data, epoch, version)
+
+    def _read_data(self, key, version, abort=False):
+        """Returns packed data of cache (valid or not), and invalidation epoch.
+
+        :type key: str
+        :type version: int or None
+        :type abort: bool
+        :rtype: (dict or None, str or None)
+        """
         if not abort and not self.ignore_descendants:
             self.begin(key)
-        data = self.cache.get(key, None, version)
+        if self.invalidation_epoch is None:
+            return self.cache.get(key, None, version), None
+        caches, epoch = self._get_many_with_epoch([key], version)
+        return caches.get(key), epoch
+
+    def _validate_data(self, key, data, epoch, version):
+        """Returns packed data if it is valid, otherwise None.
+
+        :type key: str
+        :type data: dict or None
+        :type epoch: str or None
+        :type version: int or None
+        :rtype: dict or None
+        """
         if data is None:
-            return default
+            return None
 
-        value, dependency = self._unpack_data(data)
+        dependency = self._unpack_dependency(data)
 
-        deferred = dependency.validate(self.cache, version)
-        try:
-            deferred.get()
-        except exceptions.DependencyInvalid:
-            return default
+        tags_dependency = self._get_single_tags_dependency(dependency)
+        if self.invalidation_epoch is not None and self.invalidation_epoch.is_actual(data, epoch):
+            pass  # Nothing is invalidated since the cache is set
+        elif tags_dependency is not None:
+            # Fast path for the most common case
+            if not tags_dependency.is_valid(self.cache, version):
+                return None
+        else:
+            deferred = dependency.validate(self.cache, version)
+            try:
+                deferred.get()
+            except exceptions.DependencyInvalid:
+                return None
 
         self.finish(key, dependency, version=version)
-        return value
+        return data
 
     def get_many(self, keys, version=None, abort=False):
         """
@@ -82,66 +201,246 @@ class CacheWrapper(object):  # Adapter
         :type version: int or None
         :type abort: bool
         """
+        keys = list(keys)
+        self._begin_many(keys, abort)
+        if self.invalidation_epoch is None:
+            caches, epoch = self.cache.get_many(keys, version), None
+        else:
+            caches, epoch = self._get_many_with_epoch(keys, version)
+
+        cache_dependencies = {key: self._unpack_dependency(data) for key, data in caches.items()}
+        composite_dependency = self._make_composite_dependency(caches, cache_dependencies, epoch)
+        deferred = composite_dependency.validate(self.cache, version)
+        return self._get_valid_many(caches, cache_dependencies, deferred, version)
+
+    def _get_many_with_epoch(self, keys, version):
+        """Reads caches together with invalidation epoch, by single round trip.
+
+        :type keys: list[str]
+        :type version: int or None
+        :rtype: (dict, str or None)
+        """
+        caches = self.cache.get_many(self.invalidation_epoch.make_keys(keys), version)
+        return caches, self.invalidation_epoch.pop(caches)
+
+    def _make_composite_dependency(self, caches, cache_dependencies, epoch):
+        """Returns dependency of caches which should be validated, i.e. set before the last invalidation."""
+        if self.invalidation_epoch is None:
+            return dependencies.CompositeDependency(*cache_dependencies.values())
+        return dependencies.CompositeDependency(*(
+            dependency for key, dependency in cache_dependencies.items()
+            if not self.invalidation_epoch.is_actual(caches[key], epoch)
+        ))
+
+    def set(self, key, value, dependency=None, timeout=None, version=None):
+        """Sets cache value and dependency.
+
+        :type key: str
+        :type value: object
+        :type dependency: cache_dependencies.interfaces.IDependency or None
+        :type timeout: int or None
+        :type version: int or None
+        """
+        data = self._evaluate_data(key, value, dependency, version)
+        self._set_revalidated(key, version)
+        if data is not None:
+            self._add_to_index(key, data, version)
+            return self.cache.set(key, data, timeout, version)
+
+    def _call_and_set(self, key, callback, dependency, timeout, version, args, kwargs, token=None):
+        """Calls callback and sets cache value to its result, with recorded time of computation."""
+        try:
+            started_at = time.time()
+            value = callback(*(args or ()), **(kwargs or {}))
+            data = self._evaluate_data(
+                key, value, dependency, version, self._make_recomputation(time.time() - started_at, timeout)
+            )
+            if data is not None:
+                self._add_to_index(key, data, version)
+                self.cache.set(key, data, timeout, version)
+            self._set_revalidated(key, version)
+        finally:
+            self._release_lease(key, token, version)
+        return value
+
+    def invalidate_dependency(self, dependency, version=None):
+        """Invalidate dependency.
+
+        :type dependency: cache_dependencies.interfaces.IDependency
+        :type version: int or None
+        """
+        self.transaction.current().add_dependency(dependency, version=version)
+        dependency.invalidate(self.cache, version)
+        if self.tag_keys_index is not None:
+            tags = self._get_tags(dependency)
+            if tags:
+                self.tag_keys_index.pop(self.cache, tags, version)
+
+    def activate_namespace(self, namespace):
+        """Returns context manager, within which keys are isolated by given namespace.
+
+        :type namespace: str or None
+        """
+        return self.namespaces.activate(namespace)
+
+    def invalidate_namespace(self, namespace):
+        """Drops all caches and tags of namespace by single cache.incr().
+
+        :type namespace: str
+        """
+        self.namespaces.drop(self.cache, namespace)
+
+    def _add_to_index(self, key, data, version):
+        """Adds key to reverse index of its tags, including tags of descendants."""
+        if self.tag_keys_index is not None:
+            tags = self._get_tags(self._unpack_dependency(data))
+            if tags:
+                self.tag_keys_index.add(self.cache, key, tags, version)
+
+    def _get_stale_data(self, data, key, version):
+        """Returns stale data within grace period, and token of refresh lease, if it's acquired.
+
+        :type data: dict or None
+        :type key: str
+        :type version: int or None
+        :rtype: (dict or None, str or None)
+        """
+        if data is None or (self._is_packed_data(data) and not self._is_actual_envelope(data)):
+            return None, None  # Missed or unknown format
+        if not self.revalidation.is_in_grace(self.cache, key, version):
+            return None, None
+        return data, self.revalidation.lease.acquire(self.cache, key, version)
+
+    def _set_revalidated(self, key, version):
+        if self.revalidation is not None:
+            self.revalidation.reset(self.cache, key, version)
+
+    def _release_lease(self, key, token, version):
+        if token is not None:
+            (self.callback_lease or self.revalidation.lease).release(self.cache, key, token, version)
+
+    def _revalidate(self, key, callback, dependency, timeout, version, args, kwargs, token):
+        """Recomputes stale value in background."""
+        try:
+            if not self.ignore_descendants:
+                self.begin(key)
+            self._call_and_set(key, callback, dependency, timeout, version, args, kwargs, token)
+        except Exception:
+            logger.exception("Revalidation of cache %r is failed", key)
+
+    def _make_recomputation(self, delta, timeout):
+        if self.early_recomputation is None:
+            return None
+        return self.early_recomputation.make_recomputation(delta, timeout)
+
+    def _begin_early_recomputation(self, data, key, version):
+        """Returns (True, token of lease) if valid value should be recomputed early.
+
+        :type data: dict
+        :type key: str
+        :type version: int or None
+        :rtype: (bool, str or None)
+        """
+        if self.early_recomputation is None or not self.early_recomputation.is_due(data):
+            return False, None
+        token = None
+        lease = self._get_recomputation_lease()
+        if lease is not None:
+            token = lease.acquire(self.cache, key, version)
+            if token is None:
+                return False, None  # Other caller recomputes it already
+        if not self.ignore_descendants:
+            self.begin(key)
+        return True, token
+
+    def _get_recomputation_lease(self):
+        """
+        :rtype: cache_dependencies.locks.CallbackLease or None
+        """
+        return self.callback_lease or (self.revalidation and self.revalidation.lease)
+
+    def _begin_many(self, keys, abort):
         if not abort and not self.ignore_descendants:
             current_cache_node = self.relation_manager.current()
             for key in keys:
                 self.begin(key)
                 self.relation_manager.current(current_cache_node)
 
-        caches = self.cache.get_many(keys, version)
-
-        cache_values, cache_dependencies = dict(), dict()
-        for key, data in caches.items():
-            cache_values[key], cache_dependencies[key] = self._unpack_data(data)
+    def _get_valid_many(self, caches, cache_dependencies, deferred, version):
+        """Returns unpacked values of caches with valid dependencies.
 
+        :type caches: dict
+        :type cache_dependencies: dict
+        :type deferred: cache_dependencies.interfaces.IDeferred
+        :type version: int or None
+        :rtype: dict
+        """
         dependencies_reversed = {v: k for k, v in cache_dependencies.items()}
-        composite_dependency = dependencies.CompositeDependency(*cache_dependencies.values())
-        deferred = composite_dependency.validate(self.cache, version)
         try:
             deferred.get()
         except exceptions.DependencyInvalid as composite_error:
             for dependency_error in composite_error:
-                cache_values.pop(dependencies_reversed[dependency_error.dependency], None)
+                caches.pop(dependencies_reversed[dependency_error.dependency], None)
 
-        for key in cache_values:  # Looping through filtered result
+        cache_values = dict()
+        for key, data in caches.items():  # Looping through filtered result
             self.finish(key, cache_dependencies[key], version=version)
+            cache_values[key] = self._unpack_value(data)
         return cache_values
 
-    def set(self, key, value, dependency=None, timeout=None, version=None):
-        """Sets cache value and dependency.
+    def _evaluate_data(self, key, value, dependency, version, recomputation=None):
+        """Returns packed data to be stored, or None if dependency is locked.
 
         :type key: str
         :type value: object
         :type dependency: cache_dependencies.interfaces.IDependency or None
-        :type timeout: int or None
         :type version: int or None
+        :type recomputation: tuple or None
+        :rtype: dict or None
         """
-        if dependency is None:
-            dependency = dependencies.DummyDependency()
-        combined_dependency_with_descendants = dependencies.CompositeDependency()
-        combined_dependency_with_descendants.extend(dependency)
-        combined_dependency_with_descendants.extend(self.relation_manager.get(key).get_dependency(version))
-
+        dependency, combined_dependency_with_descendants = self._combine_dependency(key, dependency, version)
         try:
-            self.transaction.current().evaluate(combined_dependency_with_descendants, version)
+            epoch = self._evaluate_dependency(self.transaction.current(), combined_dependency_with_descendants, version)
             # if tags will be invalidated again during this time by concurrent transaction - no problem, we just
             # save cache with invalid tags, and no one can read this cache.
         except exceptions.DependencyLocked:
-            pass
+            return None
         else:
-            return self.cache.set(key, self._pack_data(value, combined_dependency_with_descendants), timeout, version)
+            return self._pack_data(value, combined_dependency_with_descendants, recomputation, epoch)
         finally:
             self.finish(key, dependency, version=version)
 
+    def _combine_dependency(self, key, dependency, version):
+        """Returns dependency and its combination with dependencies of descendants.
 
-    def invalidate_dependency(self, dependency, version=None):
-        """Invalidate dependency.
+        :type key: str
+        :type dependency: cache_dependencies.interfaces.IDependency or None
+        :type version: int or None
+        :rtype: (cache_dependencies.interfaces.IDependency, cache_dependencies.dependencies.CompositeDependency)
+        """
+        if dependency is None:
+            dependency = dependencies.DummyDependency()
+        combined_dependency_with_descendants = dependencies.CompositeDependency()
+        combined_dependency_with_descendants.extend(dependency)
+        combined_dependency_with_descendants.extend(self.relation_manager.get(key).get_dependency(version))
+        return dependency, combined_dependency_with_descendants
+
+    def _evaluate_dependency(self, transaction, dependency, version):
+        """Evaluates dependency, returns invalidation epoch.
 
+        Uses only cache and given transaction, so, it can be called by other thread.
+
+        :type transaction: cache_dependencies.interfaces.ITransaction
         :type dependency: cache_dependencies.interfaces.IDependency
         :type version: int or None
+        :rtype: str or None
         """
-        self.transaction.current().add_dependency(dependency, version=version)
-        dependency.invalidate(self.cache, version)
+        # Epoch is read before tag versions, so, concurrent invalidation can't be missed.
+        epoch = None
+        if self.invalidation_epoch is not None:
+            epoch = self.invalidation_epoch.get_or_create(self.cache, version)
+        transaction.evaluate(dependency, version)
+        return epoch
 
     def begin(self, key):
         """Start cache creating.
@@ -169,31 +468,955 @@ class CacheWrapper(object):  # Adapter
     def close(self):
         self.transaction.flush()
         self.relation_manager.clear()
+        if self.namespaces is not None:
+            self.namespaces.reset()
         # self.cache.close()  # should be closed directly or by signal, for example, request_finished in Django.
 
+    @classmethod
+    def _get_tags(cls, dependency):
+        """Returns tags of all nested TagsDependency.
+
+        :type dependency: cache_dependencies.interfaces.IDependency
+        :rtype: set
+        """
+        if isinstance(dependency, dependencies.TagsDependency):
+            return set(dependency.tags)
+        tags = set()
+        for delegate in getattr(dependency, 'delegates', ()):
+            tags |= cls._get_tags(delegate)
+        return tags
+
     @staticmethod
-    def _pack_data(value, dependency):
-        return {
-            '__value': value,
-            '__dependency': dependency,
+    def _get_single_tags_dependency(dependency):
+        """Returns TagsDependency if it is the only meaningful dependency, otherwise None.
+
+        :type dependency: cache_dependencies.interfaces.IDependency
+        :rtype: cache_dependencies.dependencies.TagsDependency or None
+        """
+        if type(dependency) is dependencies.TagsDependency:
+            return dependency
+        if type(dependency) is not dependencies.CompositeDependency:
+            return None
+        tags_dependency = None
+        for delegate in dependency.delegates:
+            delegate_type = type(delegate)
+            if delegate_type is dependencies.DummyDependency:
+                continue
+            elif delegate_type is dependencies.TagsDependency and tags_dependency is None:
+                tags_dependency = delegate
+            else:
+                return None
+        return tags_dependency
+
+    @staticmethod
+    def _make_invalidation_epoch_decorator(cache, invalidation_epoch):
+        return InvalidationEpochCacheDecorator(cache, invalidation_epoch)
+
+    @classmethod
+    def _pack_data(cls, value, dependency, recomputation=None, epoch=None):
+        # Value is stored as raw bytes, so, backend deserializes only small
+        # dependency header, and value is deserialized only for valid cache.
+        # Backend serializes the bytes again, but it's a plain copy without traversal of the value.
+        encoded_dependency = serializers.dumps(dependency)
+        data = {
+            '__envelope': cls.ENVELOPE_VERSION,
+            # Readers of other formats see '__value' and '__dependency' only,
+            # so, they validate the envelope guard and treat the cache as missed.
+            '__value': None,
+            '__dependency': cls._get_envelope_guard(),
+            '__header': dependency if encoded_dependency is None else encoded_dependency,
+            '__pickled_value': pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
         }
+        if recomputation is not None:
+            data['__recomputation'] = recomputation
+        if epoch is not None:
+            data['__epoch'] = epoch
+        return data
+
+    @classmethod
+    def _get_envelope_guard(cls):
+        """Returns dependency which is never valid.
+
+        :rtype: cache_dependencies.dependencies.TagsDependency
+        """
+        guard = dependencies.TagsDependency(cls.ENVELOPE_GUARD_TAG)
+        guard.tag_versions = {cls.ENVELOPE_GUARD_TAG: 'envelope_{0}'.format(cls.ENVELOPE_VERSION)}
+        return guard
 
     @classmethod
     def _unpack_data(cls, data):
-        if cls._is_packed_data(data):
-            return data['__value'], data['__dependency']
-        else:
-            return data, dependencies.DummyDependency()
+        return cls._unpack_value(data), cls._unpack_dependency(data)
+
+    @classmethod
+    def _unpack_value(cls, data):
+        if not cls._is_packed_data(data):
+            return data
+        elif cls._is_actual_envelope(data):
+            return pickle.loads(data['__pickled_value'])
+        else:  # Backward compatibility, and guard of unknown formats
+            return data['__value']
+
+    @classmethod
+    def _unpack_dependency(cls, data):
+        if not cls._is_packed_data(data):
+            return dependencies.DummyDependency()
+        elif cls._is_actual_envelope(data):
+            dependency = data['__header']
+            if isinstance(dependency, bytes):
+                dependency = serializers.loads(dependency)
+            return dependency
+        else:  # Backward compatibility, and guard of unknown formats
+            return data['__dependency']
 
     @staticmethod
     def _is_packed_data(data):
         return isinstance(data, dict) and '__dependency' in data and '__value' in data
 
+    @classmethod
+    def _is_actual_envelope(cls, data):
+        return data.get('__envelope') == cls.ENVELOPE_VERSION
+
     def __getattr__(self, name):
         """Delegate for all native methods."""
         return getattr(self.cache, name)
 
 
+class EarlyRecomputation(object):
+    """Probabilistic early recomputation of cache value (XFetch).
+
+    Time of computation (delta) and expiration time are recorded with the value.
+    The value is recomputed before its expiration with probability,
+    which grows as expiration approaches, and expensive values are recomputed earlier:
+    now - delta * beta * log(random()) >= expiry.
+    See "Optimal Probabilistic Cache Stampede Prevention", A. Vattani et al.
+    """
+
+    def __init__(self, beta=1.0):
+        """
+        :param beta: > 1.0 favors earlier recomputation, < 1.0 - later
+        :type beta: float
+        """
+        self.beta = beta
+
+    def make_recomputation(self, delta, timeout):
+        """Returns (delta, expiry) to be stored with the value, or None if value has no expiration.
+
+        :type delta: float
+        :type timeout: int or None
+        :rtype: tuple or None
+        """
+        if not isinstance(timeout, integer_types + (float,)) or timeout <= 0:
+            return None
+        return delta, self._current_time() + timeout
+
+    def is_due(self, data):
+        """
+        :type data: dict
+        :rtype: bool
+        """
+        recomputation = data.get('__recomputation') if isinstance(data, dict) else None
+        if not recomputation:
+            return False
+        delta, expiry = recomputation
+        return self._current_time() - delta * self.beta * math.log(1.0 - random.random()) >= expiry
+
+    @staticmethod
+    def _current_time():
+        return time.time()
+
+
+class StaleWhileRevalidate(object):
+    """Serving of invalidated cache values while they are recomputed.
+
+    Invalidated value is served within grace period since its invalidity
+    has been detected first. Only holder of refresh lease recomputes the value,
+    in background by executor if it is given, otherwise synchronously.
+    Other callers are served by stale value meanwhile.
+    """
+    MARKER_KEY_PREFIX = 'stale_'
+    MARKER_TIMEOUT = 24 * 3600
+
+    def __init__(self, grace=30, executor=None, lease_timeout=None):
+        """
+        :type grace: int
+        :type executor: concurrent.futures.Executor or None
+        :param lease_timeout: max expected time of recomputation, grace by default
+        :type lease_timeout: int or None
+        """
+        self.grace = grace
+        self.executor = executor
+        self.lease = locks.CallbackLease(timeout=lease_timeout or grace, wait_timeout=0)
+
+    def make_marker_key(self, key):
+        """
+        :type key: str
+        :rtype: str
+        """
+        return '{0}{1}'.format(self.MARKER_KEY_PREFIX, key)
+
+    def is_in_grace(self, cache, key, version):
+        """Returns True if value is stale not longer than grace period.
+
+        :type cache: cache_dependencies.interfaces.ICache
+        :type key: str
+        :type version: int or None
+        :rtype: bool
+        """
+        marker_key = self.make_marker_key(key)
+        now = self._current_time()
+        if cache.add(marker_key, now, self.MARKER_TIMEOUT, version):
+            return True
+        detected_at = cache.get(marker_key, None, version)
+        return detected_at is None or now - detected_at <= self.grace
+
+    def reset(self, cache, key, version):
+        """Called when value is recomputed.
+
+        :type cache: cache_dependencies.interfaces.ICache
+        :type key: str
+        :type version: int or None
+        """
+        cache.delete(self.make_marker_key(key), version)
+
+    @staticmethod
+    def _current_time():
+        return time.time()
+
+
+class TagKeysIndex(object):
+    """Reverse index of cache keys by tags, to delete invalidated entries eagerly.
+
+    Without index, invalidated entries occupy memory of cache until they expire.
+    Keys of each tag are sharded by hash of key, and each shard keeps
+    not more than max_size last keys. Index is maintained by read-modify-write
+    without locking, so, it is the best effort only: entries missed by index
+    are still invalidated lazily by tag versions.
+    """
+    KEY_PREFIX = 'index_'
+    TIMEOUT = dependencies.TagsDependency.TAG_TIMEOUT
+
+    def __init__(self, shards=16, max_size=1000, timeout=None):
+        """
+        :type shards: int
+        :type max_size: int
+        :param timeout: timeout of index, the same as timeout of tag versions by default
+        :type timeout: int or None
+        """
+        self.shards = shards
+        self.max_size = max_size
+        self.timeout = timeout or self.TIMEOUT
+
+    def make_key(self, tag, shard):
+        """
+        :type tag: str
+        :type shard: int
+        :rtype: str
+        """
+        return '{0}{1}_{2}'.format(self.KEY_PREFIX, self._hash(tag), shard)
+
+    def make_keys(self, tags, key=None):
+        """Returns index keys of shards of given cache key, or of all shards.
+
+        :type tags: collections.Iterable[str]
+        :type key: str or None
+        :rtype: list[str]
+        """
+        shards = range(self.shards) if key is None else (int(self._hash(key)[:8], 16) % self.shards,)
+        return [self.make_key(tag, shard) for tag in tags for shard in shards]
+
+    def add(self, cache, key, tags, version):
+        """
+        :type cache: cache_dependencies.interfaces.ICache
+        :type key: str
+        :type tags: collections.Iterable[str]
+        :type version: int or None
+        """
+        index_keys = self.make_keys(tags, key)
+        data = self.update(cache.get_many(index_keys, version), index_keys, key)
+        if data:
+            cache.set_many(data, self.timeout, version)
+
+    def update(self, caches, index_keys, key):
+        """Returns shards to be written.
+
+        :type caches: dict
+        :type index_keys: list[str]
+        :type key: str
+        :rtype: dict
+        """
+        data = dict()
+        for index_key in index_keys:
+            keys = caches.get(index_key) or []
+            if key not in keys:
+                data[index_key] = (keys + [key])[-self.max_size:]
+        return data
+
+    def pop(self, cache, tags, version):
+        """Deletes entries of given tags together with their index.
+
+        :type cache: cache_dependencies.interfaces.ICache
+        :type tags: collections.Iterable[str]
+        :type version: int or None
+        :rtype: list[str]
+        """
+        caches = cache.get_many(self.make_keys(tags), version)
+        keys = self.collect(caches)
+        if caches:
+            cache.delete_many(keys + list(caches.keys()), version=version)
+        return keys
+
+    @staticmethod
+    def collect(caches):
+        """
+        :type caches: dict
+        :rtype: list[str]
+        """
+        keys = set()
+        for shard in caches.values():
+            keys.update(shard)
+        return sorted(keys)
+
+    @staticmethod
+    def _hash(value):
+        return hashlib.md5(str(value).encode('utf-8')).hexdigest()
+
+
+class InvalidationEpoch(object):
+    """Version of the whole cache (or namespace), which is changed by any invalidation.
+
+    The epoch is recorded with each cache value, and if it is not changed since,
+    validation of tags is skipped. It is stored as version of implicit tag,
+    so, it is deleted together with invalidated tags (the last one),
+    can be served by local tag versions, and its deletion is deferred within transaction.
+    """
+    TAG_PREFIX = '__epoch__'
+
+    def __init__(self, namespace=''):
+        """
+        :type namespace: str
+        """
+        self.namespace = namespace
+        self.key = utils.make_tag_keys('{0}{1}'.format(self.TAG_PREFIX, namespace)).version
+
+    def make_keys(self, keys):
+        """Returns keys to be read together with the epoch.
+
+        :type keys: list[str]
+        :rtype: list[str]
+        """
+        return list(keys) + [self.key]
+
+    def pop(self, caches):
+        """Pops the epoch from result of cache.get_many(self.make_keys(keys)).
+
+        :type caches: dict
+        :rtype: str or None
+        """
+        return caches.pop(self.key, None)
+
+    def get_or_create(self, cache, version):
+        """
+        :type cache: cache_dependencies.interfaces.ICache
+        :type version: int or None
+        :rtype: str or None
+        """
+        epoch = cache.get_many([self.key], version).get(self.key)
+        if epoch is None:
+            epoch = utils.generate_tag_version()
+            if not cache.add(self.key, epoch, dependencies.TagsDependency.get_tag_timeout(), version):
+                epoch = cache.get_many([self.key], version).get(self.key)
+        return epoch
+
+    @staticmethod
+    def is_actual(data, epoch):
+        """Returns True if nothing is invalidated since the cache is set.
+
+        :type data: dict
+        :type epoch: str or None
+        :rtype: bool
+        """
+        return (epoch is not None and isinstance(data, dict) and data.get('__epoch') == epoch and
+                data.get('__envelope') == CacheWrapper.ENVELOPE_VERSION)
+
+
+class InvalidationEpochCacheDecorator(object):
+    """Changes invalidation epoch on each deletion of tag versions."""
+
+    def __init__(self, delegate, invalidation_epoch):
+        """
+        :type delegate: cache_dependencies.interfaces.ICache
+        :type invalidation_epoch: cache_dependencies.cache.InvalidationEpoch
+        """
+        self._delegate = delegate
+        self._invalidation_epoch = invalidation_epoch
+
+    def delete(self, key, version=None):
+        if utils.is_tag_key(key):
+            return self.delete_many([key], version=version)
+        return self._delegate.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        return self._delegate.delete_many(self._add_epoch_key(keys), version=version)
+
+    def _add_epoch_key(self, keys):
+        keys = list(keys)
+        epoch_key = self._invalidation_epoch.key
+        if epoch_key not in keys and any(utils.is_tag_key(key) for key in keys):
+            keys.append(epoch_key)  # The last one, after tag versions
+        return keys
+
+    def __getattr__(self, name):
+        """Delegate for all native methods."""
+        return getattr(self._delegate, name)
+
+
+class CacheNamespaces(object):
+    """Namespaces of cache, for example, tenants or site sections.
+
+    Generation of namespace is folded into all keys of the namespace
+    (values and tags) by NamespaceCacheDecorator, so, the whole namespace is dropped
+    by single cache.incr() of its generation. Generation is read once within
+    execution context (i.e. request) and is memoized until reset().
+    """
+    GENERATION_KEY_PREFIX = 'generation_'
+    GENERATION_TIMEOUT = 30 * 24 * 3600
+
+    def __init__(self):
+        self._context = utils.ContextLocal()
+
+    def current(self):
+        """
+        :rtype: str or None
+        """
+        return getattr(self._context, 'namespace', None)
+
+    @contextmanager
+    def activate(self, namespace):
+        """
+        :type namespace: str or None
+        """
+        previous = self.current()
+        self._context.namespace = namespace
+        try:
+            yield
+        finally:
+            self._context.namespace = previous
+
+    def make_generation_key(self, namespace):
+        """
+        :type namespace: str
+        :rtype: str
+        """
+        return '{0}{1}'.format(self.GENERATION_KEY_PREFIX, namespace)
+
+    def is_generation_key(self, key):
+        """
+        :type key: str
+        :rtype: bool
+        """
+        return key.startswith(self.GENERATION_KEY_PREFIX)
+
+    def has_generation(self, namespace):
+        """Returns True if generation of namespace is memoized.
+
+        :type namespace: str
+        :rtype: bool
+        """
+        return namespace in self._get_memo()
+
+    def get_generation(self, cache, namespace):
+        """
+        :type cache: cache_dependencies.interfaces.ICache
+        :type namespace: str
+        :rtype: int
+        """
+        if not self.has_generation(namespace):
+            self.set_generation(namespace, cache.get(self.make_generation_key(namespace)), cache)
+        return self._get_memo()[namespace]
+
+    def set_generation(self, namespace, generation, cache):
+        """Memoizes generation read from cache, or creates it if it is None.
+
+        :type namespace: str
+        :type generation: int or None
+        :type cache: cache_dependencies.interfaces.ICache
+        """
+        if generation is None:
+            generation = self.create_generation(namespace, cache)
+        self._get_memo()[namespace] = generation
+
+    def create_generation(self, namespace, cache):
+        """Creates generation in cache, returns it (or generation created concurrently).
+
+        :type namespace: str
+        :type cache: cache_dependencies.interfaces.ICache
+        :rtype: int
+        """
+        # Random initial value, so, generation lost by eviction is not repeated.
+        generation = utils.generate_int_tag_version()
+        generation_key = self.make_generation_key(namespace)
+        if not cache.add(generation_key, generation, self.GENERATION_TIMEOUT):
+            generation = cache.get(generation_key) or generation
+        return generation
+
+    def drop(self, cache, namespace):
+        """
+        :type cache: cache_dependencies.interfaces.ICache
+        :type namespace: str
+        """
+        try:
+            cache.incr(self.make_generation_key(namespace))
+        except ValueError:
+            pass  # Generation does not exist, so, the new one will be created.
+        self._get_memo().pop(namespace, None)
+
+    def make_key(self, key, namespace, generation):
+        """
+        :type key: str
+        :type namespace: str
+        :type generation: int
+        :rtype: str
+        """
+        return '{0}:{1}:{2}'.format(namespace, generation, key)
+
+    def reset(self):
+        """Forgets generations memoized by current execution context."""
+        self._context.generations = dict()
+
+    def _get_memo(self):
+        try:
+            return self._context.generations
+        except AttributeError:
+            self._context.generations = dict()
+            return self._context.generations
+
+
+class NamespaceCacheDecorator(object):
+    """Folds generation of the current namespace into keys.
+
+    Should be the outermost decorator of cache, so, local storages of other decorators
+    (LocalTagVersionsCacheDecorator, TransactionInvalidationsCacheDecorator)
+    are keyed by namespaced keys, and tag versions of namespaces are not shared.
+    """
+
+    def __init__(self, delegate, namespaces):
+        """
+        :type delegate: cache_dependencies.interfaces.ICache
+        :type namespaces: cache_dependencies.cache.CacheNamespaces
+        """
+        self._delegate = delegate
+        self._namespaces = namespaces
+
+    def add(self, key, value, timeout=None, version=None):
+        return self._delegate.add(self._make_key(key), value, timeout=timeout, version=version)
+
+    def get(self, key, default=None, version=None):
+        return self._delegate.get(self._make_key(key), default, version=version)
+
+    def set(self, key, value, timeout=None, version=None):
+        return self._delegate.set(self._make_key(key), value, timeout=timeout, version=version)
+
+    def touch(self, key, timeout=None, version=None):
+        return self._delegate.touch(self._make_key(key), timeout, version=version)
+
+    def delete(self, key, version=None):
+        return self._delegate.delete(self._make_key(key), version=version)
+
+    def get_many(self, keys, version=None):
+        keys_map = self._make_keys_map(keys)
+        caches = self._delegate.get_many(list(keys_map.keys()), version=version)
+        return {keys_map[key]: value for key, value in caches.items()}
+
+    def set_many(self, data, timeout=None, version=None):
+        data = {self._make_key(key): value for key, value in data.items()}
+        return self._delegate.set_many(data, timeout=timeout, version=version)
+
+    def delete_many(self, keys, version=None):
+        return self._delegate.delete_many(list(self._make_keys_map(keys).keys()), version=version)
+
+    def has_key(self, key, version=None):
+        return self._delegate.has_key(self._make_key(key), version=version)
+
+    def incr(self, key, delta=1, version=None):
+        return self._delegate.incr(self._make_key(key), delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        return self._delegate.decr(self._make_key(key), delta, version=version)
+
+    def __contains__(self, key):
+        return self.has_key(key)
+
+    def _make_key(self, key):
+        namespace = self._namespaces.current()
+        if namespace is None or self._namespaces.is_generation_key(key):
+            return key
+        generation = self._namespaces.get_generation(self._delegate, namespace)
+        return self._namespaces.make_key(key, namespace, generation)
+
+    def _make_keys_map(self, keys):
+        """Returns mapping of namespaced keys to original ones."""
+        return {self._make_key(key): key for key in keys}
+
+    def __getattr__(self, name):
+        """Delegate for all native methods."""
+        return getattr(self._delegate, name)
+
+
+class LocalTagVersions(object):
+    """Process-local storage of tag versions with bounded staleness.
+
+    Can be shared between threads, so, all operations are guarded by lock.
+    Keys are pairs (tag_key, version).
+    """
+
+    def __init__(self, timeout, max_size=10000):
+        """
+        :type timeout: float
+        :type max_size: int
+        """
+        self._timeout = timeout
+        self._max_size = max_size
+        self._data = dict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        """
+        :type keys: collections.Iterable[tuple]
+        :rtype: dict
+        """
+        now = self._current_time()
+        result = dict()
+        with self._lock:
+            for key in keys:
+                try:
+                    value, expire_time = self._data[key]
+                except KeyError:
+                    continue
+                if expire_time > now:
+                    result[key] = value
+                else:
+                    del self._data[key]
+        return result
+
+    def set_many(self, data):
+        """
+        :type data: dict
+        """
+        expire_time = self._current_time() + self._timeout
+        with self._lock:
+            if len(self._data) + len(data) > self._max_size:
+                self._cull()
+            for key, value in data.items():
+                self._data[key] = (value, expire_time)
+
+    def delete_many(self, keys):
+        """
+        :type keys: collections.Iterable[tuple]
+        """
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def _cull(self):
+        now = self._current_time()
+        for key, (value, expire_time) in list(self._data.items()):
+            if expire_time <= now:
+                del self._data[key]
+        if len(self._data) >= self._max_size:
+            self._data.clear()
+
+    @staticmethod
+    def _current_time():
+        return time.time()
+
+
+class TagTouches(object):
+    """Process-local schedule of extension of timeouts of tag versions.
+
+    Can be shared between threads, so, all operations are guarded by lock.
+    Keys are pairs (tag_key, version).
+    """
+
+    def __init__(self, interval=None, max_size=10000):
+        """
+        :param interval: min interval between touches of tag by process, quarter of TAG_TIMEOUT by default
+        :type interval: float or None
+        :type max_size: int
+        """
+        self._interval = interval or dependencies.TagsDependency.TAG_TIMEOUT / 4.0
+        self._max_size = max_size
+        self._data = dict()  # key -> time of the next touch
+        self._lock = threading.Lock()
+
+    def pop_due(self, keys):
+        """Returns keys which should be touched now, and schedules the next touch of them.
+
+        Touch of key seen first time is scheduled randomly within interval,
+        so, touches of processes started together are spread.
+
+        :type keys: collections.Iterable[tuple]
+        :rtype: list[tuple]
+        """
+        now = self._current_time()
+        due = []
+        with self._lock:
+            for key in keys:
+                touch_time = self._data.get(key)
+                if touch_time is None:
+                    if len(self._data) >= self._max_size:
+                        self._data.clear()
+                    self._data[key] = now + random.random() * self._interval
+                elif touch_time <= now:
+                    self._data[key] = now + self._interval
+                    due.append(key)
+        return due
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    @staticmethod
+    def _current_time():
+        return time.time()
+
+
+class SlidingTagTimeoutCacheDecorator(object):
+    """Extends timeouts of tag versions which are read, so, hot tags do not expire.
+
+    Each tag is touched not often than once per interval of TagTouches by process,
+    regardless of how near its expiration is, since the expiration time is unknown.
+    Tag versions are not extended by backends without native touch().
+    Tag versions read from local cache (LocalTagVersionsCacheDecorator) are not touched,
+    so, this decorator should be inner than it.
+    """
+
+    def __init__(self, delegate, tag_touches):
+        """
+        :type delegate: cache_dependencies.interfaces.ICache
+        :type tag_touches: cache_dependencies.cache.TagTouches
+        """
+        self._delegate = delegate
+        self._tag_touches = tag_touches
+
+    def get_many(self, keys, version=None):
+        caches = self._delegate.get_many(keys, version=version)
+        for key in self._get_due_keys(caches, version):
+            self._touch(key, version)
+        return caches
+
+    def _get_due_keys(self, caches, version):
+        return [key for key, _ in self._tag_touches.pop_due(
+            (key, version) for key in caches if utils.is_tag_key(key)
+        )]
+
+    def _touch(self, key, version):
+        timeout = dependencies.TagsDependency.get_tag_timeout()
+        try:
+            return self._delegate.touch(key, timeout, version=version)
+        except (AttributeError, NotImplementedError):
+            # Backend without native touch(). The tag version is never set again,
+            # since it could be invalidated after it was read, so, timeout of the tag
+            # is not extended, and only jitter of the timeout spreads expiration.
+            return False
+
+    def __getattr__(self, name):
+        """Delegate for all native methods."""
+        return getattr(self._delegate, name)
+
+
+class TransactionTagVersions(object):
+    """Accessor to memo of the current transaction.
+
+    Does nothing outside transaction.
+    """
+
+    def __init__(self, transaction):
+        """
+        :type transaction: cache_dependencies.interfaces.ITransactionManager
+        """
+        self._transaction = transaction
+
+    def get_many(self, keys):
+        memo = self._memo()
+        if memo is None:
+            return dict()
+        return memo.get_many(keys)
+
+    def set_many(self, data):
+        memo = self._memo()
+        if memo is not None:
+            memo.set_many(data)
+
+    def delete_many(self, keys):
+        memo = self._memo()
+        if memo is not None:
+            memo.delete_many(keys)
+
+    def clear(self):
+        memo = self._memo()
+        if memo is not None:
+            memo.clear()
+
+    def _memo(self):
+        return self._transaction.current().get_tag_versions_memo()
+
+
+class LocalTagVersionsCacheDecorator(object):
+    """Serves tag versions from process-local storage.
+
+    Only tag version keys are affected, all other keys
+    (cache values, tag states) are always read from delegate.
+    Own invalidations of current process are visible immediately,
+    invalidations of concurrent processes - after timeout of local storage.
+    """
+
+    def __init__(self, delegate, local_tag_versions):
+        """
+        :type delegate: cache_dependencies.interfaces.ICache
+        :type local_tag_versions: cache_dependencies.cache.LocalTagVersions or
+            cache_dependencies.cache.TransactionTagVersions
+        """
+        self._delegate = delegate
+        self._local = local_tag_versions
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        tag_keys = [key for key in keys if utils.is_tag_key(key)]
+        if not tag_keys:
+            return self._delegate.get_many(keys, version=version)
+
+        local_caches = self._local.get_many((key, version) for key in tag_keys)
+        result = {key: value for (key, _), value in local_caches.items()}
+        missed_keys = [key for key in keys if key not in result]
+        if missed_keys:
+            caches = self._delegate.get_many(missed_keys, version=version)
+            self._local.set_many({
+                (key, version): value for key, value in caches.items() if utils.is_tag_key(key)
+            })
+            result.update(caches)
+        return result
+
+    def set(self, key, value, timeout=None, version=None):
+        self._delegate.set(key, value, timeout=timeout, version=version)
+        if utils.is_tag_key(key):
+            self._local.set_many({(key, version): value})
+
+    def set_many(self, data, timeout=None, version=None):
+        self._delegate.set_many(data, timeout=timeout, version=version)
+        self._local.set_many({
+            (key, version): value for key, value in data.items() if utils.is_tag_key(key)
+        })
+
+    def delete(self, key, version=None):
+        if utils.is_tag_key(key):
+            self._local.delete_many([(key, version)])
+        self._delegate.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self._local.delete_many((key, version) for key in keys if utils.is_tag_key(key))
+        self._delegate.delete_many(keys, version=version)
+
+    def clear(self):
+        self._local.clear()
+        self._delegate.clear()
+
+    def __getattr__(self, name):
+        """Delegate for all native methods."""
+        return getattr(self._delegate, name)
+
+
+class TransactionInvalidationsCacheDecorator(object):
+    """Defers invalidation of tags until the current transaction finishes.
+
+    Tag versions deleted within transaction are hidden from own reads
+    of the transaction, and are deleted by single delete_many() when
+    the transaction finishes. Acquired tag states are written by single set_many()
+    right before. Does nothing outside transaction, and if isolation level
+    of transaction is READ UNCOMMITTED.
+    """
+
+    def __init__(self, delegate, transaction):
+        """
+        :type delegate: cache_dependencies.interfaces.ICache
+        :type transaction: cache_dependencies.interfaces.ITransactionManager
+        """
+        self._delegate = delegate
+        self._transaction = transaction
+
+    def get(self, key, default=None, version=None):
+        if key in self._get_deleted_keys(version):
+            return default
+        return self._delegate.get(key, default, version=version)
+
+    def get_many(self, keys, version=None):
+        deleted_keys = self._get_deleted_keys(version)
+        if deleted_keys:
+            keys = [key for key in keys if key not in deleted_keys]
+            if not keys:
+                return dict()
+        return self._delegate.get_many(keys, version=version)
+
+    def set(self, key, value, timeout=None, version=None):
+        data = self._filter_data({key: value}, timeout, version)
+        if data:
+            self._delegate.set(key, value, timeout=timeout, version=version)
+
+    def set_many(self, data, timeout=None, version=None):
+        data = self._filter_data(data, timeout, version)
+        if data:
+            self._delegate.set_many(data, timeout=timeout, version=version)
+
+    def delete(self, key, version=None):
+        keys = self._defer_delete_many([key], version)
+        if keys:
+            self._delegate.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = self._defer_delete_many(keys, version)
+        if keys:
+            self._delegate.delete_many(keys, version=version)
+
+    def _get_deleted_keys(self, version):
+        memo = self._memo()
+        if memo is None:
+            return frozenset()
+        return memo.get_deleted_keys(self._delegate, version)
+
+    def _filter_data(self, data, timeout, version):
+        """Drops versions of deleted tags (they will be deleted anyway) and defers acquired tag states."""
+        memo = self._memo()
+        if memo is None:
+            return data
+        deleted_keys = memo.get_deleted_keys(self._delegate, version)
+        if deleted_keys:
+            data = {key: value for key, value in data.items() if key not in deleted_keys}
+        return memo.set_many(self._delegate, data, timeout, version)
+
+    def _defer_delete_many(self, keys, version):
+        keys = list(keys)
+        memo = self._memo()
+        if memo is None:
+            return keys
+        tag_keys = [key for key in keys if utils.is_tag_key(key)]
+        if not tag_keys:
+            return keys
+        return [key for key in keys if not utils.is_tag_key(key)] + memo.delete_many(
+            self._delegate, tag_keys, version
+        )
+
+    def _memo(self):
+        return self._transaction.current().get_invalidations_memo()
+
+    def __getattr__(self, name):
+        """Delegate for all native methods."""
+        return getattr(self._delegate, name)
+
+
 def default_key_func(key, key_prefix, version):
     """
     Default function to generate keys.
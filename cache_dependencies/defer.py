@@ -9,6 +9,9 @@ class DeferredNode(interfaces.IDeferred):
 
     Used mainly to reduce count of cache.get_many().
     """
+    # Async counterpart of executor, for example, cache.aget_many(), see aio.resolve()
+    async_execute = None
+
     def __init__(self, executor, iterator_factory, *args, **kwargs):
         assert issubclass(iterator_factory, AbstractDeferredIterator)
         self.execute = executor
@@ -42,13 +45,15 @@ class DeferredNode(interfaces.IDeferred):
 
     @parent.setter
     def parent(self, parent):
-        """
+        """Sets parent, or appends it to the end of chain if parent already exists.
+
         :type parent: cache_dependencies.interfaces.IDeferred
         """
-        if getattr(self, '_parent', None) is None or parent is None:
-            self._parent = parent
-        else:
-            self._parent.parent = parent  # Recursion
+        node = self
+        if parent is not None:
+            while node._parent is not None:  # Don't use recursion, chain can be long
+                node = node._parent
+        node._parent = parent
 
     @parent.deleter
     def parent(self):
@@ -59,12 +64,35 @@ class DeferredNode(interfaces.IDeferred):
             self._iterator = self.iterator_factory(self)
         return self._iterator
 
-    def __copy__(self):
+    def chain(self):
+        """Returns list of nodes from current node to the root.
+
+        :rtype: list[cache_dependencies.interfaces.IDeferred]
+        """
+        nodes = []
+        node = self
+        while node is not None:
+            nodes.append(node)
+            node = node.parent
+        return nodes
+
+    def copy_single(self):
+        """Returns copy of node without parent.
+
+        :rtype: cache_dependencies.defer.DeferredNode
+        """
         c = copy.copy(super(DeferredNode, self))
         c.queue = c.queue[:]
-        c._parent = copy.copy(c._parent)  # excess?
+        c._parent = None
+        c._iterator = None
         return c
 
+    def __copy__(self):
+        nodes = [node.copy_single() for node in self.chain()]
+        for node, parent in zip(nodes, nodes[1:]):
+            node._parent = parent
+        return nodes[0]
+
 
 class Deferred(interfaces.IDeferred):
     deferred_factory = DeferredNode
@@ -108,20 +136,19 @@ class Deferred(interfaces.IDeferred):
 
     @_to_node
     def __iadd__(self, other):
-        """
+        """Appends chain of other to the top of own chain.
+
+        Cost is linear to length of other chain, own chain is not traversed.
+
         :type other: cache_dependencies.interfaces.IDeferred
         :rtype: cache_dependencies.interfaces.IDeferred
         """
-        other = copy.copy(other)
-        if other.parent is not None:
-            self.__iadd__(other.parent)
-            del other.parent
-
-        if self.node.aggregation_criterion == other.aggregation_criterion:
-            self.node.queue.extend(other.queue)
-        else:
-            other.parent, self.node = self.node, other
-
+        for other_node in reversed(other.chain()):  # From root to top
+            if self.node.aggregation_criterion == other_node.aggregation_criterion:
+                self.node.queue.extend(other_node.queue)
+            else:
+                other_node = other_node.copy_single()
+                other_node._parent, self.node = self.node, other_node
         return self
 
     def __iter__(self):
@@ -131,8 +158,13 @@ class Deferred(interfaces.IDeferred):
 
 
 class State(object):
+    """Iteration state, separated by contexts (aggregation criteria).
+
+    :type shared: dict
+    """
     _contexts = None
     _current_context = None
+    shared = None
 
     def _attr_exc(f):
         @wraps(f)
@@ -146,6 +178,7 @@ class State(object):
     def __init__(self):
         self._contexts = dict()
         self._current_context = None
+        self.shared = dict()  # Is not separated by contexts
 
     def switch_context(self, context_key):
         self._current_context = self._contexts.setdefault(context_key, {})
@@ -184,17 +217,41 @@ class AbstractDeferredIterator(collections.Iterator):
         self._node = node
         self._index = 0
         self._state = None
+        self._delegate_iterator = None
 
     def __iter__(self):
         return self
 
-    def _delegate(self):
-        if self._node.parent:
-            delegate = iter(self._node.parent)
-            delegate.state = self.state
-            return next(delegate)
-        else:
-            raise StopIteration
+    @property
+    def node(self):
+        return self._node
+
+    def _is_exhausted(self):
+        return self._index >= len(self._node.queue)
+
+    def _get_delegate_iterator(self):
+        if self._delegate_iterator is None:
+            if not self._node.parent:
+                raise StopIteration
+            self._delegate_iterator = iter(self._node.parent)
+            self._delegate_iterator.state = self.state
+        return self._delegate_iterator
+
+    def _get_active_iterator(self):
+        """Returns the first iterator in chain which is not exhausted.
+
+        Don't use recursion, chain can be long.
+        Exhausted iterators are linked directly to the active iterator,
+        so, each of them is traversed only once.
+        """
+        iterator = self
+        exhausted_iterators = []
+        while iterator._is_exhausted():
+            exhausted_iterators.append(iterator)
+            iterator = iterator._get_delegate_iterator()
+        for exhausted_iterator in exhausted_iterators:
+            exhausted_iterator._delegate_iterator = iterator
+        return iterator
 
     @property
     def state(self):
@@ -210,64 +267,105 @@ class AbstractDeferredIterator(collections.Iterator):
         return self.__next__()
 
     def __next__(self):
+        iterator = self._get_active_iterator()
+        node = iterator._node
+        iterator.state.switch_context(node.aggregation_criterion)
+        iterator._index += 1
+        callback, args, kwargs = node.queue[len(node.queue) - iterator._index]
+        return iterator._call(callback, args, kwargs)
+
+    def _call(self, callback, args, kwargs):
         raise NotImplementedError
 
 
 class GetManyDeferredIterator(AbstractDeferredIterator):
 
-    def __next__(self):
+    def _call(self, callback, args, kwargs):
         node = self._node
-        queue_len = len(node.queue)
-        self.state.switch_context(node.aggregation_criterion)
-        if self._index >= len(node.queue):
-            return self._delegate()
-        self._index += 1
         aggregated_caches = self._get_aggregated_caches(node)
-        callback, args, kwargs = node.queue[queue_len - self._index]
         item_caches = {key: aggregated_caches[key] for key in args[0] if key in aggregated_caches}
         return callback(node, item_caches, *args, **kwargs)
 
     def _get_aggregated_caches(self, node):
-        if node.aggregation_criterion not in self._aggregated_caches_mapping:
-            self._aggregated_caches_mapping[node.aggregation_criterion] = node.execute(
+        mapping = self.get_aggregated_caches_mapping(self.state, node.aggregation_criterion)
+        if node.aggregation_criterion not in mapping:
+            mapping[node.aggregation_criterion] = node.execute(
                 self._get_aggregated_cache_keys(node.aggregation_criterion), *node.args, **node.kwargs
             ) or {}
-        return self._aggregated_caches_mapping[node.aggregation_criterion]
+        return mapping[node.aggregation_criterion]
 
-    @property
-    def _aggregated_caches_mapping(self):
-        if not hasattr(self.state, 'aggregated_caches_mapping'):
-            self.state.aggregated_caches_mapping = {}
-        return self.state.aggregated_caches_mapping
+    @staticmethod
+    def get_aggregated_caches_mapping(state, aggregation_criterion):
+        """
+        :type state: cache_dependencies.defer.State
+        :rtype: dict
+        """
+        state.switch_context(aggregation_criterion)
+        if not hasattr(state, 'aggregated_caches_mapping'):
+            state.aggregated_caches_mapping = {}
+        return state.aggregated_caches_mapping
 
     def _get_aggregated_cache_keys(self, acceptable_aggregation_criterion):
-        keys = set()
-        node = self._node
-        while node:
-            if node.aggregation_criterion == acceptable_aggregation_criterion:
-                keys |= self._get_node_cache_keys(node)
-            node = node.parent
-        return keys
+        """Returns union of keys for aggregation criterion.
 
-    @staticmethod
-    def _get_node_cache_keys(node):
+        Unions for all aggregation criteria are computed by single pass through the chain.
         """
+        shared = self.state.shared
+        if shared.get('aggregated_cache_keys_node') is not self._node:
+            shared['aggregated_cache_keys_node'] = self._node
+            shared['aggregated_cache_keys'] = {
+                aggregation_criterion: keys
+                for aggregation_criterion, (node, keys) in self.aggregate_cache_keys(self._node).items()
+            }
+        return shared['aggregated_cache_keys'].get(acceptable_aggregation_criterion, set())
+
+    @staticmethod
+    def aggregate_cache_keys(node):
+        """Returns unions of keys by aggregation criteria for chain from node to the root.
+
         :type node: cache_dependencies.interfaces.IDeferred
+        :rtype: dict
         """
-        keys = set()
-        for callback, args, kwargs in node.queue:
-            keys |= set(args[0])
-        return keys
+        aggregated_cache_keys = {}
+        while node:
+            if issubclass(node.iterator_factory, GetManyDeferredIterator):
+                keys = aggregated_cache_keys.setdefault(node.aggregation_criterion, (node, set()))[1]
+                for callback, args, kwargs in node.queue:
+                    keys.update(args[0])
+            node = node.parent
+        return aggregated_cache_keys
 
 
 class NoneDeferredIterator(AbstractDeferredIterator):
 
-    def __next__(self):
-        node = self._node
-        queue_len = len(node.queue)
-        self.state.switch_context(node.aggregation_criterion)
-        if self._index >= len(node.queue):
-            return self._delegate()
-        self._index += 1
-        callback, args, kwargs = node.queue[queue_len - self._index]
-        return callback(node, None, *args, **kwargs)
+    def _call(self, callback, args, kwargs):
+        return callback(self._node, None, *args, **kwargs)
+
+
+def get_pending_queries(deferred):
+    """Returns aggregated queries of the chain, which are not executed yet.
+
+    Allows to execute queries in other way (for example, asynchronously),
+    and to pass results by set_query_result() before iteration.
+
+    :type deferred: cache_dependencies.interfaces.IDeferred
+    :rtype: list[(cache_dependencies.interfaces.IDeferred, set)]
+    """
+    iterator = iter(deferred)
+    return [
+        (node, keys)
+        for aggregation_criterion, (node, keys) in GetManyDeferredIterator.aggregate_cache_keys(iterator.node).items()
+        if aggregation_criterion not in GetManyDeferredIterator.get_aggregated_caches_mapping(
+            iterator.state, aggregation_criterion
+        )
+    ]
+
+
+def set_query_result(deferred, node, caches):
+    """
+    :type deferred: cache_dependencies.interfaces.IDeferred
+    :type node: cache_dependencies.interfaces.IDeferred
+    :type caches: dict or None
+    """
+    mapping = GetManyDeferredIterator.get_aggregated_caches_mapping(iter(deferred).state, node.aggregation_criterion)
+    mapping[node.aggregation_criterion] = caches or {}
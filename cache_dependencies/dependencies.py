@@ -1,4 +1,6 @@
 import copy
+import time
+import random
 import operator
 import functools
 from cache_dependencies import interfaces, defer, exceptions, utils
@@ -141,7 +143,7 @@ class AcquiredTagState(AbstractTagState):
 
     @staticmethod
     def make_key(tag):
-        return 'acquired_{0}'.format(utils.make_tag_key(tag))
+        return utils.make_tag_keys(tag).acquired
 
     def is_locked(self, transaction):
         """
@@ -163,7 +165,7 @@ class ReleasedTagState(AbstractTagState):
 
     @staticmethod
     def make_key(tag):
-        return 'released_{0}'.format(utils.make_tag_key(tag))
+        return utils.make_tag_keys(tag).released
 
     def is_locked(self, transaction):
         """
@@ -190,9 +192,91 @@ class ReleasedTagState(AbstractTagState):
         return self.session_id == acquired_tag_state.session_id and self.time > acquired_tag_state.time
 
 
+class TagVersionGenerator(object):
+    """Generates MD5 hex string tag versions."""
+
+    def __call__(self, cache, tags, version):
+        """
+        :type cache: cache_dependencies.interfaces.ICache
+        :type tags: collections.Iterable[str]
+        :type version: int or None
+        :rtype: dict
+        """
+        return {tag: utils.generate_tag_version() for tag in tags}
+
+    @staticmethod
+    def make(name):
+        """
+        :type name: str
+        :rtype: cache_dependencies.dependencies.TagVersionGenerator
+        """
+        if name == 'MD5':
+            return TagVersionGenerator()
+        elif name == 'RANDOM INT':
+            return RandomIntTagVersionGenerator()
+        elif name == 'COUNTER':
+            return CounterTagVersionGenerator()
+        else:
+            raise ValueError(name)
+
+
+class RandomIntTagVersionGenerator(TagVersionGenerator):
+    """Generates random 64-bit integer tag versions."""
+
+    def __call__(self, cache, tags, version):
+        """
+        :type cache: cache_dependencies.interfaces.ICache
+        :type tags: collections.Iterable[str]
+        :type version: int or None
+        :rtype: dict
+        """
+        return {tag: utils.generate_int_tag_version() for tag in tags}
+
+
+class CounterTagVersionGenerator(TagVersionGenerator):
+    """Generates integer tag versions by shared counter in cache.
+
+    All versions are unique, so, deleted or expired tag never gets
+    its previous version again. Counter starts from current time
+    in microseconds, so, it keeps increasing even if counter key
+    itself is evicted.
+    """
+    COUNTER_KEY = 'counter_tag_versions'
+
+    def __call__(self, cache, tags, version):
+        """
+        :type cache: cache_dependencies.interfaces.ICache
+        :type tags: collections.Iterable[str]
+        :type version: int or None
+        :rtype: dict
+        """
+        tags = list(tags)
+        try:
+            last_tag_version = cache.incr(self.COUNTER_KEY, len(tags), version=version)
+        except ValueError:
+            cache.add(self.COUNTER_KEY, self._initial_value(), None, version)
+            last_tag_version = cache.incr(self.COUNTER_KEY, len(tags), version=version)
+        return {tag: last_tag_version - i for i, tag in enumerate(tags)}
+
+    @staticmethod
+    def _initial_value():
+        return int(time.time() * 1000000)
+
+
 class TagsDependency(interfaces.IDependency):
     TAG_TIMEOUT = 24 * 3600
+    # Timeout of tag version is randomly reduced by this part,
+    # so, tags created at the same moment do not expire at the same moment.
+    TAG_TIMEOUT_JITTER = 0.1
     TAG_STATE_TIMEOUT = 5
+    # Markers are written together with tag states and live not less than them,
+    # so, if no marker exists, there are no tag states to look up.
+    ACQUIRED_MARKER_KEY = 'marker_acquired_tag_states'
+    RELEASED_MARKER_KEY = 'marker_released_tag_states'
+    NAMESPACE_WILDCARD = '*'
+    tag_version_generator = TagVersionGenerator()
+    # Time when markers were seen last time by this process
+    _marker_seen_at = 0.0
 
     def __init__(self, *tags):
         """
@@ -209,14 +293,27 @@ class TagsDependency(interfaces.IDependency):
         :type transaction: cache_dependencies.interfaces.ITransaction
         :type version: int or None
         """
+        # Cache can enable hierarchical tags, see CacheWrapper.tag_namespace_separator
+        separator = getattr(cache, 'tag_namespace_separator', None)
+        if separator:
+            self.tags |= self.get_namespace_tags(self.tags, separator)
+        # While tag states are written by concurrent transactions (markers are seen recently),
+        # they are fetched together with markers, so, busy case costs single round trip too.
+        busy = time.time() - TagsDependency._marker_seen_at < self.TAG_STATE_TIMEOUT
         deferred = self._get_tag_versions(cache, version)
-        deferred += self._get_locked_tags(cache, transaction, version)
-        locked_tags = deferred.get()
+        deferred += self._has_tag_states(cache, version)
+        if busy:
+            deferred += self._get_locked_tags(cache, transaction, version)
+            locked_tags = deferred.get()
+        has_tag_states = deferred.get()
         tag_versions = deferred.get()
-        # All deferred operations in this method should be completed
-        # before exception will be raised.
-        if locked_tags:
-            raise exceptions.TagsLocked(self, locked_tags)
+        if has_tag_states:
+            TagsDependency._marker_seen_at = time.time()
+            # Fast path is not possible, concurrent transactions can lock tags.
+            if not busy:
+                locked_tags = self._get_locked_tags(cache, transaction, version).get()
+            if locked_tags:
+                raise exceptions.TagsLocked(self, locked_tags)
         nonexistent_tags = self.tags - set(tag_versions.keys())
         created_tag_versions = self._make_tag_versions(cache, nonexistent_tags, version)
         tag_versions.update(created_tag_versions)
@@ -242,12 +339,30 @@ class TagsDependency(interfaces.IDependency):
         deferred.add_callback(callback, set())
         return deferred
 
+    def is_valid(self, cache, version):
+        """Validates immediately, by single cache.get_many(), without deferred aggregation.
+
+        :type cache: cache_dependencies.interfaces.ICache
+        :type version: int or None
+        :rtype: bool
+        """
+        tag_key_versions = [
+            (utils.make_tag_keys(tag).version, tag_version) for tag, tag_version in self.tag_versions.items()
+        ]
+        if not tag_key_versions:
+            return True
+        caches = cache.get_many([tag_key for tag_key, _ in tag_key_versions], version)
+        for tag_key, tag_version in tag_key_versions:
+            if caches.get(tag_key) != tag_version:
+                return False
+        return True
+
     def invalidate(self, cache, version):
         """
         :type cache: cache_dependencies.interfaces.ICache
         :type version: int or None
         """
-        tag_keys = list(map(utils.make_tag_key, self.tags))
+        tag_keys = [utils.make_tag_keys(tag).version for tag in self.tags]
         cache.delete_many(tag_keys, version=version)
 
     def acquire(self, cache, transaction, version):
@@ -257,9 +372,9 @@ class TagsDependency(interfaces.IDependency):
         :type version: int or None
         """
         state = AcquiredTagState(transaction)
-        cache.set_many(
-            {AcquiredTagState.make_key(tag): state for tag in self.tags}, self.TAG_STATE_TIMEOUT, version
-        )
+        data = {AcquiredTagState.make_key(tag): state for tag in self.tags}
+        data[self.ACQUIRED_MARKER_KEY] = True
+        cache.set_many(data, self.TAG_STATE_TIMEOUT, version)
 
     def release(self, cache, transaction, delay, version):
         """
@@ -269,8 +384,10 @@ class TagsDependency(interfaces.IDependency):
         :type version: int or None
         """
         state = ReleasedTagState(transaction, delay)
+        data = {ReleasedTagState.make_key(tag): state for tag in self.tags}
+        data[self.RELEASED_MARKER_KEY] = True
         cache.set_many(
-            {ReleasedTagState.make_key(tag): state for tag in self.tags},
+            data,
             self.TAG_STATE_TIMEOUT + max(delay, 1),  # Must have ttl greater than ttl of AcquiredTagState
             version
         )
@@ -286,25 +403,67 @@ class TagsDependency(interfaces.IDependency):
             return True
         return False
 
+    @classmethod
+    def get_tag_timeout(cls):
+        """Returns jittered timeout of tag version.
+
+        :rtype: int
+        """
+        return int(cls.TAG_TIMEOUT * (1 - cls.TAG_TIMEOUT_JITTER * random.random()))
+
+    @classmethod
+    def get_namespace_tags(cls, tags, separator):
+        """Returns wildcard tags of namespaces of hierarchical tags.
+
+        For example, 'blog.*' and 'blog.post.*' for 'blog.post.pk:42',
+        so, cache tagged by 'blog.post.pk:42' is invalidated by 'blog.post.*' as well.
+
+        :type tags: collections.Iterable[str]
+        :type separator: str
+        :rtype: set
+        """
+        namespace_tags = set()
+        for tag in tags:
+            parts = tag.split(separator)
+            for i in range(1, len(parts)):
+                namespace_tags.add(separator.join(parts[:i] + [cls.NAMESPACE_WILDCARD]))
+        return namespace_tags
+
     def __copy__(self):
         c = copy.copy(super(TagsDependency, self))
         c.tags = c.tags.copy()
         c.tag_versions = c.tag_versions.copy()
         return c
 
-    def _get_tag_versions(self, cache, version):
-        tag_keys = {tag: utils.make_tag_key(tag) for tag in self.tags}
+    @staticmethod
+    def _make_get_many_deferred(cache, version):
         deferred = defer.Deferred(cache.get_many, defer.GetManyDeferredIterator, version)
+        deferred.node.async_execute = getattr(cache, 'aget_many', None)
+        return deferred
+
+    def _get_tag_versions(self, cache, version):
+        tag_keys = {tag: utils.make_tag_keys(tag).version for tag in self.tags}
+        deferred = self._make_get_many_deferred(cache, version)
         deferred.add_callback(
             lambda _, caches, keys: {tag: caches[tag_key] for tag, tag_key in tag_keys.items() if tag_key in caches},
             tag_keys.values()
         )
         return deferred
 
+    def _has_tag_states(self, cache, version):
+        deferred = self._make_get_many_deferred(cache, version)
+        deferred.add_callback(lambda _, caches, keys: bool(caches),
+                              {self.ACQUIRED_MARKER_KEY, self.RELEASED_MARKER_KEY})
+        return deferred
+
     def _get_locked_tags(self, cache, transaction, version):
-        acquired_tag_keys = {AcquiredTagState.make_key(tag): tag for tag in self.tags}
-        released_tag_keys = {ReleasedTagState.make_key(tag): tag for tag in self.tags}
-        deferred = defer.Deferred(cache.get_many, defer.GetManyDeferredIterator, version)
+        acquired_tag_keys = dict()
+        released_tag_keys = dict()
+        for tag in self.tags:
+            tag_keys = utils.make_tag_keys(tag)
+            acquired_tag_keys[tag_keys.acquired] = tag
+            released_tag_keys[tag_keys.released] = tag
+        deferred = self._make_get_many_deferred(cache, version)
         bulk_keys = set(acquired_tag_keys.keys()) | set(released_tag_keys.keys())
         deferred.add_callback(self._get_locked_tags_callback, bulk_keys, transaction,
                               acquired_tag_keys, released_tag_keys)
@@ -329,9 +488,13 @@ class TagsDependency(interfaces.IDependency):
     def _make_tag_versions(self, cache, tags, version):
         if not tags:
             return dict()
-        new_tag_versions = {tag: utils.generate_tag_version() for tag in tags}
-        new_tag_key_versions = {utils.make_tag_key(tag): tag_version for tag, tag_version in new_tag_versions.items()}
-        cache.set_many(new_tag_key_versions, self.TAG_TIMEOUT, version)
+        # Cache can provide own generator, see CacheWrapper.tag_version_generator
+        generator = getattr(cache, 'tag_version_generator', None) or self.tag_version_generator
+        new_tag_versions = generator(cache, tags, version)
+        new_tag_key_versions = {
+            utils.make_tag_keys(tag).version: tag_version for tag, tag_version in new_tag_versions.items()
+        }
+        cache.set_many(new_tag_key_versions, self.get_tag_timeout(), version)
         return new_tag_versions
 
 
@@ -225,6 +225,18 @@ class ITransaction(object):
         """
         raise NotImplementedError
 
+    def get_tag_versions_memo(self):
+        """
+        :rtype: cache_dependencies.transaction.TagVersionsMemo or None
+        """
+        raise NotImplementedError
+
+    def get_invalidations_memo(self):
+        """
+        :rtype: cache_dependencies.transaction.InvalidationsMemo or None
+        """
+        raise NotImplementedError
+
     def evaluate(self, dependency, version):
         """
         :type dependency: cache_dependencies.interfaces.IDependency
@@ -262,8 +274,16 @@ class ITransactionManager(object):
         """
         raise NotImplementedError
 
-    def begin(self):
-        """Handles database transaction begin."""
+    def begin(self, independent=False):
+        """Handles database transaction begin.
+
+        Nested transaction is a save point of the current one,
+        unless it is independent, i.e. it releases own dependencies
+        when it is finished, instead of the outer transaction.
+
+        :type independent: bool
+        :rtype: cache_dependencies.interfaces.ITransaction
+        """
         raise NotImplementedError
 
     def finish(self):
@@ -309,6 +329,13 @@ class ICache(object):
         """
         raise NotImplementedError
 
+    def touch(self, key, timeout=None, version=None):
+        """
+        Update the key's expiry time using timeout. Return True if successful
+        or False if the key does not exist.
+        """
+        raise NotImplementedError
+
     def delete(self, key, version=None):
         """
         Delete a key from the cache, failing silently.
@@ -392,3 +419,30 @@ class ICache(object):
     def close(self, **kwargs):
         """Close the cache connection"""
         raise NotImplementedError
+
+
+class IAsyncCache(ICache):
+    """Async counterparts of ICache methods, in terms of Django >= 4.0 API.
+
+    Each method returns awaitable.
+    """
+    def aget(self, key, default=None, version=None):
+        raise NotImplementedError
+
+    def aset(self, key, value, timeout=None, version=None):
+        raise NotImplementedError
+
+    def atouch(self, key, timeout=None, version=None):
+        raise NotImplementedError
+
+    def adelete(self, key, version=None):
+        raise NotImplementedError
+
+    def aget_many(self, keys, version=None):
+        raise NotImplementedError
+
+    def aset_many(self, data, timeout=None, version=None):
+        raise NotImplementedError
+
+    def adelete_many(self, keys, version=None):
+        raise NotImplementedError
@@ -1,16 +1,150 @@
+import os
+import math
+import time
+import heapq
+import atexit
+import logging
+import itertools
 import threading
-from cache_dependencies import interfaces
+from cache_dependencies import dependencies, interfaces, utils
+
+logger = logging.getLogger(__name__)
+
+
+class DelayedInvalidationScheduler(object):
+    """Invalidates dependencies after delay, by single background thread.
+
+    Invalidations for the same cache and version, which are due at the same time
+    (with precision of resolution), are coalesced into single invalidation,
+    i.e. single cache.delete_many() for all tags.
+    Pending invalidations are flushed on process exit.
+    """
+
+    def __init__(self, resolution=0.1):
+        """
+        :type resolution: float
+        """
+        self._resolution = resolution
+        self._condition = threading.Condition(threading.Lock())
+        self._reset()
+
+    def _reset(self):
+        self._queue = []  # Heap of (due_time, seq, key)
+        self._pending = dict()  # key -> list of dependencies
+        self._counter = itertools.count()
+        self._thread = None
+        self._stopped = False
+        self._pid = os.getpid()
+
+    def schedule(self, delay, cache_accessor, dependency, version):
+        """
+        :type delay: int or float
+        :type cache_accessor: () -> cache_dependencies.interfaces.ICache
+        :type dependency: cache_dependencies.interfaces.IDependency
+        :type version: int or None
+        """
+        due_time = math.ceil((self._current_time() + delay) / self._resolution) * self._resolution
+        key = (due_time, cache_accessor, version)
+        with self._condition:
+            if self._pid != os.getpid():  # Forked, thread of parent process does not exist here
+                self._reset()
+            if key in self._pending:
+                self._pending[key].append(dependency)
+                return
+            self._pending[key] = [dependency]
+            heapq.heappush(self._queue, (due_time, next(self._counter), key))
+            self._ensure_thread()
+            self._condition.notify()
+
+    def flush(self):
+        """Invalidates all pending dependencies immediately."""
+        with self._condition:
+            due = self._pop_due(None)
+        self._invalidate(due)
+
+    def shutdown(self, timeout=None):
+        """Stops background thread and flushes pending invalidations."""
+        with self._condition:
+            self._stopped = True
+            thread = self._thread
+            self._condition.notify()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+        self.flush()
+        with self._condition:
+            self._stopped = False
+            self._thread = None
+
+    def _ensure_thread(self):
+        if self._thread is None and not self._stopped:
+            self._thread = threading.Thread(target=self._run, name='DelayedInvalidationScheduler')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopped:
+                    if self._queue:
+                        timeout = self._queue[0][0] - self._current_time()
+                        if timeout <= 0:
+                            break
+                    else:
+                        timeout = None
+                    self._condition.wait(timeout)
+                if self._stopped:
+                    return
+                due = self._pop_due(self._current_time())
+            self._invalidate(due)
+
+    def _pop_due(self, now):
+        """Returns pending invalidations due to now (all, if now is None).
+
+        :type now: float or None
+        :rtype: list
+        """
+        due = []
+        while self._queue and (now is None or self._queue[0][0] <= now):
+            due_time, seq, key = heapq.heappop(self._queue)
+            due.append((key, self._pending.pop(key)))
+        return due
+
+    @staticmethod
+    def _invalidate(due):
+        for (due_time, cache_accessor, version), dependencies_list in due:
+            if len(dependencies_list) == 1:
+                dependency = dependencies_list[0]
+            else:
+                dependency = dependencies.CompositeDependency()
+                for item in dependencies_list:
+                    dependency.extend(item)
+            try:
+                dependency.invalidate(cache_accessor(), version)
+            except Exception:
+                logger.exception("Delayed invalidation of dependency is failed")
+
+    @staticmethod
+    def _current_time():
+        return time.time()
+
+
+default_scheduler = DelayedInvalidationScheduler()
+atexit.register(default_scheduler.shutdown, 5)
 
 
 class DependencyLock(interfaces.IDependencyLock):
+    # Invalidations can be deferred until transaction finishes, see TransactionInvalidationsCacheDecorator
+    DEFER_INVALIDATIONS = True
 
-    def __init__(self, thread_safe_cache_accessor, delay=0):
+    def __init__(self, thread_safe_cache_accessor, delay=0, scheduler=None):
         """
         :type thread_safe_cache_accessor: () -> cache_dependencies.interfaces.ICache
         :type delay: int
+        :type scheduler: cache_dependencies.locks.DelayedInvalidationScheduler or None
         """
         self._cache = thread_safe_cache_accessor
         self._delay = delay  # For master/slave
+        self._scheduler = scheduler or default_scheduler
 
     def evaluate(self, dependency, transaction, version):
         """
@@ -42,6 +176,8 @@ class DependencyLock(interfaces.IDependencyLock):
 
 class ReadUncommittedDependencyLock(DependencyLock):
     """Tag Lock for Read Uncommitted transaction isolation level."""
+    DEFER_INVALIDATIONS = False
+
     def acquire(self, dependency, transaction, version):
         """
         :type dependency: cache_dependencies.interfaces.IDependency
@@ -59,7 +195,7 @@ class ReadUncommittedDependencyLock(DependencyLock):
             return self._release_dependency_delayed(dependency, version)
 
     def _release_dependency_delayed(self, dependency, version):
-        return threading.Timer(self._delay, self._release_dependency_target, [dependency, version]).start()
+        self._scheduler.schedule(self._delay, self._cache, dependency, version)
 
     def _release_dependency_target(self, dependency, version):
         dependency.invalidate(self._cache(), version)
@@ -67,6 +203,8 @@ class ReadUncommittedDependencyLock(DependencyLock):
 
 class ReadCommittedDependencyLock(ReadUncommittedDependencyLock):
     """Tag Lock for Read Committed transaction isolation level."""
+    DEFER_INVALIDATIONS = True
+
     def release(self, dependency, transaction, version):
         """
         :type dependency: cache_dependencies.interfaces.IDependency
@@ -98,3 +236,91 @@ class RepeatableReadDependencyLock(DependencyLock):
 
 class SerializableDependencyLock(RepeatableReadDependencyLock):
     """Tag Lock for Serializable transaction isolation level."""
+
+
+class CallbackLease(object):
+    """Single-flight lease of recomputation of missed cache value (dog-pile protection).
+
+    Only the caller holding the lease recomputes the value, concurrent callers
+    poll cache until the value is set, the lease is released or wait timeout is exceeded.
+    Lease is taken by atomic cache.add(), so, it works across processes.
+    """
+    KEY_PREFIX = 'lease_'
+
+    def __init__(self, timeout=10, wait_timeout=1.0, poll_interval=0.05):
+        """
+        :param timeout: ttl of lease, i.e. max expected time of recomputation
+        :type timeout: int
+        :param wait_timeout: max time of waiting for value recomputed by lease holder
+        :type wait_timeout: float
+        :type poll_interval: float
+        """
+        self.timeout = timeout
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+
+    def make_key(self, key):
+        """
+        :type key: str
+        :rtype: str
+        """
+        return '{0}{1}'.format(self.KEY_PREFIX, key)
+
+    def acquire(self, cache, key, version):
+        """Returns token of the lease, or None if the lease is held by other caller.
+
+        :type cache: cache_dependencies.interfaces.ICache
+        :type key: str
+        :type version: int or None
+        :rtype: str or None
+        """
+        token = utils.generate_tag_version()
+        if cache.add(self.make_key(key), token, self.timeout, version):
+            return token
+        return None
+
+    def release(self, cache, key, token, version):
+        """
+        :type cache: cache_dependencies.interfaces.ICache
+        :type key: str
+        :type token: str
+        :type version: int or None
+        """
+        lease_key = self.make_key(key)
+        if cache.get(lease_key, None, version) == token:  # Lease can be expired and taken by other caller
+            cache.delete(lease_key, version)
+
+    def is_held(self, cache, key, version):
+        """
+        :type cache: cache_dependencies.interfaces.ICache
+        :type key: str
+        :type version: int or None
+        :rtype: bool
+        """
+        return cache.get(self.make_key(key), None, version) is not None
+
+    def wait(self, cache, key, version, getter):
+        """Polls getter while the lease is held by other caller.
+
+        Returns value, or None if the lease is released without value, or wait timeout is exceeded.
+
+        :type cache: cache_dependencies.interfaces.ICache
+        :type key: str
+        :type version: int or None
+        :type getter: () -> object
+        """
+        deadline = self._current_time() + self.wait_timeout
+        while True:
+            value = getter()
+            if value is not None:
+                return value
+            remaining = deadline - self._current_time()
+            if remaining <= 0:
+                return None
+            if not self.is_held(cache, key, version):
+                return getter()  # Value can be set right before release of the lease
+            time.sleep(min(self.poll_interval, remaining))
+
+    @staticmethod
+    def _current_time():
+        return time.time()
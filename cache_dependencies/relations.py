@@ -1,4 +1,4 @@
-from cache_dependencies import dependencies, interfaces, mixins
+from cache_dependencies import dependencies, interfaces, mixins, utils
 from cache_dependencies.utils import Undef
 
 try:
@@ -65,14 +65,43 @@ class DummyCacheNode(interfaces.ICacheNode):
 
 
 class RelationManager(interfaces.IRelationManager):
+    """State is isolated by execution context (asyncio task or thread)."""
+
     def __init__(self):
-        self._current = DummyCacheNode()
-        self._data = dict()  # recursive cache is not possible, so, using dict instead of stack.
+        self._context = utils.ContextLocal()
+
+    @property
+    def _current(self):
+        try:
+            return self._context.current
+        except AttributeError:
+            self._context.current = DummyCacheNode()
+            return self._context.current
+
+    @_current.setter
+    def _current(self, node):
+        self._context.current = node
+
+    @property
+    def _data(self):
+        # recursive cache is not possible, so, using dict instead of stack.
+        owner, data = getattr(self._context, 'data', (None, None))
+        if data is None or owner != utils.get_context_owner():
+            # Dict inherited from parent context (for example, asyncio task) is copied once,
+            # then it is changed in place by the owner context.
+            data = dict(data or ())
+            self._data = data
+        return data
+
+    @_data.setter
+    def _data(self, data):
+        self._context.data = (utils.get_context_owner(), data)
 
     def get(self, key):
-        if key not in self._data:
-            self._data[key] = CacheNode(key, self._current)
-        return self._data[key]
+        data = self._data
+        if key not in data:
+            data[key] = CacheNode(key, self._current)
+        return data[key]
 
     def current(self, key_or_node=Undef):
         if key_or_node is Undef:
@@ -0,0 +1,190 @@
+"""Compact binary encoding of dependencies for stored payloads.
+
+Format (version 2), all integers are little-endian:
+
+    format version          uint8
+    delegates count         uint16
+    delegate type codes     uint8 * delegates count
+    then, for TagsDependency delegate:
+        tag version type    uint8
+        tags count          uint32
+        tag table length    uint32
+        tag table           utf-8 bytes, tags are separated by NUL
+        tag versions        16 bytes * tags count (binary MD5 digest)
+                            or uint64 * tags count (integer versions)
+
+Format version 1 has no tag version type, versions are always MD5.
+
+Only CompositeDependency of TagsDependency and DummyDependency
+can be encoded, dumps() returns None for any other dependency,
+and caller should to store it in usual way (pickled).
+The same is for dependency which doesn't fit the format, i.e. more than
+MAX_DELEGATES_COUNT delegates, or MD5 tag versions which are not lowercase hex
+(they would be loaded as lowercase, and never be valid).
+"""
+import struct
+import binascii
+from cache_dependencies import dependencies
+
+try:
+    str = unicode  # Python 2.* compatible
+    integer_types = (int, long)
+except NameError:
+    integer_types = (int,)
+
+FORMAT_VERSION = 2
+
+DUMMY_DEPENDENCY = 0
+TAGS_DEPENDENCY = 1
+
+MD5_TAG_VERSION = 0
+INT_TAG_VERSION = 1
+
+TAG_VERSION_SIZE = 16
+INT_TAG_VERSION_SIZE = 8
+MAX_INT_TAG_VERSION = 2 ** 64 - 1
+MAX_DELEGATES_COUNT = 2 ** 16 - 1
+
+_header = struct.Struct('<BH')
+_tags_header = struct.Struct('<II')
+_tag_version_type = struct.Struct('<B')
+
+
+def dumps(dependency):
+    """Returns bytes, or None if dependency can't be encoded compactly.
+
+    :type dependency: cache_dependencies.interfaces.IDependency
+    :rtype: bytes or None
+    """
+    if type(dependency) is not dependencies.CompositeDependency:
+        return None
+    if len(dependency.delegates) > MAX_DELEGATES_COUNT:
+        return None
+    type_codes = []
+    chunks = []
+    for delegate in dependency.delegates:
+        if type(delegate) is dependencies.DummyDependency:
+            type_codes.append(DUMMY_DEPENDENCY)
+        elif type(delegate) is dependencies.TagsDependency:
+            chunk = _dump_tags_dependency(delegate)
+            if chunk is None:
+                return None
+            type_codes.append(TAGS_DEPENDENCY)
+            chunks.append(chunk)
+        else:
+            return None
+    return b''.join(
+        [_header.pack(FORMAT_VERSION, len(type_codes)), bytes(bytearray(type_codes))] + chunks
+    )
+
+
+def loads(data):
+    """
+    :type data: bytes
+    :rtype: cache_dependencies.dependencies.CompositeDependency
+    """
+    format_version, delegates_count = _header.unpack_from(data, 0)
+    if format_version not in (1, FORMAT_VERSION):
+        raise ValueError("Unsupported format version: {0}".format(format_version))
+    offset = _header.size
+    type_codes = bytearray(data[offset:offset + delegates_count])
+    offset += delegates_count
+    delegates = []
+    for type_code in type_codes:
+        if type_code == DUMMY_DEPENDENCY:
+            delegates.append(dependencies.DummyDependency())
+        elif type_code == TAGS_DEPENDENCY:
+            delegate, offset = _load_tags_dependency(data, offset, format_version)
+            delegates.append(delegate)
+        else:
+            raise ValueError("Unknown dependency type: {0}".format(type_code))
+    return dependencies.CompositeDependency(*delegates)
+
+
+def _dump_tags_dependency(dependency):
+    """
+    :type dependency: cache_dependencies.dependencies.TagsDependency
+    :rtype: bytes or None
+    """
+    tag_versions = dependency.tag_versions
+    if len(tag_versions) != len(dependency.tags):
+        return None
+    tags = list(dependency.tags)
+    if any(not isinstance(tag, str) or '\x00' in tag for tag in tags):
+        return None
+    versions = [tag_versions.get(tag) for tag in tags]
+    if all(_is_int_tag_version(tag_version) for tag_version in versions):
+        tag_version_type = INT_TAG_VERSION
+        packed_versions = struct.pack('<{0}Q'.format(len(versions)), *versions)
+    elif all(_is_md5_tag_version(tag_version) for tag_version in versions):
+        tag_version_type = MD5_TAG_VERSION
+        try:
+            packed_versions = binascii.unhexlify(''.join(versions))
+        except (TypeError, ValueError):
+            return None
+    else:
+        return None
+    tag_table = '\x00'.join(tags).encode('utf-8')
+    return b''.join([
+        _tag_version_type.pack(tag_version_type),
+        _tags_header.pack(len(tags), len(tag_table)),
+        tag_table,
+        packed_versions
+    ])
+
+
+def _is_int_tag_version(tag_version):
+    return isinstance(tag_version, integer_types) and not isinstance(tag_version, bool) and \
+        0 <= tag_version <= MAX_INT_TAG_VERSION
+
+
+def _is_md5_tag_version(tag_version):
+    return isinstance(tag_version, str) and len(tag_version) == 32 and tag_version == tag_version.lower()
+
+
+def _load_tags_dependency(data, offset, format_version):
+    """
+    :type data: bytes
+    :type offset: int
+    :type format_version: int
+    :rtype: (cache_dependencies.dependencies.TagsDependency, int)
+    """
+    if format_version == 1:
+        tag_version_type = MD5_TAG_VERSION
+    else:
+        tag_version_type, = _tag_version_type.unpack_from(data, offset)
+        offset += _tag_version_type.size
+    count, tag_table_length = _tags_header.unpack_from(data, offset)
+    offset += _tags_header.size
+    if count:
+        tags = data[offset:offset + tag_table_length].decode('utf-8').split('\x00')
+    else:
+        tags = []
+    offset += tag_table_length
+    if tag_version_type == MD5_TAG_VERSION:
+        versions_size = TAG_VERSION_SIZE * count
+        versions = _hexlify_versions(data[offset:offset + versions_size])
+    elif tag_version_type == INT_TAG_VERSION:
+        versions_size = INT_TAG_VERSION_SIZE * count
+        versions = struct.unpack_from('<{0}Q'.format(count), data, offset)
+    else:
+        raise ValueError("Unknown tag version type: {0}".format(tag_version_type))
+    offset += versions_size
+    dependency = dependencies.TagsDependency(tags)
+    dependency.tag_versions = dict(zip(tags, versions))
+    return dependency, offset
+
+
+def _hexlify_versions(data):
+    """
+    :type data: bytes
+    :rtype: list[str]
+    """
+    if not data:
+        return []
+    try:
+        return binascii.hexlify(data, ' ', TAG_VERSION_SIZE).decode('ascii').split(' ')
+    except TypeError:  # Python < 3.8
+        versions = binascii.hexlify(data).decode('ascii')
+        step = 2 * TAG_VERSION_SIZE
+        return [versions[i:i + step] for i in range(0, len(versions), step)]
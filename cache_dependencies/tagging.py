@@ -5,27 +5,41 @@ from cache_dependencies.cache import CacheWrapper
 
 
 class CacheTagging(object):  # Backward compatibility
+    cache_wrapper_factory = CacheWrapper
 
-    def __init__(self, cache, relation_manager, transaction):
+    def __init__(self, cache, relation_manager, transaction, tag_version_generator=None,
+                 callback_lease=None, revalidation=None, early_recomputation=None,
+                 tag_keys_index=None, invalidation_epoch=None, tag_namespace_separator=None, namespaces=None):
         """Constructor of cache instance."""
-        self.cache = CacheWrapper(cache, relation_manager, transaction)
+        self.cache = self.cache_wrapper_factory(
+            cache, relation_manager, transaction, tag_version_generator, callback_lease,
+            revalidation, early_recomputation, tag_keys_index, invalidation_epoch, tag_namespace_separator,
+            namespaces
+        )
 
     def get_or_set_callback(self, key, callback, tags=(), timeout=None,
-                            version=None, args=None, kwargs=None):
+                            version=None, args=None, kwargs=None, fallback=None, allow_stale=True):
         """Returns cache value if exists
 
         Otherwise calls cache_funcs, sets cache value to it and returns it.
         """
-        value = self.get(key, version=version)
-        if value is None:
-            args = args or ()
-            kwargs = kwargs or {}
-            value = callback(*args, **kwargs)
-            self.set(key, value, tags, timeout, version)
-        return value
+        dependency, timeout, version = self._parse_set_args(tags, timeout, version)
+        return self.cache.get_or_set_callback(
+            key, callback, dependency, timeout, version, args, kwargs, fallback, allow_stale
+        )
 
     def set(self, key, value, tags=(), timeout=None, version=None):
         """Sets cache value and tags."""
+        dependency, timeout, version = self._parse_set_args(tags, timeout, version)
+        self.cache.set(key, value, dependency, timeout, version)
+
+    def invalidate_tags(self, *tags, **kwargs):
+        """Invalidate specified tags"""
+        version = kwargs.get('version', None)
+        self.cache.invalidate_dependency(self._parse_invalidate_args(tags), version)
+
+    @staticmethod
+    def _parse_set_args(tags, timeout, version):
         if not isinstance(tags, (list, tuple, set, frozenset, interfaces.IDependency)):  # Called as native API
             if version is None and timeout is not None:
                 version = timeout
@@ -37,10 +51,10 @@ class CacheTagging(object):  # Backward compatibility
             dependency = dependencies.TagsDependency(tags)
         else:
             dependency = dependencies.DummyDependency()
-        self.cache.set(key, value, dependency, timeout, version)
+        return dependency, timeout, version
 
-    def invalidate_tags(self, *tags, **kwargs):
-        """Invalidate specified tags"""
+    @staticmethod
+    def _parse_invalidate_args(tags):
         if len(tags) == 1 and isinstance(tags[0], interfaces.IDependency):
             dependency = tags[0]
         elif len(tags) == 1 and isinstance(tags[0], (list, tuple, set, frozenset)):
@@ -49,8 +63,7 @@ class CacheTagging(object):  # Backward compatibility
             dependency = dependencies.TagsDependency(tags)
         else:
             dependency = dependencies.DummyDependency()
-        version = kwargs.get('version', None)
-        self.cache.invalidate_dependency(dependency, version)
+        return dependency
 
     def transaction_begin(self):
         utils.warn('cache.transaction_begin()', 'cache.transaction.begin()')
@@ -34,6 +34,14 @@ class CacheStub(AbstractCache):
         self._cache[key] = self.pack(value)
         self._expire_info[key] = self.get_expiration(timeout)
 
+    def touch(self, key, timeout=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        if self._has_expired(key):
+            return False
+        self._expire_info[key] = self.get_expiration(timeout)
+        return True
+
     def delete(self, key, version=None):
         key = self.make_key(key, version=version)
         self.validate_key(key)
@@ -0,0 +1,372 @@
+import asyncio
+import unittest
+from cache_dependencies import aio, cache, defer, dependencies, locks, relations, transaction, utils
+from cache_dependencies.tests import helpers
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+def is_event_loop_running():
+    try:
+        return asyncio.get_event_loop().is_running()
+    except RuntimeError:  # Thread of executor has no event loop
+        return False
+
+
+class AsyncCacheStub(helpers.CacheStub):
+    """Counts async calls and forbids blocking reads by event loop."""
+
+    def __init__(self):
+        super(AsyncCacheStub, self).__init__()
+        self.async_calls = []
+        self.blocking_reads = False
+
+    def _check_blocking(self):
+        assert self.blocking_reads or not is_event_loop_running(), "Blocking read"
+
+    def add(self, key, value, timeout=None, version=None):
+        self._check_blocking()
+        return super(AsyncCacheStub, self).add(key, value, timeout, version)
+
+    def get(self, key, default=None, version=None):
+        self._check_blocking()
+        return super(AsyncCacheStub, self).get(key, default, version)
+
+    def _get(self, key, default=None, version=None):
+        return super(AsyncCacheStub, self).get(key, default, version)
+
+    def get_many(self, keys, version=None):
+        self._check_blocking()
+        return {key: value for key, value in ((key, self._get(key, version=version)) for key in keys)
+                if value is not None}
+
+    async def aget(self, key, default=None, version=None):
+        self.async_calls.append('aget')
+        return self._get(key, default, version)
+
+    async def aget_many(self, keys, version=None):
+        self.async_calls.append('aget_many')
+        return {key: value for key, value in ((key, self._get(key, version=version)) for key in keys)
+                if value is not None}
+
+    async def aset(self, key, value, timeout=None, version=None):
+        self.async_calls.append('aset')
+        self.set(key, value, timeout, version)
+
+    async def aset_many(self, data, timeout=None, version=None):
+        self.async_calls.append('aset_many')
+        self.set_many(data, timeout, version)
+
+    async def adelete(self, key, version=None):
+        self.async_calls.append('adelete')
+        self.delete(key, version)
+
+    async def adelete_many(self, keys, version=None):
+        self.async_calls.append('adelete_many')
+        self.delete_many(keys, version)
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+class AsyncCacheWrapperTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = AsyncCacheStub()
+        lock = locks.DependencyLock.make('READ COMMITTED', lambda: self.cache_wrapper, 0)
+        self.cache_wrapper = aio.AsyncCacheWrapper(
+            self.cache, relations.RelationManager(), transaction.TransactionManager(lock)
+        )
+
+    def _set(self, *args, **kwargs):
+        run(self.cache_wrapper.aset(*args, **kwargs))
+
+    def test_aget(self):
+        self._set('name1', 'value1', dependencies.TagsDependency('tag1', 'tag2'), 120)
+        self.cache.async_calls = []
+        self.assertEqual(run(self.cache_wrapper.aget('name1')), 'value1')
+        self.assertListEqual(self.cache.async_calls, ['aget', 'aget_many'])
+        run(self.cache_wrapper.ainvalidate_dependency(dependencies.TagsDependency('tag2')))
+        self.assertIsNone(run(self.cache_wrapper.aget('name1')))
+        self.assertEqual(run(self.cache_wrapper.aget('name1', 'default')), 'default')
+
+    def test_aget_many(self):
+        self._set('name1', 'value1', dependencies.TagsDependency('tag1'), 120)
+        self._set('name2', 'value2', dependencies.CompositeDependency(
+            dependencies.TagsDependency('tag2'), dependencies.DummyDependency()
+        ), 120)
+        self._set('name3', 'value3', dependencies.TagsDependency('tag3'), 120)
+        run(self.cache_wrapper.ainvalidate_dependency(dependencies.TagsDependency('tag3')))
+        self.cache.async_calls = []
+        self.assertDictEqual(run(self.cache_wrapper.aget_many(['name1', 'name2', 'name3', 'name4'])),
+                             {'name1': 'value1', 'name2': 'value2'})
+        # Tag versions of all entries are aggregated into single query.
+        self.assertListEqual(self.cache.async_calls, ['aget_many', 'aget_many'])
+
+    def test_aset(self):
+        self._set('name1', 'value1', dependencies.TagsDependency('tag1'), 120)
+        self.assertIn('aset', self.cache.async_calls)
+        self.assertEqual(self.cache_wrapper.get('name1'), 'value1')
+
+    def test_repeatable_read(self):
+        # Tag states are read and written by executor, not by event loop.
+        lock = locks.DependencyLock.make('REPEATABLE READ', lambda: self.cache_wrapper, 0)
+        self.cache_wrapper.transaction = transaction.TransactionManager(lock)
+        self.cache_wrapper.transaction.begin()
+        self._set('name1', 'value1', dependencies.TagsDependency('tag1'), 120)
+        run(self.cache_wrapper.ainvalidate_dependency(dependencies.TagsDependency('tag1')))
+        self.assertIsNone(run(self.cache_wrapper.aget('name1')))
+        self.cache_wrapper.transaction.finish()
+
+    def test_ainvalidate_dependency(self):
+        self._set('name1', 'value1', dependencies.TagsDependency('tag1'), 120)
+        self.cache.async_calls = []
+        run(self.cache_wrapper.ainvalidate_dependency(dependencies.TagsDependency('tag1')))
+        self.assertListEqual(self.cache.async_calls, ['adelete_many'])
+        self.assertIsNone(self.cache._get(utils.make_tag_key('tag1')))
+
+    def test_aget_or_set_callback(self):
+        async def callback(value):
+            return value
+
+        self.assertEqual(run(self.cache_wrapper.aget_or_set_callback(
+            'name1', callback, dependencies.TagsDependency('tag1'), 120, args=('value1',)
+        )), 'value1')
+        self.assertEqual(run(self.cache_wrapper.aget_or_set_callback(
+            'name1', callback, dependencies.TagsDependency('tag1'), 120, args=('value2',)
+        )), 'value1')
+
+
+class ResolveTestCase(unittest.TestCase):
+
+    def test_resolve(self):
+        cache_stub = AsyncCacheStub()
+        with mock.patch.object(cache_stub, 'aget_many', wraps=cache_stub.aget_many) as aget_many:
+            deferred = dependencies.TagsDependency('1').validate(cache_stub, None)
+            run(aio.resolve(deferred))
+            run(aio.resolve(deferred))  # Already resolved
+            self.assertEqual(aget_many.call_count, 1)
+        self.assertEqual(defer.get_pending_queries(deferred), [])
+
+    def test_resolve_sync_executor(self):
+        cache_stub = helpers.CacheStub()  # Has no aget_many(), so, get_many() is called by executor
+        with mock.patch.object(cache_stub, 'get_many', wraps=cache_stub.get_many) as get_many:
+            deferred = dependencies.TagsDependency('1').validate(cache_stub, None)
+            self.assertIsNone(iter(deferred).node.async_execute)
+            run(aio.resolve(deferred))
+            self.assertEqual(get_many.call_count, 1)
+        self.assertEqual(defer.get_pending_queries(deferred), [])
+
+
+class AsyncLocalTagVersionsCacheDecoratorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.delegate = AsyncCacheStub()
+        self.cache = aio.AsyncLocalTagVersionsCacheDecorator(self.delegate, cache.LocalTagVersions(60))
+        self.tag_key = utils.make_tag_key('tag1')
+
+    def test_aget_many(self):
+        self.delegate.set_many({self.tag_key: 'version1', 'name1': 'value1'}, 3600)
+        self.assertDictEqual(run(self.cache.aget_many([self.tag_key, 'name1'])),
+                             {self.tag_key: 'version1', 'name1': 'value1'})
+        self.delegate.set_many({self.tag_key: 'version2', 'name1': 'value2'}, 3600)
+        self.assertDictEqual(run(self.cache.aget_many([self.tag_key, 'name1'])),
+                             {self.tag_key: 'version1', 'name1': 'value2'})
+
+    def test_aset_many_and_adelete_many(self):
+        run(self.cache.aset_many({self.tag_key: 'version1'}, 3600))
+        self.delegate.delete(self.tag_key)
+        self.assertDictEqual(run(self.cache.aget_many([self.tag_key])), {self.tag_key: 'version1'})
+        run(self.cache.adelete_many([self.tag_key]))
+        self.assertDictEqual(run(self.cache.aget_many([self.tag_key])), {})
+
+
+class AbstractAsyncCacheTaggingTestCase(unittest.TestCase):
+    """AsyncCacheTagging over AsyncCacheStub with READ COMMITTED transaction, options are given by subclass."""
+
+    def setUp(self):
+        self.cache = AsyncCacheStub()
+        lock = locks.DependencyLock.make('READ COMMITTED', lambda: self.cache_tagging.cache, 0)
+        self.cache_tagging = aio.AsyncCacheTagging(
+            self.cache, relations.RelationManager(), transaction.TransactionManager(lock), **self._get_options()
+        )
+
+    def _get_options(self):
+        return {}
+
+    def run(self, result=None):
+        if self.__class__.__name__.startswith('Abstract'):
+            return
+        super(AbstractAsyncCacheTaggingTestCase, self).run(result)
+
+
+class AsyncCacheTaggingTestCase(AbstractAsyncCacheTaggingTestCase):
+
+    def test_tags(self):
+        run(self.cache_tagging.aset('name1', 'value1', ('tag1', 'tag2'), 120))
+        self.assertEqual(run(self.cache_tagging.aget('name1')), 'value1')
+        run(self.cache_tagging.ainvalidate_tags('tag2'))
+        self.assertIsNone(run(self.cache_tagging.aget('name1')))
+        self.assertEqual(run(self.cache_tagging.aget_or_set_callback('name1', lambda: 'value2', ['tag1'])), 'value2')
+        self.assertEqual(self.cache_tagging.get('name1'), 'value2')
+
+    def test_aget_or_set_callback_lease(self):
+        self.cache_tagging.cache.callback_lease = locks.CallbackLease(10, wait_timeout=0.05, poll_interval=0.01)
+        self.cache_tagging.cache.callback_lease.acquire(self.cache, 'name1', None)
+        self.assertEqual(run(self.cache_tagging.aget_or_set_callback(
+            'name1', lambda: 'value1', ['tag1'], fallback='fallback'
+        )), 'fallback')
+        self.assertEqual(run(self.cache_tagging.aget_or_set_callback('name1', lambda: 'value1', ['tag1'])), 'value1')
+
+
+class AsyncTransactionInvalidationsCacheDecoratorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.delegate = AsyncCacheStub()
+        lock = locks.DependencyLock.make('READ COMMITTED', lambda: self.cache, 0)
+        self.transaction = transaction.TransactionManager(lock)
+        self.cache = aio.AsyncTransactionInvalidationsCacheDecorator(self.delegate, self.transaction)
+        self.cache_wrapper = aio.AsyncCacheWrapper(self.cache, relations.RelationManager(), self.transaction)
+        self.tag_key = utils.make_tag_key('tag1')
+
+    def test_ainvalidate_dependency(self):
+        run(self.cache_wrapper.aset('name1', 'value1', dependencies.TagsDependency('tag1'), 120))
+        self.transaction.begin()
+        run(self.cache_wrapper.ainvalidate_dependency(dependencies.TagsDependency('tag1')))
+        self.assertNotIn('adelete_many', self.delegate.async_calls)
+        self.assertIsNotNone(self.delegate.get(self.tag_key))
+        self.assertIsNone(run(self.cache_wrapper.aget('name1')))
+        self.transaction.finish()
+        self.assertIsNone(self.delegate.get(self.tag_key))
+
+
+class AsyncStaleWhileRevalidateTestCase(AbstractAsyncCacheTaggingTestCase):
+
+    def test_aget_or_set_callback_stale(self):
+        # Stale value is recomputed by asyncio task, executor only enables background mode.
+        self.cache_tagging.cache.revalidation = cache.StaleWhileRevalidate(grace=30, executor=mock.Mock())
+        run(self.cache_tagging.aset('name1', 'value1', ('tag1',), 120))
+        self.cache_tagging.invalidate_tags('tag1')
+
+        async def scenario():
+            value = await self.cache_tagging.aget_or_set_callback('name1', lambda: 'value2', ['tag1'])
+            await asyncio.gather(*aio._background_tasks)
+            return value
+
+        self.assertEqual(run(scenario()), 'value1')
+        self.assertEqual(self.cache_tagging.get('name1'), 'value2')
+
+    def test_aget_or_set_callback_single_read(self):
+        revalidation = self.cache_tagging.cache.revalidation = cache.StaleWhileRevalidate(grace=30)
+        run(self.cache_tagging.aset('name1', 'value1', ('tag1',), 120))
+        self.cache_tagging.invalidate_tags('tag1')
+        revalidation.lease.acquire(self.cache, 'name1', None)
+        del self.cache.async_calls[:]
+        self.assertEqual(run(self.cache_tagging.aget_or_set_callback('name1', lambda: 'value2', ['tag1'])), 'value1')
+        self.assertEqual(self.cache.async_calls.count('aget'), 1)
+        run(self.cache_tagging.aset('name1', 'value3', ('tag1',), 120))
+        self.assertIsNone(self.cache.get(revalidation.make_marker_key('name1')))
+
+
+class AsyncEarlyRecomputationTestCase(AbstractAsyncCacheTaggingTestCase):
+
+    def setUp(self):
+        self.early_recomputation = cache.EarlyRecomputation()
+        super(AsyncEarlyRecomputationTestCase, self).setUp()
+
+    def _get_options(self):
+        return {'early_recomputation': self.early_recomputation}
+
+    def test_aget_or_set_callback_early(self):
+        async def callback(value):
+            return value
+
+        self.assertEqual(run(self.cache_tagging.aget_or_set_callback(
+            'name1', callback, ['tag1'], 120, args=('value1',)
+        )), 'value1')
+        self.assertIsNotNone(self.cache._get('name1')['__recomputation'])
+        with mock.patch.object(self.early_recomputation, 'is_due', return_value=True):
+            self.assertEqual(run(self.cache_tagging.aget_or_set_callback(
+                'name1', callback, ['tag1'], 120, args=('value2',)
+            )), 'value2')
+        self.assertEqual(self.cache_tagging.get('name1'), 'value2')
+
+
+class AsyncTagKeysIndexTestCase(AbstractAsyncCacheTaggingTestCase):
+
+    def _get_options(self):
+        return {'tag_keys_index': cache.TagKeysIndex()}
+
+    def test_ainvalidate_tags(self):
+        run(self.cache_tagging.aset('name1', 'value1', ('tag1',), 120))
+        run(self.cache_tagging.aset('name2', 'value2', ('tag2',), 120))
+        self.assertIn('aset_many', self.cache.async_calls)
+        run(self.cache_tagging.ainvalidate_tags('tag1'))
+        self.assertIsNone(self.cache._get('name1'))
+        self.assertEqual(run(self.cache_tagging.aget('name2')), 'value2')
+
+
+class AsyncInvalidationEpochTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = AsyncCacheStub()
+        lock = locks.DependencyLock.make('READ COMMITTED', lambda: self.cache_wrapper, 0)
+        self.invalidation_epoch = cache.InvalidationEpoch()
+        self.cache_wrapper = aio.AsyncCacheWrapper(
+            self.cache, relations.RelationManager(), transaction.TransactionManager(lock),
+            invalidation_epoch=self.invalidation_epoch
+        )
+
+    def test_aget(self):
+        run(self.cache_wrapper.aset('name1', 'value1', dependencies.TagsDependency('tag1'), 120))
+        self.cache.async_calls = []
+        self.assertEqual(run(self.cache_wrapper.aget('name1')), 'value1')
+        self.assertDictEqual(run(self.cache_wrapper.aget_many(['name1'])), {'name1': 'value1'})
+        self.assertListEqual(self.cache.async_calls, ['aget_many', 'aget_many'])
+        run(self.cache_wrapper.ainvalidate_dependency(dependencies.TagsDependency('tag1')))
+        self.assertIsNone(self.cache._get(self.invalidation_epoch.key))
+        self.assertIsNone(run(self.cache_wrapper.aget('name1')))
+
+
+class AsyncNamespaceCacheDecoratorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.delegate = AsyncCacheStub()
+        self.namespaces = cache.CacheNamespaces()
+        self.cache = aio.AsyncNamespaceCacheDecorator(self.delegate, self.namespaces)
+
+    def test_aget_many(self):
+        async def scenario():
+            with self.namespaces.activate('tenant1'):
+                await self.cache.aset_many({'name1': 'value1', 'name2': 'value2'})
+                self.assertEqual(await self.cache.aget('name1'), 'value1')
+                result = await self.cache.aget_many(['name1', 'name2', 'name3'])
+                await self.cache.adelete_many(['name2'])
+                return result, await self.cache.aget_many(['name1', 'name2'])
+
+        self.assertEqual(run(scenario()), ({'name1': 'value1', 'name2': 'value2'}, {'name1': 'value1'}))
+        self.assertIsNone(self.delegate._get('name1'))
+
+
+class AsyncSlidingTagTimeoutCacheDecoratorTestCase(unittest.TestCase):
+
+    def test_aget_many(self):
+        delegate = AsyncCacheStub()
+        tag_touches = cache.TagTouches(interval=60)
+        cache_decorator = aio.AsyncSlidingTagTimeoutCacheDecorator(delegate, tag_touches)
+        tag_key = utils.make_tag_key('tag1')
+        delegate.set(tag_key, 'version1', 10)
+        self.assertDictEqual(run(cache_decorator.aget_many([tag_key])), {tag_key: 'version1'})
+        self.assertListEqual(delegate.async_calls, ['aget_many'])
+        with mock.patch.object(tag_touches, '_current_time', return_value=tag_touches._current_time() + 61):
+            run(cache_decorator.aget_many([tag_key]))
+        # AsyncCacheStub has no atouch(), so, the tag version is not set again.
+        self.assertListEqual(delegate.async_calls, ['aget_many', 'aget_many'])
@@ -0,0 +1,751 @@
+import time
+import unittest
+import threading
+from cache_dependencies import cache, dependencies, exceptions, locks, relations, transaction, utils
+from cache_dependencies.tests import helpers
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+class LocalTagVersionsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.local = cache.LocalTagVersions(0.1, max_size=3)
+
+    def test_get_many(self):
+        self.local.set_many({('k1', None): 'v1', ('k2', 1): 'v2'})
+        self.assertDictEqual(self.local.get_many([('k1', None), ('k2', 1), ('k2', None)]),
+                             {('k1', None): 'v1', ('k2', 1): 'v2'})
+
+    def test_expired(self):
+        with mock.patch.object(self.local, '_current_time', return_value=1000.0):
+            self.local.set_many({('k1', None): 'v1'})
+        with mock.patch.object(self.local, '_current_time', return_value=1000.05):
+            self.assertDictEqual(self.local.get_many([('k1', None)]), {('k1', None): 'v1'})
+        with mock.patch.object(self.local, '_current_time', return_value=1000.2):
+            self.assertDictEqual(self.local.get_many([('k1', None)]), {})
+
+    def test_delete_many(self):
+        self.local.set_many({('k1', None): 'v1', ('k2', None): 'v2'})
+        self.local.delete_many([('k1', None)])
+        self.assertDictEqual(self.local.get_many([('k1', None), ('k2', None)]), {('k2', None): 'v2'})
+
+    def test_max_size(self):
+        self.local.set_many({('k1', None): 'v1', ('k2', None): 'v2', ('k3', None): 'v3'})
+        self.local.set_many({('k4', None): 'v4'})
+        self.assertDictEqual(self.local.get_many([('k1', None), ('k4', None)]), {('k4', None): 'v4'})
+
+
+class LocalTagVersionsCacheDecoratorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.delegate = helpers.CacheStub()
+        self.local = cache.LocalTagVersions(60)
+        self.cache = cache.LocalTagVersionsCacheDecorator(self.delegate, self.local)
+        self.tag_key = utils.make_tag_key('tag1')
+        self.delegate.set_many({self.tag_key: 'version1', 'name1': 'value1'}, 3600)
+
+    def test_get_many(self):
+        self.assertDictEqual(self.cache.get_many([self.tag_key, 'name1']),
+                             {self.tag_key: 'version1', 'name1': 'value1'})
+        self.delegate.set_many({self.tag_key: 'version2', 'name1': 'value2'}, 3600)
+        # Tag version is served from local storage, other keys are not.
+        self.assertDictEqual(self.cache.get_many([self.tag_key, 'name1']),
+                             {self.tag_key: 'version1', 'name1': 'value2'})
+        self.assertDictEqual(self.cache.get_many([self.tag_key], version=2), {})
+
+    def test_local_hit(self):
+        self.cache.get_many([self.tag_key])
+        with mock.patch.object(self.delegate, 'get_many') as get_many:
+            self.assertDictEqual(self.cache.get_many([self.tag_key]), {self.tag_key: 'version1'})
+            get_many.assert_not_called()
+
+    def test_delete_many(self):
+        self.cache.get_many([self.tag_key])
+        self.cache.delete_many([self.tag_key])
+        self.assertDictEqual(self.cache.get_many([self.tag_key]), {})
+        self.assertIsNone(self.delegate.get(self.tag_key))
+
+    def test_set_many(self):
+        self.cache.set_many({self.tag_key: 'version2'}, 3600)
+        self.assertEqual(self.delegate.get(self.tag_key), 'version2')
+        with mock.patch.object(self.delegate, 'get_many') as get_many:
+            self.assertDictEqual(self.cache.get_many([self.tag_key]), {self.tag_key: 'version2'})
+            get_many.assert_not_called()
+
+    def test_cache_wrapper(self):
+        lock = locks.DependencyLock.make('READ COMMITTED', lambda: self.cache, 0)
+        cache_wrapper = cache.CacheWrapper(
+            self.cache, relations.RelationManager(), transaction.TransactionManager(lock)
+        )
+        cache_wrapper.set('name2', 'value2', dependencies.TagsDependency('tag1'), 120)
+        self.assertEqual(cache_wrapper.get('name2'), 'value2')
+        with mock.patch.object(self.delegate, 'get_many') as get_many:
+            self.assertEqual(cache_wrapper.get('name2'), 'value2')
+            get_many.assert_not_called()
+        cache_wrapper.invalidate_dependency(dependencies.TagsDependency('tag1'))
+        self.assertIsNone(cache_wrapper.get('name2'))
+
+
+class TransactionTagVersionsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.delegate = helpers.CacheStub()
+        lock = locks.DependencyLock.make('READ COMMITTED', lambda: self.cache, 0)
+        self.transaction = transaction.TransactionManager(lock)
+        self.cache = cache.LocalTagVersionsCacheDecorator(
+            self.delegate, cache.TransactionTagVersions(self.transaction)
+        )
+        self.cache_wrapper = cache.CacheWrapper(self.cache, relations.RelationManager(), self.transaction)
+        self.cache_wrapper.set('name1', 'value1', dependencies.TagsDependency('tag1', 'tag2'), 120)
+        self.cache_wrapper.set('name2', 'value2', dependencies.TagsDependency('tag1'), 120)
+
+    def test_outside_transaction(self):
+        with mock.patch.object(self.delegate, 'get_many', wraps=self.delegate.get_many) as get_many:
+            self.assertEqual(self.cache_wrapper.get('name1'), 'value1')
+            self.assertEqual(self.cache_wrapper.get('name1'), 'value1')
+            self.assertEqual(get_many.call_count, 2)
+
+    def test_memo(self):
+        self.transaction.begin()
+        self.assertEqual(self.cache_wrapper.get('name1'), 'value1')
+        with mock.patch.object(self.delegate, 'get_many', wraps=self.delegate.get_many) as get_many:
+            self.assertEqual(self.cache_wrapper.get('name1'), 'value1')
+            self.assertEqual(self.cache_wrapper.get('name2'), 'value2')
+            self.transaction.begin()  # SavePoint shares memo of transaction
+            self.cache_wrapper.set('name3', 'value3', dependencies.TagsDependency('tag2'), 120)
+            self.transaction.finish()
+            # Tag versions are served from memo, only values and tag states are fetched.
+            for args, kwargs in get_many.call_args_list:
+                self.assertFalse([key for key in args[0] if utils.is_tag_key(key)])
+        self.transaction.flush()
+        self.assertIsNone(self.transaction.current().get_tag_versions_memo())
+
+    def test_invalidate(self):
+        self.transaction.begin()
+        self.assertEqual(self.cache_wrapper.get('name1'), 'value1')
+        self.cache_wrapper.invalidate_dependency(dependencies.TagsDependency('tag2'))
+        self.assertIsNone(self.cache_wrapper.get('name1'))
+        self.assertEqual(self.cache_wrapper.get('name2'), 'value2')
+        self.transaction.flush()
+
+
+class TransactionInvalidationsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.delegate = helpers.CacheStub()
+        self.transaction = transaction.TransactionManager(self._make_lock('READ COMMITTED'))
+        self.cache = cache.TransactionInvalidationsCacheDecorator(self.delegate, self.transaction)
+        self.cache_wrapper = cache.CacheWrapper(self.cache, relations.RelationManager(), self.transaction)
+        self.cache_wrapper.set('name1', 'value1', dependencies.TagsDependency('tag1', 'tag2'), 120)
+        self.cache_wrapper.set('name2', 'value2', dependencies.TagsDependency('tag3'), 120)
+
+    def _make_lock(self, isolation_level):
+        return locks.DependencyLock.make(isolation_level, lambda: self.cache, 0)
+
+    def test_outside_transaction(self):
+        self.cache_wrapper.invalidate_dependency(dependencies.TagsDependency('tag1'))
+        self.assertIsNone(self.delegate.get(utils.make_tag_key('tag1')))
+        self.assertIsNone(self.cache_wrapper.get('name1'))
+
+    def test_invalidate(self):
+        self.transaction.begin()
+        with mock.patch.object(self.delegate, 'delete_many', wraps=self.delegate.delete_many) as delete_many:
+            for tag in ('tag1', 'tag2', 'tag1'):
+                self.cache_wrapper.invalidate_dependency(dependencies.TagsDependency(tag))
+            self.transaction.begin()  # SavePoint shares memo of transaction
+            self.cache_wrapper.invalidate_dependency(dependencies.TagsDependency('tag1'))
+            self.transaction.finish()
+            delete_many.assert_not_called()
+            self.assertIsNotNone(self.delegate.get(utils.make_tag_key('tag1')))
+            # Own invalidations are visible immediately.
+            self.assertIsNone(self.cache_wrapper.get('name1'))
+            self.assertEqual(self.cache_wrapper.get('name2'), 'value2')
+            self.cache_wrapper.set('name1', 'value3', dependencies.TagsDependency('tag1', 'tag2'), 120)
+            self.assertIsNone(self.cache_wrapper.get('name1'))
+            self.transaction.finish()
+            # Release of lock does not delete already flushed tags again.
+            self.assertEqual(delete_many.call_count, 1)
+            self.assertSetEqual(set(delete_many.call_args[0][0]),
+                                {utils.make_tag_key('tag1'), utils.make_tag_key('tag2')})
+        self.assertIsNone(self.cache_wrapper.get('name1'))
+        self.assertEqual(self.cache_wrapper.get('name2'), 'value2')
+
+    def test_acquired_tag_states(self):
+        self.transaction = transaction.TransactionManager(self._make_lock('REPEATABLE READ'))
+        self.cache = cache.TransactionInvalidationsCacheDecorator(self.delegate, self.transaction)
+        self.cache_wrapper = cache.CacheWrapper(self.cache, relations.RelationManager(), self.transaction)
+        self.transaction.begin()
+        with mock.patch.object(self.delegate, 'set_many', wraps=self.delegate.set_many) as set_many:
+            for i in range(3):
+                self.cache_wrapper.invalidate_dependency(dependencies.TagsDependency('tag1'))
+            self.cache_wrapper.invalidate_dependency(dependencies.TagsDependency('tag1', 'tag2'))
+            set_many.assert_not_called()
+            delete_many = self.delegate.delete_many
+
+            def delete_many_after_acquire(*args, **kwargs):
+                self.assertEqual(set_many.call_count, 1)
+                return delete_many(*args, **kwargs)
+
+            with mock.patch.object(self.delegate, 'delete_many', side_effect=delete_many_after_acquire) as mocked:
+                self.transaction.finish()
+                self.assertEqual(mocked.call_count, 1)
+            # Acquired tag states are written with marker by single set_many() before deletion of tags,
+            # released tag states are written by single set_many() too.
+            self.assertEqual(set_many.call_count, 2)
+            self.assertSetEqual(set(set_many.call_args_list[0][0][0].keys()), {
+                dependencies.AcquiredTagState.make_key('tag1'),
+                dependencies.AcquiredTagState.make_key('tag2'),
+                dependencies.TagsDependency.ACQUIRED_MARKER_KEY,
+            })
+        self.assertIsNone(self.cache_wrapper.get('name1'))
+
+    def test_acquired_tag_state_key(self):
+        self.assertTrue(transaction.InvalidationsMemo._is_acquired_tag_state_key(
+            dependencies.AcquiredTagState.make_key('tag1')
+        ))
+        self.assertFalse(transaction.InvalidationsMemo._is_acquired_tag_state_key('acquired_tag_cloud'))
+
+    def test_read_uncommitted(self):
+        self.transaction = transaction.TransactionManager(self._make_lock('READ UNCOMMITTED'))
+        self.cache = cache.TransactionInvalidationsCacheDecorator(self.delegate, self.transaction)
+        self.cache_wrapper = cache.CacheWrapper(self.cache, relations.RelationManager(), self.transaction)
+        self.transaction.begin()
+        self.cache_wrapper.invalidate_dependency(dependencies.TagsDependency('tag1'))
+        self.assertIsNone(self.delegate.get(utils.make_tag_key('tag1')))
+        self.transaction.finish()
+
+    def test_independent_transaction(self):
+        self.transaction.begin()
+        self.cache_wrapper.invalidate_dependency(dependencies.TagsDependency('tag1'))
+        self.transaction.begin(independent=True)
+        self.assertIsNone(self.cache_wrapper.get('name1'))
+        self.cache_wrapper.invalidate_dependency(dependencies.TagsDependency('tag3'))
+        self.transaction.finish()
+        self.assertIsNone(self.delegate.get(utils.make_tag_key('tag3')))
+        self.assertIsNotNone(self.delegate.get(utils.make_tag_key('tag1')))
+        self.assertIsNone(self.cache_wrapper.get('name1'))
+        self.transaction.finish()
+        self.assertIsNone(self.delegate.get(utils.make_tag_key('tag1')))
+
+
+class UnpickleCounter(object):
+    count = 0
+
+    def __init__(self, value):
+        self.value = value
+
+    def __setstate__(self, state):
+        UnpickleCounter.count += 1
+        self.__dict__.update(state)
+
+
+class AbstractCacheWrapperTestCase(unittest.TestCase):
+    """CacheWrapper over CacheStub with READ COMMITTED transaction, options are given by subclass."""
+
+    def setUp(self):
+        self.cache = helpers.CacheStub()
+        lock = locks.DependencyLock.make('READ COMMITTED', lambda: self.cache_wrapper, 0)
+        self.transaction = transaction.TransactionManager(lock)
+        self.cache_wrapper = cache.CacheWrapper(
+            self._decorate_cache(self.cache), relations.RelationManager(), self.transaction, **self._get_options()
+        )
+
+    def _decorate_cache(self, cache_stub):
+        return cache_stub
+
+    def _get_options(self):
+        return {}
+
+    def run(self, result=None):
+        if self.__class__.__name__.startswith('Abstract'):
+            return
+        super(AbstractCacheWrapperTestCase, self).run(result)
+
+
+class CacheWrapperTestCase(AbstractCacheWrapperTestCase):
+
+    def test_get(self):
+        UnpickleCounter.count = 0
+        self.cache_wrapper.set('name1', UnpickleCounter(1), dependencies.TagsDependency('tag1'), 120)
+        self.assertEqual(self.cache_wrapper.get('name1').value, 1)
+        self.assertEqual(UnpickleCounter.count, 1)
+        self.cache_wrapper.invalidate_dependency(dependencies.TagsDependency('tag1'))
+        self.assertIsNone(self.cache_wrapper.get('name1'))
+        self.assertEqual(UnpickleCounter.count, 1)
+
+    def test_get_many(self):
+        UnpickleCounter.count = 0
+        self.cache_wrapper.set('name1', UnpickleCounter(1), dependencies.TagsDependency('tag1'), 120)
+        self.cache_wrapper.set('name2', UnpickleCounter(2), dependencies.TagsDependency('tag2'), 120)
+        self.cache_wrapper.invalidate_dependency(dependencies.TagsDependency('tag1'))
+        values = self.cache_wrapper.get_many(['name1', 'name2'])
+        self.assertListEqual(list(values.keys()), ['name2'])
+        self.assertEqual(values['name2'].value, 2)
+        self.assertEqual(UnpickleCounter.count, 1)
+
+    def test_get_fast_path(self):
+        self.cache_wrapper.set('name1', 'value1', dependencies.TagsDependency('tag1', 'tag2'), 120)
+        with mock.patch.object(dependencies.TagsDependency, 'validate') as validate, \
+                mock.patch.object(self.cache, 'get_many', wraps=self.cache.get_many) as get_many:
+            self.assertEqual(self.cache_wrapper.get('name1'), 'value1')
+            validate.assert_not_called()
+            self.assertEqual(get_many.call_count, 1)
+        self.cache_wrapper.invalidate_dependency(dependencies.TagsDependency('tag2'))
+        self.assertIsNone(self.cache_wrapper.get('name1'))
+
+    def test_get_single_tags_dependency(self):
+        tags_dependency = dependencies.TagsDependency('tag1')
+        get_single_tags_dependency = cache.CacheWrapper._get_single_tags_dependency
+        self.assertIs(get_single_tags_dependency(tags_dependency), tags_dependency)
+        self.assertIs(get_single_tags_dependency(dependencies.CompositeDependency(
+            dependencies.DummyDependency(), tags_dependency
+        )), tags_dependency)
+        self.assertIsNone(get_single_tags_dependency(dependencies.CompositeDependency(
+            tags_dependency, dependencies.TagsDependency('tag2')
+        )))
+        self.assertIsNone(get_single_tags_dependency(dependencies.CompositeDependency(
+            tags_dependency, mock.Mock(spec=dependencies.DummyDependency)
+        )))
+        self.assertIsNone(get_single_tags_dependency(dependencies.DummyDependency()))
+
+    def test_legacy_envelope(self):
+        dependency = dependencies.DummyDependency()
+        self.cache.set('name1', {'__value': 'value1', '__dependency': dependency})
+        self.cache.set('name2', 'value2')
+        self.assertEqual(self.cache_wrapper.get('name1'), 'value1')
+        self.assertDictEqual(self.cache_wrapper.get_many(['name1', 'name2']), {'name1': 'value1', 'name2': 'value2'})
+
+    def test_envelope_guard(self):
+        self.cache_wrapper.set('name1', 'value1', dependencies.TagsDependency('tag1'), 120)
+        data = self.cache.get('name1')
+        # Reader of legacy format sees missed cache instead of the envelope.
+        self.assertIsNone(data['__value'])
+        with self.assertRaises(exceptions.DependencyInvalid):
+            data['__dependency'].validate(self.cache, None).get()
+
+        # Reader sees missed cache instead of envelope of unknown format.
+        data['__envelope'] = cache.CacheWrapper.ENVELOPE_VERSION + 1
+        self.cache.set('name1', data)
+        self.assertIsNone(self.cache_wrapper.get('name1'))
+        self.assertDictEqual(self.cache_wrapper.get_many(['name1']), {})
+
+    def test_get_or_set_callback_lease(self):
+        self.cache_wrapper.callback_lease = locks.CallbackLease(timeout=10, wait_timeout=1.0, poll_interval=0.01)
+        dependency = dependencies.TagsDependency('tag1')
+        token = self.cache_wrapper.callback_lease.acquire(self.cache, 'name1', None)
+
+        def concurrent_caller():
+            time.sleep(0.05)
+            self.cache_wrapper.set('name1', 'value1', dependency, 120)
+            self.cache_wrapper.callback_lease.release(self.cache, 'name1', token, None)
+
+        thread = threading.Thread(target=concurrent_caller)
+        thread.start()
+        callback = mock.Mock(return_value='value2')
+        self.assertEqual(self.cache_wrapper.get_or_set_callback('name1', callback, dependency, 120), 'value1')
+        thread.join()
+        callback.assert_not_called()
+
+        self.cache_wrapper.invalidate_dependency(dependency)
+        self.assertEqual(self.cache_wrapper.get_or_set_callback('name1', callback, dependency, 120), 'value2')
+        self.assertFalse(self.cache_wrapper.callback_lease.is_held(self.cache, 'name1', None))
+
+    def test_get_or_set_callback_lease_fallback(self):
+        self.cache_wrapper.callback_lease = locks.CallbackLease(timeout=10, wait_timeout=0.05, poll_interval=0.01)
+        self.cache_wrapper.callback_lease.acquire(self.cache, 'name1', None)
+        callback = mock.Mock(return_value='value1')
+        dependency = dependencies.TagsDependency('tag1')
+        self.assertEqual(self.cache_wrapper.get_or_set_callback(
+            'name1', callback, dependency, 120, fallback='fallback'
+        ), 'fallback')
+        callback.assert_not_called()
+        self.assertEqual(self.cache_wrapper.get_or_set_callback('name1', callback, dependency, 120), 'value1')
+        callback.assert_called_once_with()
+
+
+class ImmediateExecutor(object):
+    def __init__(self):
+        self.calls = []
+
+    def submit(self, func, *args, **kwargs):
+        self.calls.append((func, args, kwargs))
+
+    def run(self):
+        calls, self.calls = self.calls, []
+        for func, args, kwargs in calls:
+            func(*args, **kwargs)
+
+
+class StaleWhileRevalidateTestCase(AbstractCacheWrapperTestCase):
+
+    def setUp(self):
+        self.revalidation = cache.StaleWhileRevalidate(grace=30)
+        super(StaleWhileRevalidateTestCase, self).setUp()
+        self.dependency = dependencies.TagsDependency('tag1')
+        self.cache_wrapper.set('name1', 'value1', self.dependency, 120)
+        self.cache_wrapper.invalidate_dependency(self.dependency)
+        self.callback = mock.Mock(return_value='value2')
+
+    def _get_options(self):
+        return {'revalidation': self.revalidation}
+
+    def _get_or_set_callback(self, **kwargs):
+        return self.cache_wrapper.get_or_set_callback('name1', self.callback, self.dependency, 120, **kwargs)
+
+    def test_lease_holder_recomputes(self):
+        self.assertEqual(self._get_or_set_callback(), 'value2')
+        self.callback.assert_called_once_with()
+        self.assertIsNone(self.cache.get(self.revalidation.make_marker_key('name1')))
+        self.assertFalse(self.revalidation.lease.is_held(self.cache, 'name1', None))
+
+    def test_concurrent_caller_gets_stale(self):
+        self.revalidation.lease.acquire(self.cache, 'name1', None)
+        self.assertEqual(self._get_or_set_callback(), 'value1')
+        self.callback.assert_not_called()
+        self.assertEqual(self._get_or_set_callback(allow_stale=False), 'value2')
+
+    def test_grace(self):
+        self.revalidation.lease.acquire(self.cache, 'name1', None)
+        self.assertEqual(self._get_or_set_callback(), 'value1')
+        with mock.patch.object(self.revalidation, '_current_time', return_value=time.time() + 31):
+            self.assertEqual(self._get_or_set_callback(), 'value2')
+
+    def test_executor(self):
+        self.revalidation.executor = ImmediateExecutor()
+        self.assertEqual(self._get_or_set_callback(), 'value1')
+        self.assertEqual(self._get_or_set_callback(), 'value1')
+        self.assertEqual(len(self.revalidation.executor.calls), 1)
+        self.callback.assert_not_called()
+        self.revalidation.executor.run()
+        self.callback.assert_called_once_with()
+        self.assertEqual(self.cache_wrapper.get('name1'), 'value2')
+        self.assertFalse(self.revalidation.lease.is_held(self.cache, 'name1', None))
+
+    def test_executor_failure(self):
+        self.revalidation.executor = ImmediateExecutor()
+        self.callback.side_effect = ValueError
+        self.assertEqual(self._get_or_set_callback(), 'value1')
+        with mock.patch.object(cache.logger, 'exception') as log_exception:
+            self.revalidation.executor.run()
+            self.assertEqual(log_exception.call_count, 1)
+        self.assertFalse(self.revalidation.lease.is_held(self.cache, 'name1', None))
+
+    def test_missed(self):
+        self.assertEqual(self.cache_wrapper.get_or_set_callback('name2', self.callback, self.dependency, 120), 'value2')
+
+    def test_set_resets_marker(self):
+        self.revalidation.lease.acquire(self.cache, 'name1', None)
+        self.assertEqual(self._get_or_set_callback(), 'value1')
+        self.assertIsNotNone(self.cache.get(self.revalidation.make_marker_key('name1')))
+        self.cache_wrapper.set('name1', 'value3', self.dependency, 120)
+        self.assertIsNone(self.cache.get(self.revalidation.make_marker_key('name1')))
+
+    def test_single_read(self):
+        self.revalidation.lease.acquire(self.cache, 'name1', None)
+        with mock.patch.object(self.cache, 'get', wraps=self.cache.get) as get:
+            self.assertEqual(self._get_or_set_callback(), 'value1')
+            self.assertEqual([args[0] for args, kwargs in get.call_args_list].count('name1'), 1)
+
+
+class EarlyRecomputationTestCase(AbstractCacheWrapperTestCase):
+
+    def setUp(self):
+        self.early_recomputation = cache.EarlyRecomputation(beta=1.0)
+        super(EarlyRecomputationTestCase, self).setUp()
+        self.dependency = dependencies.TagsDependency('tag1')
+        self.callback = mock.Mock(return_value='value1')
+
+    def _get_options(self):
+        return {'early_recomputation': self.early_recomputation}
+
+    def _get_or_set_callback(self):
+        return self.cache_wrapper.get_or_set_callback('name1', self.callback, self.dependency, 120)
+
+    def test_envelope(self):
+        now = time.time()
+        self._get_or_set_callback()
+        delta, expiry = self.cache.get('name1')['__recomputation']
+        self.assertGreaterEqual(delta, 0)
+        self.assertAlmostEqual(expiry, now + 120, delta=1)
+        self.assertIsNone(self.early_recomputation.make_recomputation(delta, None))
+
+    def test_is_due(self):
+        data = {'__recomputation': (2.0, 1000.0)}
+        with mock.patch.object(self.early_recomputation, '_current_time', return_value=990.0), \
+                mock.patch('random.random', return_value=0.99):  # -log(0.01) * 2.0 ~ 9.2
+            self.assertFalse(self.early_recomputation.is_due(data))
+        with mock.patch.object(self.early_recomputation, '_current_time', return_value=991.0), \
+                mock.patch('random.random', return_value=0.99):
+            self.assertTrue(self.early_recomputation.is_due(data))
+        self.assertFalse(self.early_recomputation.is_due({}))
+
+    def test_recompute_early(self):
+        self.assertEqual(self._get_or_set_callback(), 'value1')
+        self.callback.return_value = 'value2'
+        self.assertEqual(self._get_or_set_callback(), 'value1')
+        self.assertEqual(self.callback.call_count, 1)
+        with mock.patch.object(self.early_recomputation, 'is_due', return_value=True):
+            self.assertEqual(self._get_or_set_callback(), 'value2')
+        self.assertEqual(self.callback.call_count, 2)
+        self.assertEqual(self.cache_wrapper.get('name1'), 'value2')
+
+    def test_lease_is_held(self):
+        self.cache_wrapper.callback_lease = locks.CallbackLease(timeout=10)
+        self.assertEqual(self._get_or_set_callback(), 'value1')
+        self.callback.return_value = 'value2'
+        self.cache_wrapper.callback_lease.acquire(self.cache, 'name1', None)
+        with mock.patch.object(self.early_recomputation, 'is_due', return_value=True):
+            self.assertEqual(self._get_or_set_callback(), 'value1')
+        self.assertEqual(self.callback.call_count, 1)
+
+
+class TagKeysIndexTestCase(AbstractCacheWrapperTestCase):
+
+    def setUp(self):
+        self.tag_keys_index = cache.TagKeysIndex(shards=2, max_size=2)
+        super(TagKeysIndexTestCase, self).setUp()
+
+    def _get_options(self):
+        return {'tag_keys_index': self.tag_keys_index}
+
+    def test_invalidate_dependency(self):
+        self.cache_wrapper.set('name1', 'value1', dependencies.TagsDependency('tag1', 'tag2'), 120)
+        self.cache_wrapper.set('name2', 'value2', dependencies.TagsDependency('tag2'), 120)
+        self.cache_wrapper.set('name3', 'value3', dependencies.TagsDependency('tag3'), 120)
+        self.cache_wrapper.invalidate_dependency(dependencies.TagsDependency('tag1'))
+        self.assertIsNone(self.cache.get('name1'))
+        self.assertIsNotNone(self.cache.get('name2'))
+        self.assertIsNotNone(self.cache.get('name3'))
+        self.assertDictEqual(self.cache.get_many(self.tag_keys_index.make_keys(['tag1'])), {})
+        self.cache_wrapper.invalidate_dependency(dependencies.TagsDependency('tag2'))
+        self.assertIsNone(self.cache.get('name2'))
+        self.assertEqual(self.cache_wrapper.get('name3'), 'value3')
+
+    def test_descendants(self):
+        def callback():
+            self.cache_wrapper.set('name2', 'value2', dependencies.TagsDependency('tag2'), 120)
+            return 'value1'
+
+        self.cache_wrapper.get_or_set_callback('name1', callback, dependencies.TagsDependency('tag1'), 120)
+        self.cache_wrapper.invalidate_dependency(dependencies.TagsDependency('tag2'))
+        self.assertIsNone(self.cache.get('name1'))
+        self.assertIsNone(self.cache.get('name2'))
+
+    def test_max_size(self):
+        index_key = self.tag_keys_index.make_keys(['tag1'], 'name1')[0]
+        self.assertDictEqual(self.tag_keys_index.update({index_key: ['name2', 'name3']}, [index_key], 'name1'),
+                             {index_key: ['name3', 'name1']})
+        self.assertDictEqual(self.tag_keys_index.update({index_key: ['name1']}, [index_key], 'name1'), {})
+        self.assertEqual(len(self.tag_keys_index.make_keys(['tag1', 'tag2'])), 4)
+
+
+class InvalidationEpochTestCase(AbstractCacheWrapperTestCase):
+
+    def setUp(self):
+        self.invalidation_epoch = cache.InvalidationEpoch()
+        super(InvalidationEpochTestCase, self).setUp()
+
+    def _get_options(self):
+        return {'invalidation_epoch': self.invalidation_epoch}
+
+    def test_get(self):
+        self.cache_wrapper.set('name1', 'value1', dependencies.TagsDependency('tag1'), 120)
+        self.assertIsNotNone(self.cache.get('name1')['__epoch'])
+        with mock.patch.object(self.cache, 'get_many', wraps=self.cache.get_many) as get_many:
+            self.assertEqual(self.cache_wrapper.get('name1'), 'value1')
+            get_many.assert_called_once_with(['name1', self.invalidation_epoch.key], None)
+        self.cache_wrapper.invalidate_dependency(dependencies.TagsDependency('tag2'))
+        self.assertIsNone(self.cache.get(self.invalidation_epoch.key))
+        with mock.patch.object(self.cache, 'get_many', wraps=self.cache.get_many) as get_many:
+            self.assertEqual(self.cache_wrapper.get('name1'), 'value1')
+            self.assertEqual(get_many.call_count, 2)
+        self.cache_wrapper.invalidate_dependency(dependencies.TagsDependency('tag1'))
+        self.assertIsNone(self.cache_wrapper.get('name1'))
+
+    def test_get_many(self):
+        self.cache_wrapper.set('name1', 'value1', dependencies.TagsDependency('tag1'), 120)
+        self.cache_wrapper.invalidate_dependency(dependencies.TagsDependency('tag1'))
+        self.cache_wrapper.set('name2', 'value2', dependencies.TagsDependency('tag2'), 120)
+        with mock.patch.object(dependencies.TagsDependency, 'validate', autospec=True,
+                               side_effect=dependencies.TagsDependency.validate) as validate:
+            self.assertDictEqual(self.cache_wrapper.get_many(['name1', 'name2']), {'name2': 'value2'})
+            self.assertListEqual([call[0][0].tags for call in validate.call_args_list], [{'tag1'}])
+
+    def test_release(self):
+        # Invalidation by lock (not by invalidate_dependency()) changes the epoch as well.
+        self.cache_wrapper.set('name1', 'value1', dependencies.TagsDependency('tag1'), 120)
+        dependencies.TagsDependency('tag1').invalidate(self.cache_wrapper, None)
+        self.assertIsNone(self.cache_wrapper.get('name1'))
+
+    def test_decorator(self):
+        decorator = cache.InvalidationEpochCacheDecorator(self.cache, self.invalidation_epoch)
+        self.cache.set_many({'name1': 'value1', self.invalidation_epoch.key: 'epoch1'})
+        decorator.delete('name1')
+        self.assertEqual(self.cache.get(self.invalidation_epoch.key), 'epoch1')
+        with mock.patch.object(self.cache, 'delete_many') as delete_many:
+            decorator.delete(utils.make_tag_key('tag1'))
+            delete_many.assert_called_once_with([utils.make_tag_key('tag1'), self.invalidation_epoch.key], version=None)
+
+
+class TagNamespacesTestCase(AbstractCacheWrapperTestCase):
+
+    def _get_options(self):
+        return {'tag_namespace_separator': '.'}
+
+    def test_get_namespace_tags(self):
+        self.assertSetEqual(
+            dependencies.TagsDependency.get_namespace_tags(['blog.post.pk:42', 'blog.post.*', 'tag1'], '.'),
+            {'blog.*', 'blog.post.*'}
+        )
+
+    def test_invalidate_namespace(self):
+        self.cache_wrapper.set('name1', 'value1', dependencies.TagsDependency('blog.post.pk:42'), 120)
+        self.cache_wrapper.set('name2', 'value2', dependencies.TagsDependency('blog.comment.pk:1'), 120)
+        with mock.patch.object(self.cache, 'get_many', wraps=self.cache.get_many) as get_many:
+            self.assertEqual(self.cache_wrapper.get('name1'), 'value1')
+            self.assertEqual(get_many.call_count, 1)  # Namespaces are validated by the same query
+        self.cache_wrapper.invalidate_dependency(dependencies.TagsDependency('blog.post.*'))
+        self.assertIsNone(self.cache_wrapper.get('name1'))
+        self.assertEqual(self.cache_wrapper.get('name2'), 'value2')
+        self.cache_wrapper.invalidate_dependency(dependencies.TagsDependency('blog.*'))
+        self.assertIsNone(self.cache_wrapper.get('name2'))
+
+    def test_invalidate_tag(self):
+        self.cache_wrapper.set('name1', 'value1', dependencies.TagsDependency('blog.post.pk:42'), 120)
+        self.cache_wrapper.set('name2', 'value2', dependencies.TagsDependency('blog.post.pk:43'), 120)
+        self.cache_wrapper.invalidate_dependency(dependencies.TagsDependency('blog.post.pk:42'))
+        self.assertIsNone(self.cache_wrapper.get('name1'))
+        self.assertEqual(self.cache_wrapper.get('name2'), 'value2')
+
+    def test_transaction(self):
+        self.cache_wrapper.transaction.begin()
+        self.cache_wrapper.invalidate_dependency(dependencies.TagsDependency('blog.post.*'))
+        self.cache_wrapper.set('name1', 'value1', dependencies.TagsDependency('blog.post.pk:42'), 120)
+        self.cache_wrapper.transaction.finish()
+        # Namespace is invalidated again when transaction is finished.
+        self.assertIsNone(self.cache_wrapper.get('name1'))
+
+
+class NamespaceCacheDecoratorTestCase(AbstractCacheWrapperTestCase):
+
+    def setUp(self):
+        self.namespaces = cache.CacheNamespaces()
+        super(NamespaceCacheDecoratorTestCase, self).setUp()
+
+    def _decorate_cache(self, cache_stub):
+        return cache.NamespaceCacheDecorator(cache_stub, self.namespaces)
+
+    def _get_options(self):
+        return {'namespaces': self.namespaces}
+
+    def test_activate_namespace(self):
+        with self.cache_wrapper.activate_namespace('tenant1'):
+            self.cache_wrapper.set('name1', 'value1', dependencies.TagsDependency('tag1'), 120)
+            self.assertEqual(self.cache_wrapper.get('name1'), 'value1')
+            self.assertDictEqual(self.cache_wrapper.get_many(['name1']), {'name1': 'value1'})
+            with self.cache_wrapper.activate_namespace('tenant2'):
+                self.assertIsNone(self.cache_wrapper.get('name1'))
+        self.assertIsNone(self.cache_wrapper.get('name1'))
+        self.assertIsNone(self.cache.get('name1'))
+
+    def test_invalidate_namespace(self):
+        for namespace in ('tenant1', 'tenant2'):
+            with self.cache_wrapper.activate_namespace(namespace):
+                self.cache_wrapper.set('name1', 'value1', dependencies.TagsDependency('tag1'), 120)
+        with mock.patch.object(self.cache, 'incr', wraps=self.cache.incr) as incr:
+            self.cache_wrapper.invalidate_namespace('tenant1')
+            self.assertEqual(incr.call_count, 1)
+            self.assertEqual(incr.call_args[0][0], self.namespaces.make_generation_key('tenant1'))
+        with self.cache_wrapper.activate_namespace('tenant1'):
+            self.assertIsNone(self.cache_wrapper.get('name1'))
+        with self.cache_wrapper.activate_namespace('tenant2'):
+            self.assertEqual(self.cache_wrapper.get('name1'), 'value1')
+
+    def test_generation_is_memoized(self):
+        with self.cache_wrapper.activate_namespace('tenant1'):
+            self.cache_wrapper.set('name1', 'value1', dependencies.TagsDependency('tag1'), 120)
+            # Concurrent process drops namespace.
+            self.cache.incr(self.namespaces.make_generation_key('tenant1'))
+            with mock.patch.object(self.cache, 'get', wraps=self.cache.get) as get:
+                self.assertEqual(self.cache_wrapper.get('name1'), 'value1')
+                self.assertNotIn(mock.call(self.namespaces.make_generation_key('tenant1')), get.call_args_list)
+            self.cache_wrapper.close()  # Request is finished
+            self.assertIsNone(self.cache_wrapper.get('name1'))
+
+
+class NamespaceLocalStoragesTestCase(NamespaceCacheDecoratorTestCase):
+    """Namespace decorator is outer than decorators with local storages of tag keys."""
+
+    def _decorate_cache(self, cache_stub):
+        cache_ = cache.LocalTagVersionsCacheDecorator(cache_stub, cache.LocalTagVersions(timeout=60))
+        cache_ = cache.LocalTagVersionsCacheDecorator(cache_, cache.TransactionTagVersions(self.transaction))
+        cache_ = cache.TransactionInvalidationsCacheDecorator(cache_, self.transaction)
+        return super(NamespaceLocalStoragesTestCase, self)._decorate_cache(cache_)
+
+    def test_tag_versions_are_not_shared(self):
+        with self.cache_wrapper.activate_namespace('tenant2'):
+            self.cache_wrapper.set('name1', 'tenant2', dependencies.TagsDependency('tag1'), 120)
+        for in_transaction in (False, True):
+            with self.cache_wrapper.activate_namespace('tenant1'):
+                self.cache_wrapper.set('name1', 'tenant1', dependencies.TagsDependency('tag1'), 120)
+            if in_transaction:
+                self.transaction.begin()
+            with self.cache_wrapper.activate_namespace('tenant2'):
+                self.assertEqual(self.cache_wrapper.get('name1'), 'tenant2')
+            with self.cache_wrapper.activate_namespace('tenant1'):
+                self.cache_wrapper.invalidate_dependency(dependencies.TagsDependency('tag1'))
+                self.assertIsNone(self.cache_wrapper.get('name1'))
+            with self.cache_wrapper.activate_namespace('tenant2'):
+                self.assertEqual(self.cache_wrapper.get('name1'), 'tenant2')
+            self.transaction.flush()
+            # Deferred invalidation is flushed into namespace where it is done.
+            with self.cache_wrapper.activate_namespace('tenant1'):
+                self.assertIsNone(self.cache_wrapper.get('name1'))
+
+
+class SlidingTagTimeoutCacheDecoratorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.delegate = helpers.CacheStub()
+        self.tag_touches = cache.TagTouches(interval=60)
+        self.cache = cache.SlidingTagTimeoutCacheDecorator(self.delegate, self.tag_touches)
+        self.tag_key = utils.make_tag_key('tag1')
+        self.delegate.set_many({self.tag_key: 'version1', 'name1': 'value1'}, 10)
+
+    def _get_many_later(self, delay):
+        with mock.patch.object(self.tag_touches, '_current_time', return_value=time.time() + delay):
+            return self.cache.get_many([self.tag_key, 'name1'])
+
+    def test_get_many(self):
+        with mock.patch.object(self.delegate, 'touch', wraps=self.delegate.touch) as touch:
+            self._get_many_later(0)  # Touch is scheduled randomly within interval
+            touch.assert_not_called()
+            self.assertDictEqual(self._get_many_later(61), {self.tag_key: 'version1', 'name1': 'value1'})
+            self.assertEqual(touch.call_count, 1)
+            self.assertEqual(touch.call_args[0][0], self.tag_key)
+            self._get_many_later(62)
+            self.assertEqual(touch.call_count, 1)
+        timeout = touch.call_args[0][1]
+        self.assertLessEqual(timeout, dependencies.TagsDependency.TAG_TIMEOUT)
+        self.assertGreaterEqual(timeout, dependencies.TagsDependency.TAG_TIMEOUT * 0.9 - 1)
+        self.assertGreater(self.delegate._expire_info[self.delegate.make_key(self.tag_key)], time.time() + 3600)
+
+    def test_without_touch(self):
+        with mock.patch.object(self.delegate, 'touch', side_effect=NotImplementedError) as touch, \
+                mock.patch.object(self.delegate, 'set', wraps=self.delegate.set) as set_:
+            self._get_many_later(0)
+            self.assertDictEqual(self._get_many_later(61), {self.tag_key: 'version1', 'name1': 'value1'})
+            self.assertEqual(touch.call_count, 1)
+            set_.assert_not_called()
+        self.assertLess(self.delegate._expire_info[self.delegate.make_key(self.tag_key)], time.time() + 11)
+
+    def test_tag_timeout_jitter(self):
+        with mock.patch('random.random', return_value=1.0):
+            self.assertEqual(dependencies.TagsDependency.get_tag_timeout(),
+                             int(dependencies.TagsDependency.TAG_TIMEOUT * 0.9))
+        with mock.patch('random.random', return_value=0.0):
+            self.assertEqual(dependencies.TagsDependency.get_tag_timeout(), dependencies.TagsDependency.TAG_TIMEOUT)
@@ -136,3 +136,16 @@ class GetManyDeferredIteratorTestCase(unittest.TestCase):
 
         executor1.assert_called_once_with({'tag_1', 'tag_2', 'locked_tag_1', 'locked_tag_2'}, None)
         executor2.assert_called_once_with({'tag_3', 'tag_4'}, 1)
+
+    def test_long_chain(self):
+        count = 5000
+        deferred = defer.Deferred(None, defer.NoneDeferredIterator, 0)
+        deferred.add_callback(lambda *a, **kw: 0)
+        for i in range(1, count):
+            other = defer.Deferred(None, defer.NoneDeferredIterator, i % 2)
+            other.add_callback(lambda node, caches, i: i, i)
+            deferred += other
+        self.assertEqual(len(deferred.node.chain()), count)
+        self.assertListEqual([deferred.get() for i in range(count)], list(reversed(range(count))))
+        self.assertRaises(StopIteration, deferred.get)
+        self.assertEqual(len(copy.copy(deferred.node).chain()), count)
@@ -23,6 +23,7 @@ class AbstractTagsDependencyTestCase(unittest.TestCase):
         self.end_time = self.start_time + 2
 
         self.cache = helpers.CacheStub()
+        dependencies.TagsDependency._marker_seen_at = 0.0
         self.tag_versions = {
             'tag1': utils.generate_tag_version(),
             'tag2': utils.generate_tag_version(),
@@ -241,6 +242,100 @@ class TagsDependencyTestCase(AbstractTagsDependencyTestCase):
         self.assertDictEqual(tag_versions_in_later_concurrent_transaction, self.tag_versions)
 
 
+class FastPathTagsDependencyTestCase(AbstractTagsDependencyTestCase):
+
+    def _get_evaluated_keys(self):
+        with mock.patch.object(self.cache, 'get_many', wraps=self.cache.get_many) as get_many:
+            self.dependency.evaluate(self.cache, self.transaction, None)
+            self.assertEqual(get_many.call_count, 1)
+            return set(get_many.call_args[0][0])
+
+    def test_without_tag_states(self):
+        self.assertSetEqual(self._get_evaluated_keys(), {
+            utils.make_tag_key(tag) for tag in self.tag_versions
+        } | {self.dependency.ACQUIRED_MARKER_KEY, self.dependency.RELEASED_MARKER_KEY})
+
+    def test_with_tag_states(self):
+        self.concurrent_dependency.acquire(self.cache, self.concurrent_transaction, None)
+        self.assertRaises(exceptions.TagsLocked, self._get_evaluated_keys)
+
+        self.cache.delete_many(
+            [dependencies.AcquiredTagState.make_key(tag) for tag in self.tag_versions] + [self.dependency.ACQUIRED_MARKER_KEY]
+        )
+        self.concurrent_dependency.release(self.cache, self.concurrent_transaction, 0, None)
+        self.assertRaises(exceptions.TagsLocked, self._get_evaluated_keys)
+
+    def test_busy(self):
+        self.concurrent_dependency.acquire(self.cache, self.concurrent_transaction, None)
+        self.assertRaises(exceptions.TagsLocked, self.dependency.evaluate, self.cache, self.transaction, None)
+        # Markers are seen recently, so, tag states are fetched by the same round trip.
+        with mock.patch.object(self.cache, 'get_many', wraps=self.cache.get_many) as get_many:
+            self.assertRaises(exceptions.TagsLocked, self.dependency.evaluate, self.cache, self.transaction, None)
+            self.assertEqual(get_many.call_count, 1)
+            self.assertTrue({dependencies.AcquiredTagState.make_key(tag) for tag in self.tag_versions} <=
+                            set(get_many.call_args[0][0]))
+
+        self.cache.clear()
+        self._set_tag_versions()
+        self.assertSetEqual(self._get_evaluated_keys(), {
+            utils.make_tag_key(tag) for tag in self.tag_versions
+        } | {
+            dependencies.AcquiredTagState.make_key(tag) for tag in self.tag_versions
+        } | {
+            dependencies.ReleasedTagState.make_key(tag) for tag in self.tag_versions
+        } | {self.dependency.ACQUIRED_MARKER_KEY, self.dependency.RELEASED_MARKER_KEY})
+
+
+class TagVersionGeneratorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = helpers.CacheStub()
+        self.transaction = mock.Mock(interfaces.ITransaction)
+        self.transaction.get_session_id.return_value = 'ivan-X555LF.21920.140481146955584'
+
+    def test_make(self):
+        self.assertIsInstance(dependencies.TagVersionGenerator.make('MD5'), dependencies.TagVersionGenerator)
+        self.assertIsInstance(dependencies.TagVersionGenerator.make('RANDOM INT'),
+                              dependencies.RandomIntTagVersionGenerator)
+        self.assertIsInstance(dependencies.TagVersionGenerator.make('COUNTER'),
+                              dependencies.CounterTagVersionGenerator)
+        self.assertRaises(ValueError, dependencies.TagVersionGenerator.make, 'UNKNOWN')
+
+    def test_random_int(self):
+        tag_versions = dependencies.RandomIntTagVersionGenerator()(self.cache, ('tag1', 'tag2'), None)
+        self.assertSetEqual(set(tag_versions.keys()), {'tag1', 'tag2'})
+        for tag_version in tag_versions.values():
+            self.assertTrue(0 <= tag_version < 2 ** 64)
+        self.assertNotEqual(tag_versions['tag1'], tag_versions['tag2'])
+
+    def test_counter(self):
+        generator = dependencies.CounterTagVersionGenerator()
+        tag_versions1 = generator(self.cache, ('tag1', 'tag2'), None)
+        tag_versions2 = generator(self.cache, ('tag1', 'tag2'), None)
+        self.assertEqual(len(set(tag_versions1.values()) | set(tag_versions2.values())), 4)
+        self.assertGreater(min(tag_versions2.values()), max(tag_versions1.values()))
+
+        # Evicted counter continues from current time, so, versions are never reused.
+        self.cache.delete(generator.COUNTER_KEY)
+        tag_versions3 = generator(self.cache, ('tag1', 'tag2'), None)
+        self.assertGreater(min(tag_versions3.values()), max(tag_versions2.values()))
+
+    def test_invalidate(self):
+        self.cache.tag_version_generator = dependencies.CounterTagVersionGenerator()
+        dependency = dependencies.TagsDependency('tag1', 'tag2')
+        dependency.evaluate(self.cache, self.transaction, None)
+        tag_versions = dependency.tag_versions
+        for tag_version in tag_versions.values():
+            self.assertIsInstance(tag_version, int)
+        dependency.validate(self.cache, None).get()
+
+        dependency.invalidate(self.cache, None)
+        self.assertRaises(exceptions.TagsInvalid, dependency.validate(self.cache, None).get)
+        dependency.evaluate(self.cache, self.transaction, None)
+        for tag, tag_version in dependency.tag_versions.items():
+            self.assertNotEqual(tag_version, tag_versions[tag])
+
+
 class CompositeDependencyInvalidTestCase(unittest.TestCase):
     def test_invalid(self):
         errors1 = ('err1', 'err2')
@@ -1,6 +1,7 @@
 import time
 import unittest
-from cache_dependencies import interfaces, locks, utils
+import threading
+from cache_dependencies import dependencies, interfaces, locks, utils
 from cache_dependencies.tests import helpers
 
 try:
@@ -116,3 +117,79 @@ class SerializableDependencyLockTestCase(RepeatableReadDependencyLockTestCase):
 
 class SerializableDependencyLockDelayedTestCase(SerializableDependencyLockTestCase):
     delay = 1
+
+
+class DelayedInvalidationSchedulerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = helpers.CacheStub()
+        self.cache_accessor = lambda: self.cache
+        self.scheduler = locks.DelayedInvalidationScheduler(resolution=0.2)
+        self.tag_keys = [utils.make_tag_key(tag) for tag in ('tag1', 'tag2', 'tag3')]
+        self.cache.set_many({tag_key: 'version' for tag_key in self.tag_keys}, 3600)
+
+    def tearDown(self):
+        self.scheduler.shutdown()
+
+    def test_coalesce(self):
+        with mock.patch.object(self.cache, 'delete_many', wraps=self.cache.delete_many) as delete_many:
+            self.scheduler.schedule(0.05, self.cache_accessor, dependencies.TagsDependency('tag1', 'tag2'), None)
+            self.scheduler.schedule(0.05, self.cache_accessor, dependencies.TagsDependency('tag2', 'tag3'), None)
+            self.assertEqual(len(self.cache.get_many(self.tag_keys)), 3)
+            time.sleep(0.5)
+            delete_many.assert_called_once_with(mock.ANY, version=None)
+            self.assertSetEqual(set(delete_many.call_args[0][0]), set(self.tag_keys))
+        self.assertDictEqual(self.cache.get_many(self.tag_keys), {})
+
+    def test_versions_are_not_coalesced(self):
+        with mock.patch.object(self.cache, 'delete_many', wraps=self.cache.delete_many) as delete_many:
+            self.scheduler.schedule(0.05, self.cache_accessor, dependencies.TagsDependency('tag1'), None)
+            self.scheduler.schedule(0.05, self.cache_accessor, dependencies.TagsDependency('tag1'), 2)
+            time.sleep(0.5)
+            self.assertEqual(delete_many.call_count, 2)
+
+    def test_shutdown_flushes(self):
+        self.scheduler.schedule(3600, self.cache_accessor, dependencies.TagsDependency('tag1'), None)
+        self.assertEqual(len(self.cache.get_many(self.tag_keys)), 3)
+        self.scheduler.shutdown()
+        self.assertEqual(len(self.cache.get_many(self.tag_keys)), 2)
+
+    def test_single_thread(self):
+        threads_count = threading.active_count()
+        for i in range(100):
+            self.scheduler.schedule(1 + i * 0.01, self.cache_accessor, dependencies.TagsDependency('tag1'), None)
+        self.assertLessEqual(threading.active_count(), threads_count + 1)
+
+
+class CallbackLeaseTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = helpers.CacheStub()
+        self.lease = locks.CallbackLease(timeout=10, wait_timeout=0.2, poll_interval=0.01)
+
+    def test_acquire_release(self):
+        token = self.lease.acquire(self.cache, 'name1', None)
+        self.assertIsNotNone(token)
+        self.assertIsNone(self.lease.acquire(self.cache, 'name1', None))
+        self.assertIsNotNone(self.lease.acquire(self.cache, 'name1', 2))
+        self.lease.release(self.cache, 'name1', 'alien_token', None)
+        self.assertTrue(self.lease.is_held(self.cache, 'name1', None))
+        self.lease.release(self.cache, 'name1', token, None)
+        self.assertFalse(self.lease.is_held(self.cache, 'name1', None))
+
+    def test_wait(self):
+        self.lease.acquire(self.cache, 'name1', None)
+        getter = mock.Mock(side_effect=[None, None, 'value1'])
+        self.assertEqual(self.lease.wait(self.cache, 'name1', None, getter), 'value1')
+        self.assertEqual(getter.call_count, 3)
+
+    def test_wait_timeout(self):
+        self.lease.acquire(self.cache, 'name1', None)
+        started_at = time.time()
+        self.assertIsNone(self.lease.wait(self.cache, 'name1', None, lambda: None))
+        self.assertGreaterEqual(time.time() - started_at, 0.2)
+
+    def test_wait_released(self):
+        getter = mock.Mock(return_value=None)
+        self.assertIsNone(self.lease.wait(self.cache, 'name1', None, getter))
+        self.assertEqual(getter.call_count, 2)
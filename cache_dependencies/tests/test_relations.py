@@ -1,5 +1,5 @@
 import unittest
-from cache_dependencies import interfaces, dependencies, relations
+from cache_dependencies import interfaces, dependencies, relations, utils
 
 try:
     from unittest import mock
@@ -162,3 +162,30 @@ class RelationManagerTestCase(unittest.TestCase):
         self.assertIsInstance(self.relation_manager.current(), relations.DummyCacheNode)
         node_key1 = self.relation_manager.pop('key1')
         self.assertIsNot(node_key1, init_node_key1)
+
+    @unittest.skipIf(utils.contextvars is None, "contextvars is not available")
+    def test_current_isolated_by_context(self):
+        context = utils.contextvars.copy_context()
+        context.run(self.relation_manager.current, 'key1')
+        self.assertIsInstance(self.relation_manager.current(), relations.DummyCacheNode)
+        self.assertEqual(context.run(self.relation_manager.current).key(), 'key1')
+
+    @unittest.skipIf(utils.contextvars is None, "contextvars is not available")
+    def test_data_inherited_by_task(self):
+        import asyncio
+        self.relation_manager.get('key1')
+        data = self.relation_manager._data
+        self.relation_manager.get('key2')
+        self.assertIs(self.relation_manager._data, data)  # Changed in place by the owner context
+
+        async def child():
+            self.relation_manager.get('key3')
+            self.relation_manager.pop('key1')
+            return set(self.relation_manager._data)
+
+        loop = asyncio.new_event_loop()
+        try:
+            self.assertSetEqual(loop.run_until_complete(child()), {'key2', 'key3'})
+        finally:
+            loop.close()
+        self.assertSetEqual(set(self.relation_manager._data), {'key1', 'key2'})
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+import pickle
+import unittest
+from cache_dependencies import dependencies, serializers, utils
+
+
+class SerializersTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tags_dependency = dependencies.TagsDependency('tag1', 'tag2', 'tag3')
+        self.tags_dependency.tag_versions = {tag: utils.generate_tag_version() for tag in self.tags_dependency.tags}
+        self.dependency = dependencies.CompositeDependency(self.tags_dependency, dependencies.DummyDependency())
+
+    def test_dumps_loads(self):
+        data = serializers.dumps(self.dependency)
+        self.assertIsInstance(data, bytes)
+        self.assertLess(len(data), len(pickle.dumps(self.dependency, pickle.HIGHEST_PROTOCOL)))
+        dependency = serializers.loads(data)
+        self.assertIsInstance(dependency, dependencies.CompositeDependency)
+        self.assertEqual(len(dependency.delegates), 2)
+        tags_dependency, dummy_dependency = dependency.delegates
+        self.assertIsInstance(tags_dependency, dependencies.TagsDependency)
+        self.assertIsInstance(dummy_dependency, dependencies.DummyDependency)
+        self.assertSetEqual(tags_dependency.tags, self.tags_dependency.tags)
+        self.assertDictEqual(tags_dependency.tag_versions, self.tags_dependency.tag_versions)
+
+    def test_empty(self):
+        dependency = serializers.loads(serializers.dumps(dependencies.CompositeDependency()))
+        self.assertListEqual(dependency.delegates, [])
+
+        dependency = serializers.loads(serializers.dumps(
+            dependencies.CompositeDependency(dependencies.TagsDependency())
+        ))
+        self.assertSetEqual(dependency.delegates[0].tags, set())
+        self.assertDictEqual(dependency.delegates[0].tag_versions, {})
+
+    def test_unicode(self):
+        self.tags_dependency.tags.add(u'тег')
+        self.tags_dependency.tag_versions[u'тег'] = utils.generate_tag_version()
+        dependency = serializers.loads(serializers.dumps(self.dependency))
+        self.assertDictEqual(dependency.delegates[0].tag_versions, self.tags_dependency.tag_versions)
+
+    def test_not_encodable(self):
+        self.assertIsNone(serializers.dumps(self.tags_dependency))
+        self.tags_dependency.tag_versions.pop('tag1')
+        self.assertIsNone(serializers.dumps(self.dependency))
+        self.tags_dependency.tag_versions['tag1'] = 'not md5'
+        self.assertIsNone(serializers.dumps(self.dependency))
+        # Uppercase version would be loaded as lowercase one
+        self.tags_dependency.tag_versions['tag1'] = utils.generate_tag_version().upper()
+        self.assertIsNone(serializers.dumps(self.dependency))
+
+    def test_too_many_delegates(self):
+        dependency = dependencies.CompositeDependency(
+            *([dependencies.DummyDependency()] * (serializers.MAX_DELEGATES_COUNT + 1))
+        )
+        self.assertIsNone(serializers.dumps(dependency))
+        dependency.delegates.pop()
+        self.assertEqual(len(serializers.loads(serializers.dumps(dependency)).delegates),
+                         serializers.MAX_DELEGATES_COUNT)
+
+    def test_format_version(self):
+        data = serializers.dumps(self.dependency)
+        self.assertRaises(ValueError, serializers.loads, b'\x00' + data[1:])
+
+    def test_int_tag_versions(self):
+        self.tags_dependency.tag_versions = {
+            tag: utils.generate_int_tag_version() for tag in self.tags_dependency.tags
+        }
+        self.tags_dependency.tag_versions['tag1'] = serializers.MAX_INT_TAG_VERSION
+        data = serializers.dumps(self.dependency)
+        dependency = serializers.loads(data)
+        self.assertDictEqual(dependency.delegates[0].tag_versions, self.tags_dependency.tag_versions)
+
+        self.tags_dependency.tag_versions['tag1'] = utils.generate_tag_version()
+        self.assertIsNone(serializers.dumps(self.dependency))
@@ -1,6 +1,6 @@
 import time
 import unittest
-from cache_dependencies import interfaces, transaction
+from cache_dependencies import interfaces, transaction, utils
 
 try:
     from unittest import mock
@@ -120,6 +120,19 @@ class TransactionTestCase(AbstractTransactionTestCase):
         self.assertIs(args[1], self.transaction)
         self.assertEqual(args[2], 1)
 
+    def test_memos(self):
+        with mock.patch.object(transaction, 'TagVersionsMemo') as tag_versions_memo, \
+                mock.patch.object(transaction, 'InvalidationsMemo') as invalidations_memo:
+            self.transaction.finish()
+            tag_versions_memo.assert_not_called()
+            invalidations_memo.assert_not_called()
+
+        memo = self.transaction.get_tag_versions_memo()
+        self.assertIsInstance(memo, transaction.TagVersionsMemo)
+        self.assertIs(self.transaction.get_tag_versions_memo(), memo)
+        self.lock.DEFER_INVALIDATIONS = False
+        self.assertIsNone(self.transaction.get_invalidations_memo())
+
     def test_bool(self):
         self.assertTrue(self.transaction)
 
@@ -195,6 +208,17 @@ class TransactionManagerTestCase(unittest.TestCase):
         self.transaction_manager.current(self.transaction)
         self.assertIs(self.transaction_manager.current(), self.transaction)
 
+    @unittest.skipIf(utils.contextvars is None, "contextvars is not available")
+    def test_current_isolated_by_context(self):
+        context = utils.contextvars.copy_context()
+        context.run(self.transaction_manager.begin)
+        self.assertIsInstance(self.transaction_manager.current(), transaction.DummyTransaction)
+        self.assertIsInstance(context.run(self.transaction_manager.current), transaction.Transaction)
+        # Sessions of concurrent transactions are distinguished, even if context is inherited.
+        self.transaction_manager.begin()
+        self.assertNotEqual(context.run(lambda: self.transaction_manager.current().get_session_id()),
+                            self.transaction_manager.current().get_session_id())
+
     def test_begin(self):
         initial_transaction = self.transaction_manager.begin()
         self.assertIsInstance(initial_transaction, transaction.Transaction)
@@ -207,6 +231,24 @@ class TransactionManagerTestCase(unittest.TestCase):
         self.assertIsInstance(nested_save_point, transaction.SavePoint)
         self.assertIs(nested_save_point.parent(), save_point)
 
+    def test_begin_independent(self):
+        self.assertIsInstance(self.transaction_manager.begin(independent=True), transaction.Transaction)
+        initial_transaction = self.transaction_manager.current()
+        initial_transaction.get_tag_versions_memo().set_many({('tag_key', None): 'version'})
+        independent_transaction = self.transaction_manager.begin(independent=True)
+        self.assertIsInstance(independent_transaction, transaction.IndependentTransaction)
+        self.assertIs(independent_transaction.parent(), initial_transaction)
+
+        dependency = mock.Mock(spec=interfaces.IDependency)
+        independent_transaction.add_dependency(dependency, None)
+        self.transaction_manager.finish()
+        # Dependencies are released by independent transaction, not by outer one.
+        self.lock.release.assert_called_once_with(mock.ANY, independent_transaction, None)
+        self.assertIs(self.transaction_manager.current(), initial_transaction)
+        self.assertDictEqual(initial_transaction.get_tag_versions_memo().get_many([('tag_key', None)]), {})
+        self.transaction_manager.finish()
+        self.lock.release.assert_called_once_with(mock.ANY, independent_transaction, None)
+
     def test_finish_delegate_transaction(self):
         self.transaction_manager.current(self.transaction)
         self.transaction_manager.finish()
@@ -0,0 +1,74 @@
+import threading
+import unittest
+from cache_dependencies import dependencies, utils
+
+
+class TagKeysTestCase(unittest.TestCase):
+
+    def test_make_tag_keys(self):
+        tag_keys = utils.make_tag_keys('tag1')
+        self.assertTrue(tag_keys.version.startswith(utils.TAG_KEY_VERSION_PREFIX))
+        self.assertTrue(utils.is_tag_key(tag_keys.version))
+        self.assertFalse(utils.is_tag_key('tag_cloud'))
+        self.assertFalse(utils.is_tag_key(utils.TAG_KEY_VERSION_PREFIX + 'cloud'))
+        self.assertFalse(utils.is_tag_key(tag_keys.acquired))
+        self.assertEqual(tag_keys.acquired, 'acquired_{0}'.format(tag_keys.version))
+        self.assertEqual(tag_keys.released, 'released_{0}'.format(tag_keys.version))
+        self.assertEqual(utils.make_tag_key('tag1'), tag_keys.version)
+        self.assertEqual(dependencies.AcquiredTagState.make_key('tag1'), tag_keys.acquired)
+        self.assertEqual(dependencies.ReleasedTagState.make_key('tag1'), tag_keys.released)
+        self.assertNotEqual(utils.make_tag_key('tag2'), tag_keys.version)
+
+    def test_memoize(self):
+        calls = []
+
+        @utils.memoize(2)
+        def f(arg):
+            calls.append(arg)
+            return arg * 2
+
+        self.assertEqual(f(1), 2)
+        self.assertEqual(f(1), 2)
+        self.assertListEqual(calls, [1])
+        f(2)
+        f(3)
+        f(1)
+        self.assertListEqual(calls, [1, 2, 3, 1])
+
+
+class ContextLocalTestCase(unittest.TestCase):
+
+    def test_threads(self):
+        context_local = utils.ContextLocal()
+        context_local.value = 1
+        result = []
+
+        def target():
+            result.append(getattr(context_local, 'value', None))
+            context_local.value = 2
+
+        thread = threading.Thread(target=target)
+        thread.start()
+        thread.join()
+        self.assertListEqual(result, [None])
+        self.assertEqual(context_local.value, 1)
+        del context_local.value
+        self.assertRaises(AttributeError, getattr, context_local, 'value')
+
+    @unittest.skipIf(utils.contextvars is None, "contextvars is not available")
+    def test_contexts(self):
+        context_local = utils.ContextLocal()
+        context_local.value = 1
+        context = utils.contextvars.copy_context()
+
+        def target():
+            self.assertEqual(context_local.value, 1)  # Inherited
+            context_local.value = 2
+            return utils.get_context_id()
+
+        self.assertEqual(context.run(target), utils.get_context_id())  # Inherited
+        self.assertEqual(context_local.value, 1)
+        self.assertEqual(context.run(lambda: context_local.value), 2)
+        context_id = context.run(utils.renew_context_id)
+        self.assertNotEqual(context_id, utils.get_context_id())
+        self.assertEqual(context_id, context.run(utils.get_context_id))
@@ -5,6 +5,132 @@ from cache_dependencies import dependencies, interfaces, mixins, utils
 from cache_dependencies.utils import Undef
 
 
+class TagVersionsMemo(object):
+    """Tag versions already read within a transaction.
+
+    Used by single thread, so, it is not guarded by lock.
+    Keys are pairs (tag_key, version).
+    """
+
+    def __init__(self):
+        self._data = dict()
+
+    def get_many(self, keys):
+        """
+        :type keys: collections.Iterable[tuple]
+        :rtype: dict
+        """
+        return {key: self._data[key] for key in keys if key in self._data}
+
+    def set_many(self, data):
+        """
+        :type data: dict
+        """
+        self._data.update(data)
+
+    def delete_many(self, keys):
+        """
+        :type keys: collections.Iterable[tuple]
+        """
+        for key in keys:
+            self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+
+class InvalidationsMemo(object):
+    """Invalidations of a transaction, deferred until the transaction finishes.
+
+    Acquired tag states are deferred as well, and are written by single set_many()
+    right before deletion of tag versions, so, marker is always written together with the states.
+    Used by single thread, so, it is not guarded by lock.
+    """
+    ACQUIRED_TAG_STATE_PREFIX = 'acquired_'
+
+    def __init__(self, parent=None):
+        """
+        :param parent: memo of outer transaction, deferred invalidations of which are visible as well
+        :type parent: cache_dependencies.transaction.InvalidationsMemo or None
+        """
+        self._parent = parent
+        self._deleted = dict()  # (cache, version) -> set of tag keys
+        self._acquired = dict()  # (cache, version, timeout) -> acquired tag states
+        self._flushed = None
+
+    def get_deleted_keys(self, cache, version):
+        """Returns tag keys which deletion is deferred.
+
+        :type cache: cache_dependencies.interfaces.ICache
+        :type version: int or None
+        :rtype: set
+        """
+        if self._flushed is not None:
+            return frozenset()
+        keys = self._deleted.get((cache, version), frozenset())
+        if self._parent is not None:
+            parent_keys = self._parent.get_deleted_keys(cache, version)
+            if parent_keys:
+                keys = parent_keys | keys
+        return keys
+
+    def delete_many(self, cache, keys, version):
+        """Defers deletion of tag keys.
+
+        Returns keys which should be deleted immediately, i.e. keys
+        which are not deleted yet by flush() of finished transaction.
+
+        :type cache: cache_dependencies.interfaces.ICache
+        :type keys: collections.Iterable[str]
+        :type version: int or None
+        :rtype: list[str]
+        """
+        if self._flushed is None:
+            self._deleted.setdefault((cache, version), set()).update(keys)
+            return []
+        flushed = self._flushed.get((cache, version), frozenset())
+        return [key for key in keys if key not in flushed]
+
+    def set_many(self, cache, data, timeout, version):
+        """Defers writing of acquired tag states and their marker.
+
+        Returns the rest of data, which should be written immediately.
+
+        :type cache: cache_dependencies.interfaces.ICache
+        :type data: dict
+        :type timeout: int or None
+        :type version: int or None
+        :rtype: dict
+        """
+        if self._flushed is not None:
+            return data
+        acquired = {key: value for key, value in data.items() if self._is_acquired_tag_state_key(key)}
+        if not acquired:
+            return data
+        self._acquired.setdefault((cache, version, timeout), dict()).update(acquired)
+        return {key: value for key, value in data.items() if key not in acquired}
+
+    def flush(self):
+        """Writes acquired tag states and deletes deferred tag keys.
+
+        Single set_many() and single delete_many() are used per cache and version.
+        """
+        acquired, self._acquired = self._acquired, dict()
+        self._flushed, self._deleted = self._deleted, dict()
+        for (cache, version, timeout), data in acquired.items():
+            cache.set_many(data, timeout=timeout, version=version)
+        for (cache, version), keys in self._flushed.items():
+            cache.delete_many(list(keys), version=version)
+
+    @classmethod
+    def _is_acquired_tag_state_key(cls, key):
+        key = utils.strip_namespace(key)
+        if key == dependencies.TagsDependency.ACQUIRED_MARKER_KEY:
+            return True
+        prefix = cls.ACQUIRED_TAG_STATE_PREFIX
+        return key.startswith(prefix) and utils.is_tag_key(key[len(prefix):])
+
+
 class AbstractTransaction(interfaces.ITransaction):
     def __init__(self, lock):
         """
@@ -13,7 +139,7 @@ class AbstractTransaction(interfaces.ITransaction):
         self._lock = lock
 
     def get_session_id(self):
-        return utils.get_thread_id()
+        return utils.get_context_id()
 
     def evaluate(self, dependency, version):
         """
@@ -34,6 +160,8 @@ class Transaction(AbstractTransaction):
         """
         super(Transaction, self).__init__(lock)
         self._dependencies = dict()
+        self._tag_versions_memo = None
+        self._invalidations_memo = Undef
         self._start_time = self._current_time()
         self._end_time = None
 
@@ -48,6 +176,17 @@ class Transaction(AbstractTransaction):
     def parent(self):
         return None
 
+    def get_tag_versions_memo(self):
+        # Memos are created on first use, i.e. only if cache decorators of them are used.
+        if self._tag_versions_memo is None:
+            self._tag_versions_memo = TagVersionsMemo()
+        return self._tag_versions_memo
+
+    def get_invalidations_memo(self):
+        if self._invalidations_memo is Undef:
+            self._invalidations_memo = self._make_invalidations_memo()
+        return self._invalidations_memo
+
     def add_dependency(self, dependency, version):
         """
         :type dependency: cache_dependencies.interfaces.IDependency
@@ -61,9 +200,20 @@ class Transaction(AbstractTransaction):
 
     def finish(self):
         self._end_time = self._current_time()
+        if self._tag_versions_memo is not None:
+            self._tag_versions_memo.clear()
+        # Deferred invalidations must be flushed before the release of tag states.
+        if self._invalidations_memo not in (None, Undef):
+            self._invalidations_memo.flush()
         for version, dependency in self._dependencies.items():
             self._lock.release(dependency, self, version)
 
+    def _make_invalidations_memo(self):
+        # Invalidations of READ UNCOMMITTED transaction are visible immediately.
+        if not getattr(self._lock, 'DEFER_INVALIDATIONS', True):
+            return None
+        return InvalidationsMemo()
+
     def __bool__(self):
         return True
 
@@ -87,6 +237,12 @@ class SavePoint(Transaction):
     def parent(self):
         return self._parent
 
+    def get_tag_versions_memo(self):
+        return self._parent.get_tag_versions_memo()
+
+    def get_invalidations_memo(self):
+        return self._parent.get_invalidations_memo()
+
     def add_dependency(self, dependency, version):
         """
         :type dependency: cache_dependencies.interfaces.IDependency
@@ -100,6 +256,38 @@ class SavePoint(Transaction):
         pass
 
 
+class IndependentTransaction(Transaction):
+    """Transaction nested into the outer one, but not a part of it.
+
+    Releases own dependencies when finished, without waiting for the outer transaction.
+    For example, it is bound to database transaction within the request-wide transaction.
+    """
+    def __init__(self, lock, parent):
+        """
+        :type lock: cache_dependencies.interfaces.IDependencyLock
+        :type parent: cache_dependencies.interfaces.ITransaction
+        """
+        super(IndependentTransaction, self).__init__(lock)
+        assert isinstance(parent, interfaces.ITransaction)
+        self._parent = parent
+
+    def parent(self):
+        return self._parent
+
+    def _make_invalidations_memo(self):
+        if not getattr(self._lock, 'DEFER_INVALIDATIONS', True):
+            return None
+        # Tags invalidated by outer transaction are invalid for this one too.
+        return InvalidationsMemo(self._parent.get_invalidations_memo())
+
+    def finish(self):
+        super(IndependentTransaction, self).finish()
+        # Tag versions read by outer transaction can be invalidated by this one.
+        memo = self._parent.get_tag_versions_memo()
+        if memo is not None:
+            memo.clear()
+
+
 class DummyTransaction(AbstractTransaction):
 
     def get_start_time(self):
@@ -111,6 +299,12 @@ class DummyTransaction(AbstractTransaction):
     def parent(self):
         return None
 
+    def get_tag_versions_memo(self):
+        return None
+
+    def get_invalidations_memo(self):
+        return None
+
     def add_dependency(self, dependency, version):
         """
         :type dependency: cache_dependencies.interfaces.IDependency
@@ -148,22 +342,36 @@ class AbstractTransactionManager(interfaces.ITransactionManager):
 
 
 class TransactionManager(AbstractTransactionManager):
+    """State is isolated by execution context (asyncio task or thread)."""
 
     def __init__(self, lock):
         """
         :type lock: cache_dependencies.interfaces.IDependencyLock
         """
         self._lock = lock
-        self._current = None
+        self._context = utils.ContextLocal()
+
+    @property
+    def _current(self):
+        return getattr(self._context, 'current', None)
+
+    @_current.setter
+    def _current(self, node):
+        self._context.current = node
 
     def current(self, node=Undef):
         if node is Undef:
             return self._current or DummyTransaction(self._lock)
         self._current = node
 
-    def begin(self):
+    def begin(self, independent=False):
         if self._current is None:
+            # Context can be inherited from the parent context (for example, asyncio task),
+            # so, session of concurrent transactions should be distinguished explicitly.
+            utils.renew_context_id()
             self.current(Transaction(self._lock))
+        elif independent:
+            self.current(IndependentTransaction(self._lock, self.current()))
         else:
             self.current(SavePoint(self._lock, self.current()))
         return self.current()
@@ -183,9 +391,9 @@ class ThreadSafeTransactionManagerDecorator(mixins.ThreadSafeDecoratorMixIn, Abs
         self._validate_thread_sharing()
         return self._delegate.current(node)
 
-    def begin(self):
+    def begin(self, independent=False):
         self._validate_thread_sharing()
-        return self._delegate.begin()
+        return self._delegate.begin(independent)
 
     def finish(self):
         self._validate_thread_sharing()
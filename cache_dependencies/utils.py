@@ -1,10 +1,15 @@
 import os
+import re
 import time
 import random
 import socket
 import hashlib
 import warnings
-from threading import local
+import weakref
+import functools
+import itertools
+from collections import namedtuple
+from threading import local, Lock
 from cache_dependencies import __version__
 
 try:
@@ -12,6 +17,12 @@ try:
 except ImportError:
     import thread as _thread  # Python < 3.*
 
+try:
+    import contextvars
+    from asyncio import current_task, get_running_loop
+except ImportError:  # Python < 3.7
+    contextvars = None
+
 # Use the system (hardware-based) random number generator if it exists.
 if hasattr(random, 'SystemRandom'):
     randrange = random.SystemRandom().randrange
@@ -45,6 +56,93 @@ def get_thread_id():
         return get_thread_id()
 
 
+class ContextLocal(object):
+    """Attributes storage, isolated by execution context.
+
+    Execution context is asyncio task (or greenlet, if it supports contextvars) or thread.
+    Assignment does not affect the contexts copied before it, i.e.
+    child tasks do not change state of parent task.
+    Falls back to threading.local if contextvars is not available.
+    """
+    def __init__(self):
+        if contextvars is not None:
+            object.__setattr__(self, '_var', contextvars.ContextVar(
+                'context_local_{0}'.format(id(self)), default=None
+            ))
+        else:
+            object.__setattr__(self, '_local', local())
+
+    def __getattr__(self, name):
+        if contextvars is None:
+            return getattr(self._local, name)
+        data = self._var.get()
+        try:
+            return data[name]
+        except (KeyError, TypeError):
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        if contextvars is None:
+            return setattr(self._local, name, value)
+        data = dict(self._var.get() or ())  # Copy on write
+        data[name] = value
+        self._var.set(data)
+
+    def __delattr__(self, name):
+        if contextvars is None:
+            return delattr(self._local, name)
+        data = dict(self._var.get() or ())
+        try:
+            del data[name]
+        except KeyError:
+            raise AttributeError(name)
+        self._var.set(data)
+
+
+_context_local = ContextLocal()
+_context_counter = itertools.count()
+
+
+def get_context_id():
+    """Returns id for current execution context (asyncio task or thread).
+
+    Id is inherited by child contexts (tasks, threads of sync_to_async() etc.),
+    until renew_context_id() is called in them.
+    """
+    if contextvars is None:
+        return get_thread_id()
+    try:
+        return _context_local.context_id
+    except AttributeError:
+        return renew_context_id()
+
+
+def renew_context_id():
+    """Assigns new id for current execution context."""
+    if contextvars is None:
+        return get_thread_id()
+    _context_local.context_id = '{0}.{1}'.format(get_thread_id(), next(_context_counter))
+    return _context_local.context_id
+
+
+def get_context_owner():
+    """Returns owner of current execution context: weak reference to asyncio task, or id of thread.
+
+    Unlike get_context_id(), owner is not inherited by child contexts,
+    so, state inherited from parent context can be detected.
+    """
+    if contextvars is not None:
+        try:
+            get_running_loop()
+        except RuntimeError:  # No running event loop in this thread
+            pass
+        else:
+            task = current_task()
+            if task is not None:
+                return weakref.ref(task)
+    return _thread.get_ident()
+
+
 def warn(old, new, stacklevel=3):
     warnings.warn(
         "{0} is deprecated. Use {1} instead".format(old, new),
@@ -53,11 +151,72 @@ def warn(old, new, stacklevel=3):
     )
 
 
+TAG_KEY_PREFIX = 'tag_'
+TAG_KEY_VERSION_PREFIX = '{0}{1}_'.format(TAG_KEY_PREFIX, str(__version__).replace('.', ''))
+TAG_KEY_RE = re.compile(r'^{0}[0-9a-f]{{32}}$'.format(re.escape(TAG_KEY_VERSION_PREFIX)))
+TAG_KEYS_MEMO_SIZE = 10000
+
+TagKeys = namedtuple('TagKeys', ('version', 'acquired', 'released'))
+
+
+def memoize(maxsize):
+    """Bounded memoization of function with single hashable argument."""
+    if hasattr(functools, 'lru_cache'):
+        return functools.lru_cache(maxsize)
+
+    def _deco(f):  # Python 2.* compatible
+        memo = {}
+        lock = Lock()
+
+        @functools.wraps(f)
+        def _decorated(arg):
+            try:
+                return memo[arg]
+            except KeyError:
+                pass
+            result = f(arg)
+            with lock:
+                if len(memo) >= maxsize:
+                    memo.clear()
+                memo[arg] = result
+            return result
+
+        _decorated.cache_clear = memo.clear
+        return _decorated
+    return _deco
+
+
+@memoize(TAG_KEYS_MEMO_SIZE)
+def make_tag_keys(name):
+    """Returns all keys derived from tag name: version key and keys of tag states.
+
+    :rtype: cache_dependencies.utils.TagKeys
+    """
+    tag_key = '{0}{1}'.format(TAG_KEY_VERSION_PREFIX, hashlib.md5(str(name).encode('utf-8')).hexdigest())
+    return TagKeys(tag_key, 'acquired_{0}'.format(tag_key), 'released_{0}'.format(tag_key))
+
+
 def make_tag_key(name):
     """Adds prefixed namespace for tag name"""
-    version = str(__version__).replace('.', '')
-    name = hashlib.md5(str(name).encode('utf-8')).hexdigest()
-    return 'tag_{0}_{1}'.format(version, name)
+    return make_tag_keys(name).version
+
+
+def is_tag_key(key):
+    """Returns True if key is made by make_tag_key()
+
+    Full format is matched, so, user keys like 'tag_cloud' are not tag keys.
+    Key can be folded into namespace, see cache_dependencies.cache.CacheNamespaces.make_key().
+    """
+    key = strip_namespace(key)
+    return key.startswith(TAG_KEY_VERSION_PREFIX) and TAG_KEY_RE.match(key) is not None
+
+
+def strip_namespace(key):
+    """Returns key without namespace and generation, see cache_dependencies.cache.CacheNamespaces.make_key().
+
+    Keys made by library (tag keys, keys of tag states and markers) don't contain ':'.
+    """
+    return key.rpartition(':')[2]
 
 
 def generate_tag_version():
@@ -68,6 +227,24 @@ def generate_tag_version():
     return hash_value
 
 
+_int_tag_version_random = random.Random()
+_int_tag_version_random_pid = None
+
+
+def generate_int_tag_version():
+    """Generates a new random 64-bit integer identifier for tag version.
+
+    Cheaper than generate_tag_version(), since it does not use syscall
+    and hashing. Random generator is reseeded after fork.
+    """
+    global _int_tag_version_random_pid
+    pid = os.getpid()
+    if _int_tag_version_random_pid != pid:
+        _int_tag_version_random.seed()
+        _int_tag_version_random_pid = pid
+    return _int_tag_version_random.getrandbits(64)
+
+
 def to_hashable(obj):
     """
     Makes a hashable object from a dictionary, list, tuple, set etc.
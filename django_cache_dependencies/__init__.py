@@ -1,20 +1,58 @@
 from __future__ import absolute_import, unicode_literals
 import sys
+import atexit
 import hashlib
-from threading import local
+from functools import partial
+from contextlib import contextmanager
+from threading import local, Lock
 
 import django.core.cache
 from django.conf import settings
 from django.core import signals as core_signals
 from django.core.cache import DEFAULT_CACHE_ALIAS
-from django.db.models import signals as model_signals
-from django.utils.functional import curry
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import QuerySet, signals as model_signals
 
+from cache_dependencies.cache import (
+    LocalTagVersions, LocalTagVersionsCacheDecorator, TransactionTagVersions, TransactionInvalidationsCacheDecorator,
+    StaleWhileRevalidate, EarlyRecomputation, TagKeysIndex, InvalidationEpoch, CacheNamespaces, NamespaceCacheDecorator,
+    TagTouches, SlidingTagTimeoutCacheDecorator
+)
+from cache_dependencies.dependencies import TagVersionGenerator
 from cache_dependencies.tagging import CacheTagging
 from cache_dependencies.relations import RelationManager, ThreadSafeRelationManagerDecorator
-from cache_dependencies.locks import DependencyLock
+from cache_dependencies.locks import CallbackLease, DependencyLock
 from cache_dependencies.transaction import TransactionManager, ThreadSafeTransactionManagerDecorator
 from cache_dependencies.nocache import NoCache
+from cache_dependencies.utils import ContextLocal, contextvars
+
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:  # Python 2.* without "futures" package
+    ThreadPoolExecutor = None
+
+try:
+    from asgiref.sync import sync_to_async
+except ImportError:  # Django < 3.0
+    sync_to_async = None
+
+try:
+    # Async counterparts provide async API (aget, aget_many, aset, ainvalidate_tags etc.)
+    # in addition to sync API, they are used if ASYNC option of cache is True.
+    from cache_dependencies.aio import (
+        AsyncCacheTagging, AsyncLocalTagVersionsCacheDecorator, AsyncTransactionInvalidationsCacheDecorator,
+        AsyncNamespaceCacheDecorator, AsyncSlidingTagTimeoutCacheDecorator, run_sync
+    )
+except SyntaxError:  # Python < 3.5
+    ASYNC_COUNTERPARTS = None
+else:
+    ASYNC_COUNTERPARTS = {
+        CacheTagging: AsyncCacheTagging,
+        LocalTagVersionsCacheDecorator: AsyncLocalTagVersionsCacheDecorator,
+        TransactionInvalidationsCacheDecorator: AsyncTransactionInvalidationsCacheDecorator,
+        NamespaceCacheDecorator: AsyncNamespaceCacheDecorator,
+        SlidingTagTimeoutCacheDecorator: AsyncSlidingTagTimeoutCacheDecorator,
+    }
 
 try:
     str = unicode  # Python 2.* compatible
@@ -31,6 +69,44 @@ nocache = NoCache(
 )
 
 
+class BackendCacheProxy(object):
+    """Proxy access to Django cache backend of current thread (or context).
+
+    Allows to share CacheTagging instance between threads,
+    while cache backends (connections) are not shared.
+    """
+    def __init__(self, alias):
+        self._alias = alias
+
+    def __getattr__(self, name):
+        return getattr(django.core.cache.caches[self._alias], name)
+
+
+class AsyncBackendCacheAdapter(object):
+    """Provides async API (aget, aset etc.) of Django < 4.0 cache backend.
+
+    Sync methods are called by sync_to_async() of asgiref (Django >= 3.0),
+    or by default executor of event loop otherwise.
+    """
+    ASYNC_METHODS = ('get', 'set', 'add', 'touch', 'delete', 'get_many', 'set_many', 'delete_many')
+
+    def __init__(self, delegate):
+        self._delegate = delegate
+
+    def __getattr__(self, name):
+        if name[:1] == 'a' and name[1:] in self.ASYNC_METHODS:
+            method_name = name[1:]
+
+            def method(*args, **kwargs):
+                # Resolves backend in the calling thread, see BackendCacheProxy.
+                return getattr(self._delegate, method_name)(*args, **kwargs)
+
+            if sync_to_async is not None:
+                return sync_to_async(method)
+            return lambda *args, **kwargs: run_sync(partial(method, *args, **kwargs))
+        return getattr(self._delegate, name)
+
+
 class CacheCollection(object):
     """Collections of caches.
 
@@ -38,9 +114,19 @@ class CacheCollection(object):
     by get_cache() function in Django < 1.7.
     For correct transaction handling we should to return
     the same instance by cache alias.
+
+    The instance is created per thread. If CACHE_TAGGING_SHARED setting is True
+    and contextvars is available, the instance is shared between threads and asyncio tasks,
+    since state of transaction and relation managers is isolated by execution context.
     """
     def __init__(self):
         self.ctx = local()
+        self._shared_caches = {}
+        self._caches_lock = Lock()
+        self._local_tag_versions = {}  # Shared between threads
+        self._tag_touches = {}  # Shared between threads
+        self._executors = {}  # Shared between threads
+        self._local_tag_versions_lock = Lock()
 
     def __call__(self, backend=None, *args, **kwargs):
         """Returns instance of CacheTagging class."""
@@ -48,23 +134,9 @@ class CacheCollection(object):
         key = (backend, args, frozenset(kwargs.items()))
 
         if key not in self._caches:
-            options = getattr(settings, 'CACHE_TAGGING', {}).get(backend, {})
-            delay = options.get('DELAY', 0) or 0
-            isolation_level = options.get('ISOLATION_LEVEL', 'READ COMMITTED')
-            django_backend = options.get('BACKEND', backend)
-            if hasattr(django.core.cache, 'caches'):
-                cache = django.core.cache.caches[django_backend]
-            else:
-                cache = django.core.cache.get_cache(django_backend, *args, **kwargs)
-
-            def thread_safe_cache_accessor():
-                return self(backend, *args, **kwargs).cache
-            tags_lock = DependencyLock.make(isolation_level, thread_safe_cache_accessor, delay)
-            transaction = ThreadSafeTransactionManagerDecorator(TransactionManager(tags_lock))
-            relation_manager = ThreadSafeRelationManagerDecorator(RelationManager())
-            self._caches[key] = CacheTagging(
-                cache, relation_manager, transaction
-            )
+            with self._caches_lock:
+                if key not in self._caches:
+                    self._caches[key] = self._make_cache(backend, *args, **kwargs)
         return self._caches[key]
 
     def __getitem__(self, alias):
@@ -73,8 +145,142 @@ class CacheCollection(object):
     def all(self):
         return self._caches.values()
 
+    def _make_cache(self, backend, *args, **kwargs):
+        options = getattr(settings, 'CACHE_TAGGING', {}).get(backend, {})
+        delay = options.get('DELAY', 0) or 0
+        isolation_level = options.get('ISOLATION_LEVEL', 'READ COMMITTED')
+        django_backend = options.get('BACKEND', backend)
+        is_async = options.get('ASYNC', False)
+        if self._is_shared():
+            cache = BackendCacheProxy(django_backend)
+        elif hasattr(django.core.cache, 'caches'):
+            cache = django.core.cache.caches[django_backend]
+        else:
+            cache = django.core.cache.get_cache(django_backend, *args, **kwargs)
+        if is_async and not hasattr(cache, 'aget'):
+            cache = AsyncBackendCacheAdapter(cache)
+        if options.get('SLIDING_TAG_TIMEOUT', False):
+            cache = self._get_class(SlidingTagTimeoutCacheDecorator, is_async)(
+                cache, self._get_tag_touches(backend, options)
+            )
+        local_tag_versions_timeout = options.get('LOCAL_TAG_VERSIONS_TIMEOUT', 0) or 0
+        if local_tag_versions_timeout:
+            cache = self._get_class(LocalTagVersionsCacheDecorator, is_async)(
+                cache, self._get_local_tag_versions(backend, local_tag_versions_timeout, options)
+            )
+
+        def thread_safe_cache_accessor():
+            return self(backend, *args, **kwargs).cache
+        tags_lock = DependencyLock.make(isolation_level, thread_safe_cache_accessor, delay)
+        transaction = TransactionManager(tags_lock)
+        relation_manager = RelationManager()
+        if not self._is_shared():
+            transaction = ThreadSafeTransactionManagerDecorator(transaction)
+            relation_manager = ThreadSafeRelationManagerDecorator(relation_manager)
+        if options.get('TAG_VERSIONS_MEMO', False):
+            cache = self._get_class(LocalTagVersionsCacheDecorator, is_async)(
+                cache, TransactionTagVersions(transaction)
+            )
+        if options.get('DEFER_INVALIDATIONS', False):
+            cache = self._get_class(TransactionInvalidationsCacheDecorator, is_async)(cache, transaction)
+        namespaces = None
+        if options.get('NAMESPACES', False):
+            # The outermost decorator, so, local storages of other decorators see namespaced keys.
+            namespaces = CacheNamespaces()
+            cache = self._get_class(NamespaceCacheDecorator, is_async)(cache, namespaces)
+        tag_version_generator = TagVersionGenerator.make(options.get('TAG_VERSION', 'MD5'))
+        callback_lease = None
+        if options.get('CALLBACK_LEASE'):
+            callback_lease_options = options['CALLBACK_LEASE']
+            if not isinstance(callback_lease_options, dict):
+                callback_lease_options = {}
+            callback_lease = CallbackLease(
+                callback_lease_options.get('TIMEOUT', 10),
+                callback_lease_options.get('WAIT_TIMEOUT', 1.0),
+                callback_lease_options.get('POLL_INTERVAL', 0.05)
+            )
+        revalidation = None
+        if options.get('STALE_WHILE_REVALIDATE'):
+            revalidation_options = options['STALE_WHILE_REVALIDATE']
+            if not isinstance(revalidation_options, dict):
+                revalidation_options = {}
+            executor = None
+            workers = revalidation_options.get('WORKERS', 4)
+            # Thread-safe decorators of transaction and relation managers forbid background threads.
+            if workers and ThreadPoolExecutor is not None and self._is_shared():
+                executor = self._get_executor(backend, workers)
+            revalidation = StaleWhileRevalidate(
+                revalidation_options.get('GRACE', 30), executor, revalidation_options.get('LEASE_TIMEOUT')
+            )
+        early_recomputation = None
+        if options.get('EARLY_RECOMPUTATION_BETA'):
+            early_recomputation = EarlyRecomputation(options['EARLY_RECOMPUTATION_BETA'])
+        tag_keys_index = None
+        if options.get('TAG_KEYS_INDEX'):
+            tag_keys_index_options = options['TAG_KEYS_INDEX']
+            if not isinstance(tag_keys_index_options, dict):
+                tag_keys_index_options = {}
+            tag_keys_index = TagKeysIndex(
+                tag_keys_index_options.get('SHARDS', 16),
+                tag_keys_index_options.get('MAX_SIZE', 1000),
+                tag_keys_index_options.get('TIMEOUT')
+            )
+        invalidation_epoch = None
+        if options.get('INVALIDATION_EPOCH'):
+            invalidation_epoch_namespace = options['INVALIDATION_EPOCH']
+            if not isinstance(invalidation_epoch_namespace, string_types):
+                invalidation_epoch_namespace = ''
+            invalidation_epoch = InvalidationEpoch(invalidation_epoch_namespace)
+        return self._get_class(CacheTagging, is_async)(
+            cache, relation_manager, transaction, tag_version_generator,
+            callback_lease, revalidation, early_recomputation,
+            tag_keys_index, invalidation_epoch, options.get('TAG_NAMESPACE_SEPARATOR'), namespaces
+        )
+
+    def _get_local_tag_versions(self, backend, timeout, options):
+        with self._local_tag_versions_lock:
+            if backend not in self._local_tag_versions:
+                self._local_tag_versions[backend] = LocalTagVersions(
+                    timeout, options.get('LOCAL_TAG_VERSIONS_MAX_SIZE', 10000)
+                )
+            return self._local_tag_versions[backend]
+
+    def _get_tag_touches(self, backend, options):
+        sliding_tag_timeout_options = options['SLIDING_TAG_TIMEOUT']
+        if not isinstance(sliding_tag_timeout_options, dict):
+            sliding_tag_timeout_options = {}
+        with self._local_tag_versions_lock:
+            if backend not in self._tag_touches:
+                self._tag_touches[backend] = TagTouches(
+                    sliding_tag_timeout_options.get('INTERVAL'), sliding_tag_timeout_options.get('MAX_SIZE', 10000)
+                )
+            return self._tag_touches[backend]
+
+    def _get_executor(self, backend, workers):
+        with self._local_tag_versions_lock:
+            if backend not in self._executors:
+                self._executors[backend] = ThreadPoolExecutor(workers)
+                atexit.register(self._executors[backend].shutdown)
+            return self._executors[backend]
+
+    @staticmethod
+    def _get_class(cls, is_async):
+        """Returns async counterpart of class if is_async, see ASYNC_COUNTERPARTS."""
+        if not is_async:
+            return cls
+        if ASYNC_COUNTERPARTS is None:
+            raise ImproperlyConfigured("ASYNC option of CACHE_TAGGING requires Python >= 3.5")
+        return ASYNC_COUNTERPARTS[cls]
+
+    @staticmethod
+    def _is_shared():
+        return (contextvars is not None and hasattr(django.core.cache, 'caches') and
+                getattr(settings, 'CACHE_TAGGING_SHARED', False))
+
     @property
     def _caches(self):
+        if self._is_shared():
+            return self._shared_caches
         if not hasattr(self.ctx, 'caches'):
             self.ctx.caches = {}
         return self.ctx.caches
@@ -110,10 +316,7 @@ class DefaultCacheProxy(object):
 cache = DefaultCacheProxy()
 
 
-def _clear_cached(tags_func, cache_alias='default', *args, **kwargs):
-    """
-    Model's save and delete callback
-    """
+def _get_tags(tags_func, *args, **kwargs):
     obj = kwargs['instance']
     try:
         tags = tags_func(*args, **kwargs)
@@ -121,11 +324,25 @@ def _clear_cached(tags_func, cache_alias='default', *args, **kwargs):
         tags = tags_func(obj)
     if not isinstance(tags, (list, tuple, set, frozenset)):
         tags = (tags, )
+    return tags
+
+
+def _get_cache(cache_alias):
     if isinstance(cache_alias, string_types):
-        cache = caches[cache_alias]
-    else:
-        cache = cache_alias
-    cache.invalidate_tags(*tags)
+        return caches[cache_alias]
+    return cache_alias
+
+
+def _clear_cached(tags_func, cache_alias='default', *args, **kwargs):
+    """
+    Model's save and delete callback
+    """
+    from .db import invalidate_on_commit
+    tags = _get_tags(tags_func, *args, **kwargs)
+    invalidate_on_commit(cache_alias, tags, kwargs.get('using'))
+    if registry.add_to_batch(cache_alias, tags):
+        return
+    _get_cache(cache_alias).invalidate_tags(*tags)
 
 
 class CacheRegistry(object):
@@ -135,6 +352,8 @@ class CacheRegistry(object):
     def __init__(self):
         """Constructor, initial registry."""
         self._registry = []
+        self._handlers = {}
+        self._context = ContextLocal()
 
     def register(self, model_tags):
         """Registers handlers."""
@@ -144,15 +363,113 @@ class CacheRegistry(object):
             Model = data[0]
             tags_func = data[1]
             apply_cache = len(data) > 2 and data[2] or 'default'
+            self._handlers.setdefault(Model, []).append((tags_func, apply_cache))
             model_signals.post_save.connect(
-                curry(_clear_cached, tags_func, apply_cache),
+                partial(_clear_cached, tags_func, apply_cache),
                 sender=Model, weak=False
             )
             model_signals.pre_delete.connect(
-                curry(_clear_cached, tags_func, apply_cache),
+                partial(_clear_cached, tags_func, apply_cache),
                 sender=Model, weak=False
             )
 
+    @contextmanager
+    def batch(self):
+        """Collects tags of registered handlers, and invalidates them at exit.
+
+        Tags are deduplicated and invalidated by single call per cache.
+        Nested batches are merged into the outermost one.
+
+        Usage::
+
+            with registry.batch():
+                for obj in objs:
+                    obj.save()
+        """
+        if getattr(self._context, 'batch', None) is not None:
+            yield
+            return
+        batch = self._context.batch = {}
+        try:
+            yield
+        finally:
+            self._context.batch = None
+            for cache_alias, tags in batch.items():
+                if tags:
+                    _get_cache(cache_alias).invalidate_tags(*tags)
+
+    def add_to_batch(self, cache_alias, tags):
+        """Adds tags to the current batch.
+
+        Returns False if no batch is active.
+
+        :type cache_alias: str or cache_dependencies.tagging.CacheTagging
+        :type tags: collections.Iterable[str]
+        :rtype: bool
+        """
+        batch = getattr(self._context, 'batch', None)
+        if batch is None:
+            return False
+        batch.setdefault(cache_alias, set()).update(tags)
+        return True
+
+    def invalidate_objects(self, objs, using=None):
+        """Invalidates tags of all objects by single call per cache.
+
+        :param objs: model instances or QuerySet
+        :param using: alias of database, which objects are written to, database of QuerySet by default
+        """
+        from .db import invalidate_on_commit
+        if using is None:
+            using = getattr(objs, 'db', None)
+        with self.batch():
+            for obj in objs:
+                sender = type(obj)
+                for tags_func, cache_alias in self._handlers.get(sender, ()):
+                    tags = _get_tags(tags_func, sender=sender, instance=obj)
+                    invalidate_on_commit(cache_alias, tags, using)
+                    self.add_to_batch(cache_alias, tags)
+
+    def bulk_create(self, queryset, objs, *args, **kwargs):
+        """QuerySet.bulk_create() which invalidates tags of created objects.
+
+        Primary keys of created objects are not set by some database backends
+        (for example, SQLite in Django < 3.0), so, tags which depend on primary key
+        can't be invalidated in this case, only model-wide tags returned by handlers.
+
+        :param queryset: QuerySet or Manager
+        """
+        objs = queryset.bulk_create(objs, *args, **kwargs)
+        self.invalidate_objects(objs, queryset.db)
+        return objs
+
+    if hasattr(QuerySet, 'bulk_update'):  # Django >= 2.2
+        def bulk_update(self, queryset, objs, fields, *args, **kwargs):
+            """QuerySet.bulk_update() which invalidates tags of objects, both before and after update.
+
+            :param queryset: QuerySet or Manager
+            """
+            objs = list(objs)
+            with self.batch():
+                self.invalidate_objects(queryset.filter(pk__in=[obj.pk for obj in objs]))
+                result = queryset.bulk_update(objs, fields, *args, **kwargs)
+                self.invalidate_objects(objs, queryset.db)
+            return result
+
+    def update(self, queryset, **kwargs):
+        """QuerySet.update() which invalidates tags of affected rows, both before and after update."""
+        with self.batch():
+            objs = list(queryset)
+            self.invalidate_objects(objs, queryset.db)
+            result = queryset.update(**kwargs)
+            self.invalidate_objects(queryset.model._default_manager.filter(pk__in=[obj.pk for obj in objs]))
+        return result
+
+    def delete(self, queryset):
+        """QuerySet.delete() which invalidates tags of all deleted objects (including cascaded ones) at once."""
+        with self.batch():
+            return queryset.delete()
+
 registry = CacheRegistry()
 
 
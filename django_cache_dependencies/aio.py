@@ -0,0 +1,172 @@
+"""
+Async-capable cache middlewares (Python >= 3.5).
+
+Each middleware works in both sync and async mode, so, replace
+``django_cache_dependencies.middleware`` by ``django_cache_dependencies.aio``
+in MIDDLEWARE setting::
+
+    MIDDLEWARE = [
+        'django_cache_dependencies.aio.UpdateCacheMiddleware',
+        ...
+        'django_cache_dependencies.aio.FetchFromCacheMiddleware'
+    ]
+
+In async mode cache hits are served without leaving the event loop.
+Cache should have ASYNC option, sync methods of Django < 4.0 cache backend
+are called by sync_to_async().
+"""
+from __future__ import absolute_import, unicode_literals
+import asyncio
+from django.conf import settings
+from django.utils.cache import _generate_cache_key, _generate_cache_header_key
+
+from . import caches, middleware
+from .utils import get_headerlist
+
+try:
+    from inspect import iscoroutinefunction, markcoroutinefunction  # Python >= 3.12
+except ImportError:
+    try:
+        from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+    except ImportError:  # asgiref < 3.6
+        # Django < 4.1 selects mode of middleware by its async_capable attribute,
+        # the mark is only needed to chain middlewares of this module.
+        def iscoroutinefunction(func):
+            return asyncio.iscoroutinefunction(func) or getattr(func, '_is_coroutine_function', False)
+
+        def markcoroutinefunction(func):
+            func._is_coroutine_function = True
+            return func
+
+
+async def aget_cache_key(request, key_prefix=None, method='GET', cache=None):
+    """Async counterpart of django.utils.cache.get_cache_key()."""
+    if key_prefix is None:
+        key_prefix = settings.CACHE_MIDDLEWARE_KEY_PREFIX
+    cache_key = _generate_cache_header_key(key_prefix, request)
+    if cache is None:
+        cache = caches[settings.CACHE_MIDDLEWARE_ALIAS]
+    headerlist = await cache.aget(cache_key)
+    if headerlist is not None:
+        return _generate_cache_key(request, method, headerlist, key_prefix)
+    else:
+        return None
+
+
+async def alearn_cache_key(request, response, tags=(), cache_timeout=None, key_prefix=None, cache=None):
+    """Async counterpart of django_cache_dependencies.utils.learn_cache_key()."""
+    if key_prefix is None:
+        key_prefix = settings.CACHE_MIDDLEWARE_KEY_PREFIX
+    if cache_timeout is None:
+        cache_timeout = settings.CACHE_MIDDLEWARE_SECONDS
+    cache_key = _generate_cache_header_key(key_prefix, request)
+    if cache is None:
+        cache = caches[settings.CACHE_MIDDLEWARE_ALIAS]
+    headerlist = get_headerlist(response)
+    await cache.aset(cache_key, headerlist, tags, cache_timeout)
+    return _generate_cache_key(request, request.method, headerlist, key_prefix)
+
+
+class MiddlewareMixin(middleware.MiddlewareMixin):
+    """Middleware is async if get_response is coroutine function.
+
+    In async mode aprocess_request() and aprocess_response() are used.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super(MiddlewareMixin, self).__init__(get_response, *args, **kwargs)
+        if self._is_async():
+            markcoroutinefunction(self)
+
+    def _is_async(self):
+        return self.get_response is not None and iscoroutinefunction(self.get_response)
+
+    def __call__(self, request):
+        if self._is_async():
+            return self.__acall__(request)
+        return super(MiddlewareMixin, self).__call__(request)
+
+    async def __acall__(self, request):
+        response = None
+        if hasattr(self, 'aprocess_request'):
+            response = await self.aprocess_request(request)
+        if not response:
+            response = await self.get_response(request)
+        if hasattr(self, 'aprocess_response'):
+            response = await self.aprocess_response(request, response)
+        return response
+
+
+class TransactionMiddleware(MiddlewareMixin, middleware.TransactionMiddleware):
+    """
+    Transaction middleware.
+
+    State of transaction is isolated by execution context (asyncio task).
+    """
+    async def aprocess_request(self, request):
+        return self.process_request(request)
+
+    async def aprocess_response(self, request, response):
+        return self.process_response(request, response)
+
+
+class UpdateCacheMiddleware(MiddlewareMixin, middleware.UpdateCacheMiddleware):
+    """
+    Response-phase cache middleware that updates the cache if the response is
+    cacheable.
+    """
+    async def aprocess_response(self, request, response):
+        """Sets the cache, if needed."""
+        update_cache = self._prepare_update_cache(request, response)
+        if update_cache is None:
+            return response
+        timeout, tags = update_cache
+        cache_key = await alearn_cache_key(request, response, tags, timeout, self.key_prefix, cache=self.cache)
+        if hasattr(response, 'render') and callable(response.render) and not response.is_rendered:
+            response.add_post_render_callback(
+                lambda r: self.cache.set(cache_key, r, tags, timeout)
+            )
+        else:
+            await self.cache.aset(cache_key, response, tags, timeout)
+        return response
+
+
+class FetchFromCacheMiddleware(MiddlewareMixin, middleware.FetchFromCacheMiddleware):
+    """
+    Request-phase cache middleware that fetches a page from the cache.
+    """
+    async def aprocess_request(self, request):
+        """
+        Checks whether the page is already cached and returns the cached
+        version if available.
+        """
+        if request.method not in ('GET', 'HEAD'):
+            request._cache_update_cache = False
+            return None  # Don't bother checking the cache.
+
+        # try and get the cached GET response
+        cache_key = await aget_cache_key(request, self.key_prefix, 'GET', cache=self.cache)
+        if cache_key is None:
+            request._cache_update_cache = True
+            return None  # No cache information available, need to rebuild.
+        response = await self.cache.aget(cache_key)
+        # if it wasn't found and we are looking for a HEAD, try looking just for that
+        if response is None and request.method == 'HEAD':
+            cache_key = await aget_cache_key(request, self.key_prefix, 'HEAD', cache=self.cache)
+            response = await self.cache.aget(cache_key)
+
+        if response is None:
+            request._cache_update_cache = True
+            return None  # No cache information available, need to rebuild.
+
+        # hit, return cached response
+        request._cache_update_cache = False
+        return response
+
+
+class CacheMiddleware(UpdateCacheMiddleware, FetchFromCacheMiddleware, middleware.CacheMiddleware):
+    """
+    Cache middleware that provides basic behavior for many simple sites.
+    """
@@ -0,0 +1,128 @@
+"""
+Cache transaction bound to database transaction.
+
+Usage::
+
+    from django_cache_dependencies.db import atomic
+
+    with atomic():
+        obj.save()  # Tags are invalidated and locked here...
+    # ...and released here, right after database commit (or rollback),
+    # not at the end of request-wide cache transaction of TransactionMiddleware.
+
+With INVALIDATE_ON_COMMIT option of cache, tags of registered models, changed within
+any atomic block (django.db.transaction.atomic(), ORM, ATOMIC_REQUESTS), are invalidated
+once more right after commit of the outermost atomic block, see invalidate_on_commit().
+"""
+from __future__ import absolute_import, unicode_literals
+import weakref
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS
+from django.db import transaction
+
+from . import _get_cache, caches, string_types
+
+
+class Atomic(object):
+    """Enters database atomic block and cache transaction.
+
+    Cache transaction of the outermost atomic block is independent,
+    i.e. locks of its tags are released when database transaction is committed
+    (or rolled back), even within request-wide cache transaction.
+    Cache transaction of nested atomic block (savepoint) is a save point
+    of the outer cache transaction.
+    """
+    def __init__(self, using=None, savepoint=True, cache_alias=None):
+        """
+        :type using: str or None
+        :type savepoint: bool
+        :type cache_alias: str or None
+        """
+        self.using = using
+        self.savepoint = savepoint
+        self.cache_alias = cache_alias or DEFAULT_CACHE_ALIAS
+        self._atomics = []
+
+    def __call__(self, func):
+        @wraps(func)
+        def _decorated(*args, **kwargs):
+            with self:
+                return func(*args, **kwargs)
+        return _decorated
+
+    def __enter__(self):
+        outermost = not transaction.get_connection(self.using).in_atomic_block
+        atomic = transaction.atomic(self.using, self.savepoint)
+        atomic.__enter__()
+        self._atomics.append(atomic)  # Instance can be reentered by recursive call of decorated function
+        try:
+            caches[self.cache_alias].transaction.begin(independent=outermost)
+        except Exception:
+            self._atomics.pop().__exit__(None, None, None)
+            raise
+
+    def __exit__(self, *args):
+        try:
+            return self._atomics.pop().__exit__(*args)
+        finally:
+            # Database transaction is committed or rolled back at this point.
+            caches[self.cache_alias].transaction.finish()
+
+
+def atomic(using=None, savepoint=True, cache_alias=None):
+    """Counterpart of django.db.transaction.atomic(), can be used as decorator or context manager."""
+    if callable(using):
+        return Atomic(None, savepoint, cache_alias)(using)
+    return Atomic(using, savepoint, cache_alias)
+
+
+class PendingInvalidation(object):
+    """Tags to be invalidated right after commit of database transaction, by single call per cache."""
+    def __init__(self):
+        self.tags = {}
+
+    def add(self, cache_alias, tags):
+        """
+        :type cache_alias: str or cache_dependencies.tagging.CacheTagging
+        :type tags: collections.Iterable[str]
+        """
+        self.tags.setdefault(cache_alias, set()).update(tags)
+
+    def __call__(self):
+        for cache_alias, tags in self.tags.items():
+            if tags:
+                _get_cache(cache_alias).invalidate_tags(*tags)
+
+
+def invalidate_on_commit(cache_alias, tags, using=None):
+    """Invalidates tags once more right after commit of the outermost atomic block of connection.
+
+    Tags invalidated within database transaction can be cached again by concurrent readers
+    with data read before commit. Commit hook (on_commit) covers any atomic block,
+    not only atomic() of this module. Tags are deduplicated by single hook
+    per database transaction. Nothing is done outside atomic block,
+    and if INVALIDATE_ON_COMMIT option of cache is not set.
+
+    :type cache_alias: str or cache_dependencies.tagging.CacheTagging
+    :type tags: collections.Iterable[str]
+    :type using: str or None
+    """
+    if not isinstance(cache_alias, string_types):  # Options of cache instance are unknown
+        return
+    options = getattr(settings, 'CACHE_TAGGING', {}).get(cache_alias, {})
+    if not options.get('INVALIDATE_ON_COMMIT', False):
+        return
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block or not hasattr(connection, 'on_commit'):  # Django < 1.9
+        return
+    # Connection refers to hook weakly. Commit or rollback drops the hook, so, the reference
+    # becomes dead (immediately in CPython), and the next atomic block registers new hook.
+    ref = getattr(connection, '_cache_dependencies_pending_invalidation', None)
+    pending_invalidation = ref() if ref is not None else None
+    if pending_invalidation is None:
+        pending_invalidation = PendingInvalidation()
+        connection.on_commit(pending_invalidation)
+        connection._cache_dependencies_pending_invalidation = weakref.ref(pending_invalidation)
+    pending_invalidation.add(cache_alias, tags)
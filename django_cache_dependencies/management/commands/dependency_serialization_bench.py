@@ -0,0 +1,60 @@
+import time
+import pickle
+from django.core.management.base import BaseCommand
+from cache_dependencies import dependencies, serializers, utils
+
+
+class Bench(object):
+
+    def __init__(self, number=1000):
+        self._number = number
+
+    def __call__(self, callback, *a, **kw):
+        s = time.time()
+        for i in range(self._number):
+            callback(*a, **kw)
+        return (time.time() - s) / self._number
+
+
+def pickle_dumps(dependency):
+    return pickle.dumps(dependency, pickle.HIGHEST_PROTOCOL)
+
+
+def make_dependency(tags_count):
+    tags_dependency = dependencies.TagsDependency(['tag_{0}'.format(i) for i in range(tags_count)])
+    tags_dependency.tag_versions = {tag: utils.generate_tag_version() for tag in tags_dependency.tags}
+    return dependencies.CompositeDependency(tags_dependency, dependencies.DummyDependency())
+
+
+class Command(BaseCommand):
+    """Compares compact encoding of dependencies with pickle."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tags',
+            dest='tags_counts',
+            nargs='+',
+            type=int,
+            default=(1, 10, 100),
+        )
+        parser.add_argument(
+            '--number',
+            type=int,
+            default=1000,
+        )
+
+    def handle(self, *args, **options):
+        bench = Bench(options['number'])
+        for tags_count in options['tags_counts']:
+            dependency = make_dependency(tags_count)
+            pickled = pickle_dumps(dependency)
+            encoded = serializers.dumps(dependency)
+            self.stdout.write("=" * 50, ending="\n")
+            self.stdout.write("Tags                       : {}".format(tags_count), ending="\n")
+            self.stdout.write("Pickle, bytes              : {}".format(len(pickled)), ending="\n")
+            self.stdout.write("Compact, bytes             : {}".format(len(encoded)), ending="\n")
+            self.stdout.write("Pickle encode, sec.        : {}".format(bench(pickle_dumps, dependency)), ending="\n")
+            self.stdout.write("Compact encode, sec.       : {}".format(bench(serializers.dumps, dependency)), ending="\n")
+            self.stdout.write("Pickle decode, sec.        : {}".format(bench(pickle.loads, pickled)), ending="\n")
+            self.stdout.write("Compact decode, sec.       : {}".format(bench(serializers.loads, encoded)), ending="\n")
+        self.stdout.write("=" * 50, ending="\n")
@@ -0,0 +1,67 @@
+import time
+import django.core.cache
+from django.core.management.base import BaseCommand
+from cache_dependencies import dependencies, utils
+
+
+class Bench(object):
+
+    def __init__(self, number=10):
+        self._number = number
+
+    def __call__(self, callback, *a, **kw):
+        s = time.time()
+        for i in range(self._number):
+            callback(*a, **kw)
+        return (time.time() - s) / self._number
+
+
+def make_dependency(cache, delegates_count):
+    delegates = []
+    for i in range(delegates_count):
+        tag = 'tag_{0}'.format(i)
+        tags_dependency = dependencies.TagsDependency(tag)
+        tags_dependency.tag_versions = {tag: utils.generate_tag_version()}
+        cache.set(utils.make_tag_key(tag), tags_dependency.tag_versions[tag])
+        delegates.append(dependencies.CompositeDependency(tags_dependency, dependencies.DummyDependency()))
+    return dependencies.CompositeDependency(*delegates)
+
+
+def validate(dependency, cache):
+    dependency.validate(cache, None).get()
+
+
+class Command(BaseCommand):
+    """Measures validation time of composite dependency by count of delegates."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--delegates',
+            dest='delegates_counts',
+            nargs='+',
+            type=int,
+            default=(1, 10, 100, 1000),
+        )
+        parser.add_argument(
+            '--number',
+            type=int,
+            default=10,
+        )
+        parser.add_argument(
+            '--backend',
+            default='default',
+            help="Alias of Django cache, tag versions of which are read by validation"
+        )
+
+    def handle(self, *args, **options):
+        bench = Bench(options['number'])
+        if hasattr(django.core.cache, 'caches'):
+            cache = django.core.cache.caches[options['backend']]
+        else:
+            cache = django.core.cache.get_cache(options['backend'])
+        for delegates_count in options['delegates_counts']:
+            dependency = make_dependency(cache, delegates_count)
+            self.stdout.write("=" * 50, ending="\n")
+            self.stdout.write("Delegates                  : {}".format(delegates_count), ending="\n")
+            self.stdout.write("Validate, sec.             : {}".format(bench(validate, dependency, cache)), ending="\n")
+        self.stdout.write("=" * 50, ending="\n")
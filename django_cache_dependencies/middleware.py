@@ -145,12 +145,29 @@ class UpdateCacheMiddleware(MiddlewareMixin):
 
     def process_response(self, request, response):
         """Sets the cache, if needed."""
+        update_cache = self._prepare_update_cache(request, response)
+        if update_cache is None:
+            return response
+        timeout, tags = update_cache
+        # patch start
+        cache_key = learn_cache_key(request, response, tags, timeout, self.key_prefix, cache=self.cache)  # patched
+        if hasattr(response, 'render') and isinstance(response.render, collections.Callable):
+            response.add_post_render_callback(
+                lambda r: self.cache.set(cache_key, r, tags, timeout)  # patched
+            )
+        else:
+            self.cache.set(cache_key, response, tags, timeout)  # patched
+        # patch end
+        return response
+
+    def _prepare_update_cache(self, request, response):
+        """Returns (timeout, tags) if cache should be updated, otherwise None."""
         if not self._should_update_cache(request, response):
             # We don't need to update the cache, just return.
-            return response
+            return None
 
         if getattr(response, 'streaming', None) or response.status_code != 200:
-            return response
+            return None
         # Try to get the timeout from the "max-age" section of the "Cache-
         # Control" header before reverting to using the default cache_timeout
         # length.
@@ -159,7 +176,7 @@ class UpdateCacheMiddleware(MiddlewareMixin):
             timeout = self.cache_timeout
         elif timeout == 0:
             # max-age was set to 0, don't bother caching.
-            return response
+            return None
         # patch start
         patch_response_headers(response, timeout)
         tags = set()
@@ -171,16 +188,10 @@ class UpdateCacheMiddleware(MiddlewareMixin):
         # Adds tags from request, see templatetag {% cache_add_tags ... %}
         if hasattr(request, 'cache_tagging'):
             tags.update(request.cache_tagging)
-        if timeout:
-            cache_key = learn_cache_key(request, response, tags, timeout, self.key_prefix, cache=self.cache)  # patched
-            if hasattr(response, 'render') and isinstance(response.render, collections.Callable):
-                response.add_post_render_callback(
-                    lambda r: self.cache.set(cache_key, r, tags, timeout)  # patched
-                )
-            else:
-                self.cache.set(cache_key, response, tags, timeout)  # patched
         # patch end
-        return response
+        if not timeout:
+            return None
+        return timeout, tags
 
 
 class FetchFromCacheMiddleware(MiddlewareMixin):
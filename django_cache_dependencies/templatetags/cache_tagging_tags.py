@@ -7,9 +7,14 @@ from django.urls import reverse
 from django.template.loader import render_to_string
 from django.template import (Library, Node, TemplateSyntaxError,
     VariableDoesNotExist, base)
-from django.utils.translation import ugettext_lazy, pgettext_lazy
+from django.utils.translation import pgettext_lazy
 from django.utils.safestring import mark_safe
 
+try:
+    from django.utils.translation import ugettext_lazy
+except ImportError:  # Django >= 4.0
+    from django.utils.translation import gettext_lazy as ugettext_lazy
+
 from .. import cache, nocache as nocache_handler
 from ..utils import prevent_cache_page
 
@@ -4,13 +4,20 @@ from uuid import uuid4
 
 from django.conf import settings
 from django.urls import reverse
-from django.db import models
+from django.db import models, transaction
 from django.template import Context, Template
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
 from django.test.client import RequestFactory
 
 from .. import cache, caches, registry
+from ..db import atomic
 from ..decorators import cache_transaction_all
+from cache_dependencies.transaction import IndependentTransaction, SavePoint
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
 
 
 class FirstTestModel(models.Model):
@@ -75,6 +82,58 @@ class CacheTaggingIntegrationTest(TestCase):
         cache.set('name1', 5, 10)
         self.assertEqual(cache.get('name1'), 5)
 
+    def test_async_option(self):
+        from .. import ASYNC_COUNTERPARTS, CacheCollection, CacheTagging
+        self.assertIs(CacheCollection._get_class(CacheTagging, False), CacheTagging)
+        self.assertIs(type(CacheCollection()('default')), CacheTagging)
+        if ASYNC_COUNTERPARTS is not None:
+            with mock.patch.object(settings, 'CACHE_TAGGING', {'default': {'ASYNC': True}}):
+                self.assertIs(type(CacheCollection()('default')), ASYNC_COUNTERPARTS[CacheTagging])
+
+    def test_namespaces_option(self):
+        from .. import CacheCollection
+        options = {'NAMESPACES': True, 'LOCAL_TAG_VERSIONS_TIMEOUT': 60, 'TAG_VERSIONS_MEMO': True,
+                   'DEFER_INVALIDATIONS': True}
+        with mock.patch.object(settings, 'CACHE_TAGGING', {'default': options}):
+            cache_tagging = CacheCollection()('default')
+        for namespace in ('tenant1', 'tenant2'):
+            with cache_tagging.activate_namespace(namespace):
+                cache_tagging.set('name1', namespace, ('tag1', ), 120)
+        with cache_tagging.activate_namespace('tenant1'):
+            cache_tagging.invalidate_tags('tag1')
+            self.assertIsNone(cache_tagging.get('name1'))
+        # Tag versions of namespaces are not shared by local storages.
+        with cache_tagging.activate_namespace('tenant2'):
+            self.assertEqual(cache_tagging.get('name1'), 'tenant2')
+            cache_tagging.invalidate_tags('tag1')
+
+    def test_shared_option(self):
+        import threading
+        from .. import CacheCollection
+        self.assertFalse(CacheCollection()._is_shared())
+        for shared in (True, False):
+            with mock.patch.object(settings, 'CACHE_TAGGING_SHARED', shared, create=True):
+                collection = CacheCollection()
+                instances = [collection('default')]
+                thread = threading.Thread(target=lambda: instances.append(collection('default')))
+                thread.start()
+                thread.join()
+                self.assertEqual(instances[0] is instances[1], collection._is_shared())
+                if not shared:
+                    self.assertIsNot(instances[0], instances[1])
+
+    def test_revalidation_executor(self):
+        from .. import CacheCollection, ThreadPoolExecutor
+        if ThreadPoolExecutor is None:
+            return
+        collection = CacheCollection()
+        with mock.patch('atexit.register') as register:
+            executor = collection._get_executor('default', 2)
+            self.assertIs(collection._get_executor('default', 2), executor)
+        # Executor is shut down at exit, like scheduler of delayed invalidations.
+        register.assert_called_once_with(executor.shutdown)
+        executor.shutdown()
+
     def test_cache(self):
         tags1 = ('tests.firsttestmodel.pk:{0}'.format(self.obj1.pk), )
         cache.set('name1', 'value1', tags1, 120)
@@ -116,6 +175,44 @@ class CacheTaggingIntegrationTest(TestCase):
         cache.invalidate_tags('non_existen_tag')
         self.assertIsNone(cache.get('name1'))
 
+    def test_registry_batch(self):
+        cache_tagging = caches['default']
+        with mock.patch.object(cache_tagging, 'invalidate_tags', wraps=cache_tagging.invalidate_tags) as invalidate_tags:
+            with registry.batch():
+                self.obj1.save()
+                with registry.batch():
+                    self.obj1.save()
+                invalidate_tags.assert_not_called()
+            self.assertEqual(invalidate_tags.call_count, 1)
+            self.assertSetEqual(set(invalidate_tags.call_args[0]), {
+                'tests.firsttestmodel.pk:{0}'.format(self.obj1.pk), 'tests.firsttestmodel'
+            })
+
+    def test_registry_bulk_operations(self):
+        tags = ('tests.firsttestmodel', )
+        cache.set('name1', 'value1', tags, 120)
+        registry.bulk_create(FirstTestModel.objects, [FirstTestModel(title='title3')])
+        self.assertIsNone(cache.get('name1'))
+
+        if hasattr(registry, 'bulk_update'):
+            cache.set('name1', 'value1', tags, 120)
+            # Primary keys are not set by bulk_create() of SQLite in Django < 3.0
+            objs = list(FirstTestModel.objects.filter(title='title3'))
+            objs[0].title = 'title3.2'
+            registry.bulk_update(FirstTestModel.objects, objs, ['title'])
+            self.assertIsNone(cache.get('name1'))
+
+        cache.set('name1', 'value1', tags, 120)
+        self.assertEqual(registry.update(FirstTestModel.objects.filter(pk=self.obj1.pk), title='title1.2'), 1)
+        self.assertIsNone(cache.get('name1'))
+
+        cache.set('name1', 'value1', tags, 120)
+        cache_tagging = caches['default']
+        with mock.patch.object(cache_tagging, 'invalidate_tags', wraps=cache_tagging.invalidate_tags) as invalidate_tags:
+            registry.delete(FirstTestModel.objects.all())
+            self.assertEqual(invalidate_tags.call_count, 1)
+        self.assertIsNone(cache.get('name1'))
+
     def test_ancestors(self):
         val1 = cache.get('name1')
         self.assertIsNone(val1)
@@ -467,3 +564,57 @@ class CacheTaggingIntegrationTest(TestCase):
         self.assertEqual(cache.get('name1'), 'value1')
         some_func()
         self.assertIsNone(cache.get('name1'))
+
+
+class AtomicTest(TransactionTestCase):
+
+    def test_atomic(self):
+        cache.transaction.begin()
+        try:
+            request_transaction = cache.transaction.current()
+            with atomic():
+                self.assertIsInstance(cache.transaction.current(), IndependentTransaction)
+                with atomic():
+                    self.assertIsInstance(cache.transaction.current(), SavePoint)
+                FirstTestModel.objects.create(title='title1')
+            self.assertIs(cache.transaction.current(), request_transaction)
+
+            @atomic
+            def some_func():
+                self.assertIsInstance(cache.transaction.current(), IndependentTransaction)
+                raise ValueError
+
+            self.assertRaises(ValueError, some_func)
+            self.assertIs(cache.transaction.current(), request_transaction)
+        finally:
+            cache.transaction.flush()
+
+    def test_invalidate_on_commit(self):
+        tags = ('tests.firsttestmodel', )
+
+        def create_and_read():
+            FirstTestModel.objects.create(title='title1')
+            self.assertIsNone(cache.get('name1'))
+            # Concurrent reader caches data read before commit
+            cache.set('name1', 'value1', tags, 120)
+            self.assertEqual(cache.get('name1'), 'value1')
+
+        with transaction.atomic():
+            create_and_read()
+        # Not invalidated again without INVALIDATE_ON_COMMIT option.
+        self.assertEqual(cache.get('name1'), 'value1')
+        cache.invalidate_tags(*tags)
+
+        options = dict(settings.CACHE_TAGGING['default'], INVALIDATE_ON_COMMIT=True)
+        with mock.patch.dict(settings.CACHE_TAGGING, {'default': options}):
+            with self.assertRaises(ValueError):
+                with transaction.atomic():
+                    create_and_read()
+                    raise ValueError
+            self.assertEqual(cache.get('name1'), 'value1')
+
+            with transaction.atomic():
+                create_and_read()
+                with transaction.atomic():
+                    FirstTestModel.objects.create(title='title2')
+            self.assertIsNone(cache.get('name1'))
@@ -0,0 +1,75 @@
+from __future__ import absolute_import, unicode_literals
+import asyncio
+from uuid import uuid4
+
+from django.core.cache import caches as backends
+from django.http import HttpResponse
+from django.test import SimpleTestCase
+from django.test.client import RequestFactory
+
+from .. import AsyncBackendCacheAdapter, aio, caches
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+class AsyncCacheMiddlewareTest(SimpleTestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.calls = 0
+
+        async def get_response(request):
+            self.calls += 1
+            return HttpResponse(uuid4().hex)
+
+        self.middleware = aio.CacheMiddleware(
+            get_response, cache_timeout=3600, cache_alias='default', key_prefix='test_aio',
+            tags=lambda request: ('tests.aio', )
+        )
+
+    def tearDown(self):
+        caches['default'].invalidate_tags('tests.aio')
+        caches['default'].transaction.flush()
+
+    def test_is_async(self):
+        self.assertTrue(aio.iscoroutinefunction(self.middleware))
+        sync_middleware = aio.CacheMiddleware(lambda request: HttpResponse('sync'))
+        self.assertFalse(aio.iscoroutinefunction(sync_middleware))
+
+    def test_cache_hit(self):
+        response1 = run(self.middleware(self.factory.get('/test_aio/')))
+        response2 = run(self.middleware(self.factory.get('/test_aio/')))
+        self.assertEqual(response1.content, response2.content)
+        self.assertEqual(self.calls, 1)
+
+        run(caches['default'].ainvalidate_tags('tests.aio'))
+        response3 = run(self.middleware(self.factory.get('/test_aio/')))
+        self.assertNotEqual(response1.content, response3.content)
+        self.assertEqual(self.calls, 2)
+
+    def test_not_cacheable_method(self):
+        run(self.middleware(self.factory.post('/test_aio/')))
+        run(self.middleware(self.factory.post('/test_aio/')))
+        self.assertEqual(self.calls, 2)
+
+    def test_transaction_middleware(self):
+        async def get_response(request):
+            return caches['default'].transaction.current()
+
+        middleware = aio.TransactionMiddleware(get_response)
+        self.assertTrue(run(middleware(self.factory.get('/test_aio/'))))
+        self.assertFalse(caches['default'].transaction.current())
+
+    def test_backend_adapter(self):
+        cache = AsyncBackendCacheAdapter(backends['default'])
+        run(cache.aset('test_aio_adapter', 1))
+        self.assertEqual(run(cache.aget('test_aio_adapter')), 1)
+        self.assertEqual(run(cache.aget_many(['test_aio_adapter'])), {'test_aio_adapter': 1})
+        run(cache.adelete('test_aio_adapter'))
+        self.assertIsNone(cache.get('test_aio_adapter'))
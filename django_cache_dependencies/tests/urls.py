@@ -1,5 +1,8 @@
 from __future__ import absolute_import, unicode_literals
-from django.conf.urls import url
+try:
+    from django.conf.urls import url
+except ImportError:  # Django >= 4.0
+    from django.urls import re_path as url
 from django_cache_dependencies.decorators import cache_page
 from django_cache_dependencies.tests import views
 
@@ -33,7 +33,7 @@ def patch_response_headers(response, cache_timeout=None):
         cache_timeout = settings.CACHE_MIDDLEWARE_SECONDS
     if cache_timeout < 0:
         cache_timeout = 0  # Can't have max-age negative
-    if settings.USE_ETAGS and not response.has_header('ETag'):
+    if getattr(settings, 'USE_ETAGS', False) and not response.has_header('ETag'):  # Removed in Django 2.1
         if hasattr(response, 'render') and callable(response.render):
             response.add_post_render_callback(set_response_etag)
         else:
@@ -69,6 +69,13 @@ def learn_cache_key(request, response, tags=(), cache_timeout=None, key_prefix=N
     cache_key = _generate_cache_header_key(key_prefix, request)
     if cache is None:
         cache = caches[settings.CACHE_MIDDLEWARE_ALIAS]
+    headerlist = get_headerlist(response)
+    cache.set(cache_key, headerlist, tags, cache_timeout)  # patched
+    return _generate_cache_key(request, request.method, headerlist, key_prefix)
+
+
+def get_headerlist(response):
+    """Returns list of headers to take into account for cache key, by Vary header of response."""
     if response.has_header('Vary'):
         is_accept_language_redundant = settings.USE_I18N or settings.USE_L10N
         # If i18n or l10n are used, the generated cache key will be suffixed
@@ -82,10 +89,8 @@ def learn_cache_key(request, response, tags=(), cache_timeout=None, key_prefix=N
                 continue
             headerlist.append('HTTP_' + header)
         headerlist.sort()
-        cache.set(cache_key, headerlist, tags, cache_timeout)  # patched
-        return _generate_cache_key(request, request.method, headerlist, key_prefix)
+        return headerlist
     else:
         # if there is no Vary header, we still need a cache key
         # for the request.build_absolute_uri()
-        cache.set(cache_key, [], tags, cache_timeout)  # patched
-        return _generate_cache_key(request, request.method, [], key_prefix)
+        return []
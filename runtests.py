@@ -2,11 +2,15 @@
 from __future__ import absolute_import, unicode_literals
 import os
 import sys
+import subprocess
 
 urlpatterns = []
 
 
 def main():
+    # Sync CacheTagging is used by existing users, so, Django integration
+    # is tested with sync cache by the second run (with --sync argument).
+    is_async = sys.version_info >= (3, 5) and '--sync' not in sys.argv[1:]
     import django
     from django.conf import settings
     settings.configure(
@@ -20,6 +24,7 @@ def main():
             'default': {
                 'ISOLATION_LEVEL': 'REPEATABLE READ',
                 'DELAY': 5,
+                'ASYNC': is_async,
             }
         },
         INSTALLED_APPS = [
@@ -53,6 +58,7 @@ def main():
                 },
             },
         ],
+        SECRET_KEY = 'cache_dependencies',
         DEBUG = True,
         TEMPLATE_DEBUG = True,
         ROOT_URLCONF = 'runtests',
@@ -71,17 +77,28 @@ def main():
     TestRunner = get_runner(settings)
 
     test_runner = TestRunner(verbosity=1, interactive=False, failfast=False)
-    failures = test_runner.run_tests([
-        'cache_dependencies.tests.test_cache',
-        'cache_dependencies.tests.test_defer',
-        'cache_dependencies.tests.test_dependencies',
-        'cache_dependencies.tests.test_helpers',
-        'cache_dependencies.tests.test_relations',
-        'cache_dependencies.tests.test_locks',
-        'cache_dependencies.tests.test_transaction',
-        'cache_dependencies.tests.test_tagging',
-        'django_cache_dependencies.tests',
-    ])
+    if is_async or sys.version_info < (3, 5):
+        test_labels = [
+            'cache_dependencies.tests.test_cache',
+            'cache_dependencies.tests.test_defer',
+            'cache_dependencies.tests.test_dependencies',
+            'cache_dependencies.tests.test_helpers',
+            'cache_dependencies.tests.test_relations',
+            'cache_dependencies.tests.test_serializers',
+            'cache_dependencies.tests.test_locks',
+            'cache_dependencies.tests.test_transaction',
+            'cache_dependencies.tests.test_utils',
+            'cache_dependencies.tests.test_tagging',
+            'django_cache_dependencies.tests',
+        ]
+    else:
+        test_labels = ['django_cache_dependencies.tests']
+    if is_async:
+        test_labels.append('cache_dependencies.tests.test_aio')
+        test_labels.append('django_cache_dependencies.tests.test_aio')
+    failures = test_runner.run_tests(test_labels)
+    if is_async:
+        failures = subprocess.call([sys.executable, os.path.abspath(__file__), '--sync']) or failures
     sys.exit(failures)
 
 